@@ -0,0 +1,73 @@
+"""Источники строк API: словари из values_list вместо моделей."""
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from posts import graph
+from posts.models import Comment, Post, TimelineEntry
+from posts.utils import MergedSource, ValuesSource
+
+POST_COLUMNS = (
+    ('id', 'id'),
+    ('text', 'text'),
+    ('pub_date', 'pub_date'),
+    ('image', 'image'),
+    ('comments_count', 'comments_count'),
+    ('author', 'author__username'),
+    ('group_slug', 'group__slug'),
+    ('group_title', 'group__title'),
+)
+COMMENT_COLUMNS = (
+    ('id', 'id'),
+    ('text', 'text'),
+    ('created', 'created'),
+    ('author', 'author__username'),
+)
+
+
+def posts(queryset=None):
+    if queryset is None:
+        queryset = Post.objects.all()
+    return ValuesSource(queryset, POST_COLUMNS)
+
+
+def follow_posts(user):
+    """Лента подписок: разложенные записи и посты популярных авторов."""
+    timeline = ValuesSource(
+        TimelineEntry.objects.filter(user=user),
+        [(name, 'pub_date' if name == 'pub_date' else f'post__{lookup}')
+         for name, lookup in POST_COLUMNS],
+        fields=('pub_date', 'post_id'),
+    )
+    pulled = posts(
+        graph.followed(Post.objects.filter(fanned_out=False), user.pk))
+    return MergedSource(timeline, pulled)
+
+
+def comments(post_id):
+    return ValuesSource(
+        Comment.objects.filter(post_id=post_id), COMMENT_COLUMNS,
+        fields=('created', 'id'), key_names=('created', 'id'),
+        descending=False,
+    )
+
+
+def post_payload(request, row):
+    return {
+        'id': row['id'],
+        'url': request.build_absolute_uri(
+            reverse('api:post_detail', args=[row['id']])),
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'image': request.build_absolute_uri(
+            default_storage.url(row['image'])) if row['image'] else None,
+        'comments_count': row['comments_count'],
+        'author': row['author'],
+        'group': {
+            'slug': row['group_slug'],
+            'title': row['group_title'],
+        } if row['group_slug'] else None,
+    }
+
+
+def comment_payload(request, row):
+    return dict(row)
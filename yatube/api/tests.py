@@ -0,0 +1,154 @@
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def content(response):
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return response.json()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, API_PAGE_SIZE=3)
+class ApiTests(TestCase):
+    """JSON API лент и постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {number}',
+                                group=cls.group if number % 2 else None)
+            for number in range(5)
+        ]
+        cls.posts[0].image = SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif')
+        cls.posts[0].save()
+        for number in range(4):
+            Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                                   text=f'Комментарий {number}')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url, **params):
+        """Все страницы списка по ссылкам next."""
+        results, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = content(response)
+            results += data['results']
+            pages += 1
+            if data['next'] is None:
+                return results, pages
+            response = self.client.get(data['next'])
+
+    def test_feed(self):
+        """Лента: новые посты первыми, курсор проходит все страницы."""
+        results, pages = self.walk(reverse('api:posts'))
+        self.assertEqual(pages, 2)
+        self.assertEqual([item['id'] for item in results],
+                         [post.pk for post in reversed(self.posts)])
+        first = results[-1]
+        self.assertEqual(first['author'], 'author')
+        self.assertIsNone(first['group'])
+        self.assertTrue(first['image'].startswith('http://testserver/'))
+        self.assertIn('comments_count', first)
+        self.assertEqual(results[-2]['group'],
+                         {'slug': 'group', 'title': 'Группа'})
+        results, pages = self.walk(reverse('api:posts'), limit=5)
+        self.assertEqual((len(results), pages), (5, 1))
+
+    def test_feed_queries(self):
+        """Страница ленты — один запрос к базе, без моделей."""
+        self.client.get(reverse('api:posts'))
+        with self.assertNumQueries(1):
+            content(self.client.get(reverse('api:posts')))
+
+    def test_group_and_author_feeds(self):
+        """Ленты группы и автора фильтруют посты."""
+        results, _ = self.walk(
+            reverse('api:group_posts', args=[self.group.slug]))
+        self.assertEqual({item['id'] for item in results},
+                         {self.posts[1].pk, self.posts[3].pk})
+        results, _ = self.walk(
+            reverse('api:author_posts', args=[self.reader.username]))
+        self.assertEqual(results, [])
+        response = self.client.get(reverse('api:group_posts',
+                                           args=['missing']))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', response.json())
+
+    def test_follow_feed(self):
+        """Лента подписок только для авторизованных."""
+        response = self.client.get(reverse('api:follow'))
+        self.assertEqual(response.status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('api:follow'))
+        self.assertIn('private', response['Cache-Control'])
+        results, _ = self.walk(reverse('api:follow'))
+        self.assertEqual([item['id'] for item in results],
+                         [post.pk for post in reversed(self.posts)])
+
+    def test_post_detail_and_comments(self):
+        """Пост с первой страницей комментариев, остальные по ссылке."""
+        post = self.posts[0]
+        data = self.client.get(
+            reverse('api:post_detail', args=[post.pk])).json()
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual([item['text'] for item in data['comments']
+                          ['results']],
+                         [f'Комментарий {number}' for number in range(3)])
+        rest = content(self.client.get(data['comments']['next']))
+        self.assertEqual([item['text'] for item in rest['results']],
+                         ['Комментарий 3'])
+        response = self.client.get(reverse('api:post_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get(self):
+        """Неизменившаяся лента отвечает 304, новый пост меняет ETag."""
+        url = reverse('api:posts')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_bad_requests(self):
+        """Неверные параметры и методы отклоняются."""
+        url = reverse('api:posts')
+        for params in ({'limit': 0}, {'limit': 10000}, {'cursor': 'x'}):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(url).status_code, 405)
@@ -0,0 +1,166 @@
+"""Версия 1 JSON API только для чтения.
+
+Списки отдаются потоком: строки читаются из курсора базы порциями и
+сериализуются по одной, ссылка на следующую страницу идёт в конце.
+Ответы поддерживают условный GET по версиям пространств кэша лент.
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (Http404, JsonResponse, QueryDict,
+                         StreamingHttpResponse)
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
+
+from posts.caching import conditional
+from posts.timeline import follow_namespaces
+from posts.models import Post
+from posts.utils import decode_cursor, encode_cursor
+from posts.views import (group_namespaces, post_namespaces,
+                         profile_namespaces)
+
+from . import feeds
+
+
+class ApiError(Exception):
+
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def api_view(view):
+    """Только GET и HEAD; ошибки — JSON с полем detail."""
+    @wraps(view)
+    @require_safe
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'detail': 'Не найдено.'}, status=404)
+        except ApiError as error:
+            return JsonResponse({'detail': error.detail},
+                                status=error.status)
+    return wrapper
+
+
+def authenticated(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise ApiError(401, 'Нужна авторизация.')
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _page_params(request, source):
+    """Номер страницы, ключ последней строки предыдущей и размер."""
+    limit = request.GET.get('limit') or str(settings.API_PAGE_SIZE)
+    if not limit.isdigit() or not (
+            1 <= int(limit) <= settings.API_MAX_PAGE_SIZE):
+        raise ApiError(400, 'limit должен быть от 1 до {}.'.format(
+            settings.API_MAX_PAGE_SIZE))
+    token = request.GET.get('cursor')
+    if not token:
+        return 1, None, int(limit)
+    decoded = decode_cursor(source, token)
+    if decoded is None:
+        raise ApiError(400, 'Неверный курсор.')
+    return (*decoded, int(limit))
+
+
+def _next_url(request, path, query, cursor):
+    query = query.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{path}?{query.urlencode()}')
+
+
+def stream(request, source, serialize):
+    """Страница списка потоком JSON."""
+    number, after, limit = _page_params(request, source)
+    iterate = getattr(source, 'iterate', source.rows)
+
+    def content():
+        yield '{"results": ['
+        last, count = None, 0
+        for row in iterate(after, limit + 1):
+            if count == limit:
+                yield '], "next": {}}}'.format(_dumps(_next_url(
+                    request, request.path, request.GET,
+                    encode_cursor(number + 1, source.key(last)))))
+                return
+            yield (', ' if count else '') + _dumps(serialize(request, row))
+            last, count = row, count + 1
+        yield '], "next": null}'
+
+    return StreamingHttpResponse(content(),
+                                 content_type='application/json')
+
+
+@api_view
+@conditional(lambda request: ('index',))
+def posts(request):
+    return stream(request, feeds.posts(), feeds.post_payload)
+
+
+@api_view
+@conditional(group_namespaces)
+def group_posts(request, slug):
+    # Существование группы уже проверено при расчёте ETag.
+    return stream(request, feeds.posts(Post.objects.filter(group__slug=slug)),
+                  feeds.post_payload)
+
+
+@api_view
+@conditional(profile_namespaces)
+def author_posts(request, username):
+    return stream(
+        request, feeds.posts(Post.objects.filter(author__username=username)),
+        feeds.post_payload)
+
+
+@api_view
+@authenticated
+@conditional(lambda request: follow_namespaces(request.user))
+def follow(request):
+    response = stream(request, feeds.follow_posts(request.user),
+                      feeds.post_payload)
+    patch_cache_control(response, private=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+@api_view
+@conditional(post_namespaces)
+def post_detail(request, post_id):
+    rows = feeds.posts(Post.objects.filter(pk=post_id)).rows(None, 1)
+    if not rows:
+        raise Http404
+    source, limit = feeds.comments(post_id), settings.API_PAGE_SIZE
+    comments = source.rows(None, limit + 1)
+    return JsonResponse({
+        **feeds.post_payload(request, rows[0]),
+        'comments': {
+            'results': [feeds.comment_payload(request, row)
+                        for row in comments[:limit]],
+            'next': _next_url(
+                request, reverse('api:post_comments', args=[post_id]),
+                QueryDict(mutable=True),
+                encode_cursor(2, source.key(comments[limit - 1])),
+            ) if len(comments) > limit else None,
+        },
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@api_view
+@conditional(post_namespaces)
+def post_comments(request, post_id):
+    return stream(request, feeds.comments(post_id), feeds.comment_payload)
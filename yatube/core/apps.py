@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import replicas, sqlite
+
+        connection_created.connect(sqlite.configure,
+                                   dispatch_uid='core.sqlite.configure')
+        connection_created.connect(replicas.install,
+                                   dispatch_uid='core.replicas.install')
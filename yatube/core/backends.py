@@ -0,0 +1,30 @@
+"""Шаблонный движок Django с замером времени отрисовки страниц."""
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from core import metrics
+
+
+class InstrumentedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.observe('yatube_template_render_seconds',
+                            {'template': self.origin.template_name},
+                            time.perf_counter() - started)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Считает только шаблоны верхнего уровня: include входят в их время."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(
+            super().get_template(template_name).template, self)
@@ -0,0 +1,357 @@
+"""Двухуровневый кэш без внешних сервисов.
+
+Первый уровень — небольшой LRU в памяти процесса, второй — общий для
+всех процессов файл SQLite (WAL) на локальном диске; большие значения
+хранятся сжатыми. Каждая запись и удаление попадают в журнал
+инвалидаций, который процессы читают не чаще раза в
+INVALIDATION_INTERVAL секунд и выбрасывают устаревшие ключи из своего
+LRU. Попадания и промахи по уровням видны в /metrics.
+
+    CACHES = {'default': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': '/var/lib/yatube/cache.sqlite3',
+        'OPTIONS': {'LOCAL_MAX_ENTRIES': 1000, ...},
+    }}
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import metrics
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS invalidation ('
+    'seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, origin TEXT, '
+    'created REAL NOT NULL)',
+)
+PLAIN, COMPRESSED = b'p', b'z'
+# Сколько записей в журнале инвалидаций хранится, с.
+LOG_RETENTION = 10 * 60
+# Раз в сколько записей проверять размер общего уровня.
+CULL_EVERY = 100
+CHUNK = 500
+
+
+class LocalTier:
+    """LRU в памяти процесса: ключ -> (срок, сериализованное значение)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            expires, payload = entry
+            if expires is not None and expires <= time.time():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return payload
+
+    def set(self, key, payload, expires):
+        with self.lock:
+            self.data[key] = expires, payload
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class TwoTierCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.local = LocalTier(int(options.get('LOCAL_MAX_ENTRIES', 1000)))
+        self.compress_min = int(options.get('COMPRESS_MIN_BYTES', 1024))
+        self.interval = float(options.get('INVALIDATION_INTERVAL', 0.1))
+        self.busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self.stats = {f'{tier}_{result}': 0 for tier in ('local', 'shared')
+                      for result in ('hit', 'miss')}
+        self._threads = threading.local()
+        self._sync_lock = threading.Lock()
+        self._pid = None
+        self._writes = 0
+
+    # Соединение и журнал инвалидаций.
+
+    def _start_process(self):
+        """Новое состояние процесса; после fork журнал читается заново."""
+        self._pid = os.getpid()
+        self.origin = uuid.uuid4().hex
+        self._threads = threading.local()
+        self._synced = time.monotonic()
+        connection = self._connect()
+        self._last_seen = connection.execute(
+            'SELECT COALESCE(MAX(seq), 0) FROM invalidation').fetchone()[0]
+
+    def _connect(self):
+        connection = getattr(self._threads, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, isolation_level=None,
+                check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._threads.connection = connection
+        return connection
+
+    def _db(self):
+        if self._pid != os.getpid():
+            self._start_process()
+        return self._connect()
+
+    def _sync(self, db):
+        """Применяет чужие инвалидации к своему LRU."""
+        if time.monotonic() - self._synced < self.interval:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._synced = time.monotonic()
+            oldest = db.execute(
+                'SELECT MIN(seq) FROM invalidation').fetchone()[0]
+            if oldest is not None and oldest > self._last_seen + 1:
+                # Журнал подрезан дальше прочитанного: верить LRU нельзя.
+                self.local.clear()
+            rows = db.execute(
+                'SELECT seq, key, origin FROM invalidation WHERE seq > ? '
+                'ORDER BY seq', (self._last_seen,)).fetchall()
+            for seq, key, origin in rows:
+                self._last_seen = seq
+                if origin == self.origin:
+                    continue
+                if key is None:
+                    self.local.clear()
+                else:
+                    self.local.delete(key)
+        finally:
+            self._sync_lock.release()
+
+    def _log(self, db, keys):
+        db.executemany(
+            'INSERT INTO invalidation (key, origin, created) VALUES (?, ?, ?)',
+            [(key, self.origin, time.time()) for key in keys])
+
+    # Сериализация и статистика.
+
+    def _encode(self, payload):
+        if len(payload) >= self.compress_min:
+            return COMPRESSED + zlib.compress(payload)
+        return PLAIN + payload
+
+    @staticmethod
+    def _decode(blob):
+        blob = bytes(blob)
+        if blob[:1] == COMPRESSED:
+            return zlib.decompress(blob[1:])
+        return blob[1:]
+
+    def _count(self, tier, hit, amount=1):
+        if not amount:
+            return
+        result = 'hit' if hit else 'miss'
+        self.stats[f'{tier}_{result}'] += amount
+        metrics.inc('yatube_cache_requests_total',
+                    {'tier': tier, 'result': result}, amount)
+
+    def hit_rates(self):
+        """Доля попаданий по уровням в этом процессе."""
+        rates = {}
+        for tier in ('local', 'shared'):
+            hits, misses = (self.stats[f'{tier}_hit'],
+                            self.stats[f'{tier}_miss'])
+            rates[tier] = hits / (hits + misses) if hits + misses else None
+        return rates
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    # Чтение.
+
+    def _fetch(self, db, keys):
+        """Значения из LRU, недостающие — одним запросом ко второму уровню."""
+        self._sync(db)
+        found, missing = {}, []
+        for key in keys:
+            payload = self.local.get(key)
+            if payload is None:
+                missing.append(key)
+            else:
+                found[key] = payload
+        self._count('local', True, len(found))
+        self._count('local', False, len(missing))
+        now = time.time()
+        for start in range(0, len(missing), CHUNK):
+            chunk = missing[start:start + CHUNK]
+            rows = db.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN ({}) '
+                'AND (expires IS NULL OR expires > ?)'.format(
+                    ','.join('?' * len(chunk))),
+                (*chunk, now)).fetchall()
+            for key, blob, expires in rows:
+                payload = found[key] = self._decode(blob)
+                self.local.set(key, payload, expires)
+        shared_hits = len(found) - (len(keys) - len(missing))
+        self._count('shared', True, shared_hits)
+        self._count('shared', False, len(missing) - shared_hits)
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        payload = self._fetch(self._db(), [key]).get(key)
+        return default if payload is None else pickle.loads(payload)
+
+    def get_many(self, keys, version=None):
+        names = {self._key(key, version): key for key in keys}
+        found = self._fetch(self._db(), list(names))
+        return {names[key]: pickle.loads(payload)
+                for key, payload in found.items()}
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._fetch(self._db(), [key])
+
+    # Запись.
+
+    def _write(self, items, timeout):
+        """items: [(ключ, значение)] в одной транзакции."""
+        db = self._db()
+        expires = self.get_backend_timeout(timeout)
+        rows = []
+        for key, value in items:
+            payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            rows.append((key, payload))
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                [(key, self._encode(payload), expires)
+                 for key, payload in rows])
+            self._log(db, [key for key, _ in rows])
+        for key, payload in rows:
+            self.local.set(key, payload, expires)
+        self._maybe_cull(db, len(rows))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write([(self._key(key, version), value)], timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write([(self._key(key, version), value)
+                     for key, value in data.items()], timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        db = self._db()
+        expires = self.get_backend_timeout(timeout)
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute('DELETE FROM cache WHERE key = ? AND expires <= ?',
+                       (key, time.time()))
+            added = db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self._encode(payload), expires)).rowcount == 1
+            if added:
+                self._log(db, [key])
+        if added:
+            self.local.set(key, payload, expires)
+            self._maybe_cull(db, 1)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            touched = db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key,
+                 time.time())).rowcount == 1
+            self._log(db, [key])
+        self.local.delete(key)
+        return touched
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.executemany('DELETE FROM cache WHERE key = ?',
+                           [(key,) for key in keys])
+            self._log(db, keys)
+        for key in keys:
+            self.local.delete(key)
+
+    def clear(self):
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute('DELETE FROM cache')
+            self._log(db, [None])
+        self.local.clear()
+
+    def _maybe_cull(self, db, written):
+        """Удаляет просроченное и лишнее сверх MAX_ENTRIES, подрезает журнал.
+
+        Вытесненные записи могут остаться в чужих LRU: их значения
+        по-прежнему верны, поэтому в журнал они не пишутся.
+        """
+        self._writes += written
+        if self._writes < CULL_EVERY:
+            return
+        self._writes = 0
+        now = time.time()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+            total = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if total > self._max_entries:
+                db.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY expires IS NULL, expires LIMIT ?)',
+                    (total - self._max_entries
+                     + self._max_entries // self._cull_frequency,))
+            db.execute('DELETE FROM invalidation WHERE created < ?',
+                       (now - LOG_RETENTION,))
+
+    def close(self, **kwargs):
+        # Соединения живут весь процесс: открывать SQLite на каждый
+        # запрос дороже, чем держать его.
+        pass
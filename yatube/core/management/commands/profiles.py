@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = ('Список снятых профилей запросов или сводка одного профиля: '
+            'время по областям, горячие функции и аллокации.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('profile_id', nargs='?',
+                            help='Профиль для подробной сводки.')
+        parser.add_argument('--limit', type=int, default=15)
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести сводку в JSON.')
+        parser.add_argument('--token', action='store_true',
+                            help='Выдать значение заголовка X-Profile.')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(profiling.make_token())
+        elif options['profile_id']:
+            self._summary(options['profile_id'], options)
+        else:
+            self._list(options['limit'])
+
+    def _list(self, limit):
+        captured = profiling.profiles()
+        if not captured:
+            self.stdout.write('Профилей нет.')
+        for profile in captured[:limit]:
+            self.stdout.write(
+                '{id}  {method} {path} -> {status}  {duration_ms} мс  '
+                '{peak_memory_kb} КБ  ({url_name}, {reason})'.format(
+                    **profile))
+
+    def _summary(self, profile_id, options):
+        try:
+            summary = profiling.summarize(profile_id, options['limit'])
+        except FileNotFoundError:
+            raise CommandError(f'Профиль {profile_id} не найден.')
+        if options['json']:
+            self.stdout.write(json.dumps(summary, ensure_ascii=False,
+                                         indent=2))
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            '{method} {path} -> {status}, {duration_ms} мс, пик памяти '
+            '{peak_memory_kb} КБ'.format(**summary)))
+        self.stdout.write('Собственное время по областям, мс:')
+        for area, own in summary['areas_ms'].items():
+            self.stdout.write(f'  {area:<10} {own:>10.3f}')
+        self.stdout.write('Функции по накопленному времени, мс:')
+        for item in summary['functions']:
+            self.stdout.write(
+                '  {cumulative_ms:>10.3f} {own_ms:>10.3f} {calls:>7}  '
+                '{function}'.format(**item))
+        self.stdout.write('Живые аллокации к концу запроса:')
+        for item in summary['allocations']:
+            self.stdout.write(
+                '  {size_kb:>10.1f} КБ {count:>7}  {where}'.format(**item))
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик из '
+            'DATABASE_REPLICAS — замена репликации для локального запуска.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, nargs='?',
+                            const=settings.REPLICA_SYNC_INTERVAL,
+                            default=None,
+                            help='Повторять каждые N секунд (без N — '
+                                 'REPLICA_SYNC_INTERVAL), пока не прервут; '
+                                 'копируются только отставшие реплики.')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплик нет: задайте YATUBE_REPLICAS.')
+        if options['interval'] is None:
+            self._sync(force=True)
+            return
+        while True:
+            self._sync(force=False)
+            time.sleep(options['interval'])
+
+    def _sync(self, force):
+        for alias in settings.DATABASE_REPLICAS:
+            if not force and replicas.lag(alias) == 0:
+                continue
+            started = time.monotonic()
+            replicas.replicate(alias)
+            self.stdout.write(
+                f'{alias}: {time.monotonic() - started:.2f} с')
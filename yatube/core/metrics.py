@@ -0,0 +1,230 @@
+"""Счётчики и гистограммы для /metrics в текстовом формате Prometheus.
+
+Каждый процесс копит значения в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд сбрасывает их в свой файл в METRICS_DIR
+(запись во временный файл и rename). /metrics складывает файлы всех
+процессов, поэтому данные не теряются под многопроцессным WSGI, а на
+запрос приходится лишь обновление словаря под блокировкой. Файлы
+завершившихся процессов (pid в начале имени) при сборе удаляются: их
+счётчики для Prometheus выглядят как сброс.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Имя метрики: (тип, описание, границы гистограммы).
+METRICS = {
+    'yatube_http_requests_total': (
+        'counter', 'Ответы по имени маршрута и статусу.', None),
+    'yatube_http_request_duration_seconds': (
+        'histogram', 'Время обработки запроса по имени маршрута.',
+        DEFAULT_BUCKETS),
+    'yatube_template_render_seconds': (
+        'histogram', 'Время отрисовки шаблона страницы.', DEFAULT_BUCKETS),
+    'yatube_db_queries_total': (
+        'counter', 'SQL-запросы по имени маршрута.', None),
+    'yatube_db_query_seconds_total': (
+        'counter', 'Время в базе по имени маршрута.', None),
+    'yatube_feed_cache_requests_total': (
+        'counter', 'Обращения к кэшу лент: попадания и промахи.', None),
+    'yatube_cache_requests_total': (
+        'counter', 'Обращения к уровням кэша: попадания и промахи.', None),
+    'yatube_db_read_routes_total': (
+        'counter', 'Читающие запросы по базе: реплика или основная.', None),
+    'yatube_db_replica_fallbacks_total': (
+        'counter', 'Чтения, повторённые в основной базе после ошибки '
+        'реплики.', None),
+    'yatube_db_write_retries_total': (
+        'counter', 'Повторы записи, заставшей базу занятой.', None),
+    'yatube_thumbnail_generation_seconds': (
+        'histogram', 'Создание всех миниатюр одной картинки.',
+        (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)),
+}
+
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Registry:
+    """Значения метрик текущего процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.flushed = 0.0
+        self.name = None
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.counters[name, _labels(labels)] += value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = name, _labels(labels)
+        with self.lock:
+            counts = self.histograms.get(key)
+            if counts is None:
+                counts = self.histograms[key] = [0] * len(buckets) + [0, 0.0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            counts[-2] += 1
+            counts[-1] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value
+                             in self.counters.items()],
+                'histograms': [[name, labels, list(counts)]
+                               for (name, labels), counts
+                               in self.histograms.items()],
+            }
+
+    def flush(self, force=False):
+        """Сбрасывает значения процесса в его файл, если пора."""
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        now = time.monotonic()
+        if not force and now - self.flushed < interval:
+            return
+        if not self.flush_lock.acquire(blocking=force):
+            return
+        try:
+            self.flushed = now
+            directory = metrics_dir()
+            os.makedirs(directory, exist_ok=True)
+            if self.name is None:
+                # pid может достаться новому процессу: не затираем его файл.
+                self.name = f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+            path = os.path.join(directory, self.name)
+            temporary = f'{path}.tmp'
+            with open(temporary, 'w', encoding='utf-8') as file:
+                json.dump(self.snapshot(), file)
+            os.replace(temporary, path)
+        finally:
+            self.flush_lock.release()
+
+
+registry = Registry()
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR',
+                   os.path.join(settings.BASE_DIR, 'metrics'))
+
+
+def inc(name, labels, value=1):
+    registry.inc(name, labels, value)
+
+
+def observe(name, labels, value):
+    registry.observe(name, labels, value)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _prune(directory, filename):
+    """Удаляет файл завершившегося процесса; True, если удалён."""
+    try:
+        pid = int(filename.split('-', 1)[0])
+    except ValueError:
+        return False
+    if _alive(pid):
+        return False
+    try:
+        os.remove(os.path.join(directory, filename))
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def collect():
+    """Сумма значений живых процессов."""
+    registry.flush(force=True)
+    counters = defaultdict(float)
+    histograms = {}
+    directory = metrics_dir()
+    for filename in os.listdir(directory):
+        if _prune(directory, filename) or not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename),
+                      encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data['counters']:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, counts in data['histograms']:
+            key = name, tuple(map(tuple, labels))
+            total = histograms.setdefault(key, [0] * len(counts))
+            for index, value in enumerate(counts):
+                total[index] += value
+    return counters, histograms
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join(f'{key}="{_escape(value)}"'
+                             for key, value in pairs)
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus 0.0.4."""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(
+                        f'{name}{_format_labels(labels)} {_number(value)}')
+            continue
+        for (metric, labels), counts in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    name, _format_labels(labels, [('le', bound)]),
+                    cumulative))
+            lines.append('{}_bucket{} {}'.format(
+                name, _format_labels(labels, [('le', '+Inf')]), counts[-2]))
+            lines.append(f'{name}_sum{_format_labels(labels)} '
+                         f'{_number(counts[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} '
+                         f'{counts[-2]}')
+    return '\n'.join(lines) + '\n'
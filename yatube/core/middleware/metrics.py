@@ -0,0 +1,34 @@
+"""Метрики запросов по имени маршрута для /metrics."""
+import time
+
+from core import metrics
+
+
+class MetricsMiddleware:
+    """Время ответа, статусы и работа с базой по имени маршрута.
+
+    Стоит первым в MIDDLEWARE, чтобы учитывать весь запрос; число и время
+    SQL-запросов берёт у QueryBudgetMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.observe('yatube_http_request_duration_seconds',
+                        {'view': view}, elapsed)
+        metrics.inc('yatube_http_requests_total',
+                    {'view': view, 'status': response.status_code})
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            metrics.inc('yatube_db_queries_total', {'view': view},
+                        stats.count)
+            metrics.inc('yatube_db_query_seconds_total', {'view': view},
+                        stats.time)
+        metrics.registry.flush()
+        return response
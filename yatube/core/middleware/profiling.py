@@ -0,0 +1,79 @@
+"""Профилирование отдельных запросов по требованию.
+
+Профиль снимается, если запрос пришёл от сотрудника с `?_profile=1`,
+с подписанным заголовком X-Profile (см. `manage.py profiles --token`)
+или попал в долю PROFILING_SAMPLE_RATE. В профиль попадает всё, что
+выполняется после этого middleware: представление, шаблоны с тегами
+thumbnail и cache, запросы к базе. Одновременно в процессе снимается
+только один профиль — tracemalloc общий для всех потоков.
+"""
+import cProfile
+import random
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+
+from core import profiling
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_FLAG = '_profile'
+
+_lock = threading.Lock()
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _reason(self, request):
+        token = request.META.get(HEADER)
+        if token and profiling.check_token(token):
+            return 'header'
+        if QUERY_FLAG in request.GET and request.user.is_staff:
+            return 'staff'
+        rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+        if rate and random.random() < rate:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        reason = self._reason(request)
+        if reason is None or not _lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self._profile(request, reason)
+        finally:
+            _lock.release()
+
+    def _profile(self, request, reason):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+        match = request.resolver_match
+        response['X-Profile-Id'] = profiling.save(profiler, snapshot, {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'url_name': match.view_name if match else None,
+            'status': response.status_code,
+            'reason': reason,
+            'duration_ms': round(elapsed * 1000, 3),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'created': time.time(),
+        })
+        return response
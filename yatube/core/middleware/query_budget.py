@@ -0,0 +1,109 @@
+"""Бюджет SQL-запросов на представление.
+
+Для каждого запроса считаются число SQL-запросов, время в базе и
+повторы одного и того же запроса с теми же параметрами. Управление
+транзакциями (BEGIN, SAVEPOINT, COMMIT и т. п.) не считается: оно
+зависит от atomic, а не от того, сколько данных читает представление. Результат
+доступен как `request.query_stats`, превышения пишутся в лог
+`yatube.queries`, а при QUERY_BUDGET_RAISE — приводят к исключению
+(так бюджеты проверяются в тестах, см. core.testing).
+
+Настройки:
+    QUERY_BUDGETS — {имя маршрута: допустимое число запросов};
+    QUERY_BUDGET_DEFAULT — бюджет остальных маршрутов, None — без него;
+    QUERY_BUDGET_DUPLICATES — допустимое число повторов;
+    QUERY_BUDGET_RAISE — бросать QueryBudgetExceeded вместо записи в лог.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('yatube.queries')
+
+TRANSACTION_SQL = re.compile(
+    r'\s*(BEGIN|SAVEPOINT|RELEASE|COMMIT|ROLLBACK|END)\b', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    """Обёртка execute_wrapper, собирающая статистику запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if TRANSACTION_SQL.match(sql):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql, repr(params)] += 1
+
+    @property
+    def duplicates(self):
+        """Повторы: {sql: сколько раз выполнен лишний раз}."""
+        result = Counter()
+        for (sql, _), total in self.statements.items():
+            if total > 1:
+                result[sql] += total - 1
+        return result
+
+
+def budget(url_name):
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    return budgets.get(url_name,
+                       getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+
+
+def violations(url_name, stats):
+    """Описания нарушений бюджета; пустой список — всё в порядке."""
+    problems = []
+    limit = budget(url_name)
+    if limit is not None and stats.count > limit:
+        problems.append(f'{stats.count} запросов при бюджете {limit}')
+    duplicates = stats.duplicates
+    allowed = getattr(settings, 'QUERY_BUDGET_DUPLICATES', 0)
+    if sum(duplicates.values()) > allowed:
+        sql, repeats = duplicates.most_common(1)[0]
+        problems.append(
+            f'{sum(duplicates.values())} повторов, чаще всего '
+            f'({repeats + 1} раз): {sql}')
+    return problems
+
+
+class QueryBudgetMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = request.query_stats = QueryStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        match = request.resolver_match
+        url_name = match.view_name if match else None
+        problems = violations(url_name, stats)
+        logger.debug('%s: %d запросов, %.1f мс', url_name or request.path,
+                     stats.count, stats.time * 1000)
+        if problems:
+            message = '{}: {}'.format(url_name or request.path,
+                                      '; '.join(problems))
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,35 @@
+"""Выбор реплики для читающих страниц (см. core.replicas)."""
+from django.conf import settings
+
+from core import metrics, replicas
+
+
+class ReplicaMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas.route(None)
+        try:
+            response = self.get_response(request)
+            if replicas.wrote():
+                response.set_cookie(
+                    replicas.PIN_COOKIE, '1',
+                    max_age=replicas.pin_seconds(),
+                    httponly=True, samesite='Lax')
+        finally:
+            replicas.route(None)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method not in ('GET', 'HEAD')
+                or replicas.PIN_COOKIE in request.COOKIES
+                or request.resolver_match.view_name
+                not in getattr(settings, 'REPLICA_VIEWS', ())):
+            return None
+        alias = replicas.choose()
+        replicas.route(alias)
+        metrics.inc('yatube_db_read_routes_total',
+                    {'database': alias or 'default'})
+        return None
@@ -0,0 +1,130 @@
+"""Профили отдельных запросов: cProfile и снимки tracemalloc.
+
+Каждый профиль — три файла в PROFILING_DIR с общим именем:
+`<id>.prof` (pstats), `<id>.tracemalloc` (снимок памяти) и
+`<id>.json` (адрес, маршрут, статус, длительность, пик памяти).
+"""
+import json
+import os
+import pstats
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+
+SALT = 'yatube.profiling'
+TOKEN_VALUE = 'profile'
+
+# Области, по которым раскладывается собственное время функций.
+AREAS = (
+    ('thumbnail', ('sorl',)),
+    ('cache', ('django/core/cache', 'django/templatetags/cache',
+               'core/cache', 'posts/caching',
+               'posts/templatetags/feed_cache')),
+    ('template', ('django/template',)),
+    ('db', ('django/db', 'sqlite3')),
+)
+
+
+def directory():
+    return getattr(settings, 'PROFILING_DIR',
+                   os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def make_token():
+    """Значение заголовка X-Profile, включающего профилирование."""
+    return signing.dumps(TOKEN_VALUE, salt=SALT)
+
+
+def check_token(token):
+    max_age = getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 60 * 60)
+    try:
+        return signing.loads(token, salt=SALT,
+                             max_age=max_age) == TOKEN_VALUE
+    except signing.BadSignature:
+        return False
+
+
+def _path(profile_id, suffix):
+    return os.path.join(directory(), f'{profile_id}{suffix}')
+
+
+def save(profiler, snapshot, meta):
+    """Сохраняет профиль и удаляет самые старые сверх PROFILING_KEEP."""
+    os.makedirs(directory(), exist_ok=True)
+    profile_id = '{}-{}'.format(
+        datetime.now().strftime('%Y%m%d%H%M%S%f'), uuid.uuid4().hex[:6])
+    profiler.dump_stats(_path(profile_id, '.prof'))
+    snapshot.dump(_path(profile_id, '.tracemalloc'))
+    with open(_path(profile_id, '.json'), 'w', encoding='utf-8') as file:
+        json.dump({'id': profile_id, **meta}, file, ensure_ascii=False)
+    _prune(getattr(settings, 'PROFILING_KEEP', 200))
+    return profile_id
+
+
+def _prune(keep):
+    for profile in profiles()[keep:]:
+        for suffix in ('.prof', '.tracemalloc', '.json'):
+            try:
+                os.remove(_path(profile['id'], suffix))
+            except FileNotFoundError:
+                pass
+
+
+def profiles():
+    """Описания сохранённых профилей, новые — первыми."""
+    if not os.path.isdir(directory()):
+        return []
+    result = []
+    for name in sorted(os.listdir(directory()), reverse=True):
+        if name.endswith('.json'):
+            with open(os.path.join(directory(), name),
+                      encoding='utf-8') as file:
+                result.append(json.load(file))
+    return result
+
+
+def load(profile_id):
+    with open(_path(profile_id, '.json'), encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _area(filename, name):
+    where = f"{filename.replace(os.sep, '/')}:{name}"
+    for area, markers in AREAS:
+        if any(marker in where for marker in markers):
+            return area
+    return 'other'
+
+
+def summarize(profile_id, limit=15):
+    """Сводка профиля: время по областям, горячие функции, аллокации."""
+    stats = pstats.Stats(_path(profile_id, '.prof'))
+    areas = {}
+    functions = []
+    for (filename, line, name), (_, calls, own, total, _) in (
+            stats.stats.items()):
+        area = _area(filename, name)
+        areas[area] = areas.get(area, 0) + own
+        functions.append({
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'own_ms': round(own * 1000, 3),
+            'cumulative_ms': round(total * 1000, 3),
+        })
+    functions.sort(key=lambda item: item['cumulative_ms'], reverse=True)
+    snapshot = tracemalloc.Snapshot.load(_path(profile_id, '.tracemalloc'))
+    allocations = [
+        {'where': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1),
+         'count': stat.count}
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
+    return {
+        **load(profile_id),
+        'areas_ms': {area: round(own * 1000, 3)
+                     for area, own in sorted(areas.items())},
+        'functions': functions[:limit],
+        'allocations': allocations,
+    }
@@ -0,0 +1,215 @@
+"""Реплики базы только для чтения.
+
+Ленты и страницы постов (REPLICA_VIEWS) читают с реплики из
+DATABASE_REPLICAS, всё остальное и любые записи идут в `default`.
+Реплика годится, если её снимок отстаёт от основной базы не больше
+чем на REPLICA_MAX_LAG секунд и она не падала последние
+REPLICA_RETRY_SECONDS секунд; из годных выбирается случайная.
+Отставание считается по времени изменения файлов, то есть от первой
+записи после снимка, поэтому REPLICA_MAX_LAG должен быть не меньше
+REPLICA_SYNC_INTERVAL — интервала `manage.py replicate --interval`.
+Чтение, упавшее на реплике, тут же повторяется в основной базе (см.
+fallback), а реплика до конца запроса и на REPLICA_RETRY_SECONDS
+выбывает.
+После записи пользователь pin_seconds() секунд читает только из
+основной базы — так он сразу видит свой пост, комментарий или подписку:
+закрепление длится дольше, чем годная реплика может отставать, плюс
+цикл копирования.
+
+Локально репликацию заменяет `manage.py replicate`: он копирует файл
+основной базы в файлы реплик через backup API SQLite и кладёт рядом
+`<реплика>.state` с временем изменения скопированного снимка.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from core import metrics
+
+PIN_COOKIE = 'pin_primary'
+
+_local = threading.local()
+_states = {}
+_down = {}
+
+
+def _path(alias):
+    return settings.DATABASES[alias]['NAME']
+
+
+def source_mtime(path):
+    """Время последней записи в файл SQLite, включая его WAL."""
+    mtimes = [0.0]
+    for name in (path, f'{path}-wal'):
+        try:
+            mtimes.append(os.stat(name).st_mtime)
+        except FileNotFoundError:
+            pass
+    return max(mtimes)
+
+
+def replicate(alias):
+    """Копирует основную базу в реплику и возвращает состояние снимка."""
+    primary, target = _path(DEFAULT_DB_ALIAS), _path(alias)
+    # Время берётся до копирования: запись во время копирования
+    # останется отставанием до следующего прогона.
+    state = {'source_mtime': source_mtime(primary)}
+    source = sqlite3.connect(primary)
+    destination = sqlite3.connect(target, timeout=30)
+    try:
+        source.backup(destination)
+    finally:
+        destination.close()
+        source.close()
+    state['synced_at'] = time.time()
+    temporary = f'{target}.state.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(state, file)
+    os.replace(temporary, f'{target}.state')
+    return state
+
+
+def read_state(alias):
+    """Состояние снимка реплики; перечитывается, только если файл менялся."""
+    name = f'{_path(alias)}.state'
+    try:
+        mtime = os.stat(name).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _states.get(name)
+    if cached is None or cached[0] != mtime:
+        with open(name, encoding='utf-8') as file:
+            cached = _states[name] = mtime, json.load(file)
+    return cached[1]
+
+
+def lag(alias):
+    """На сколько секунд основная база ушла вперёд от снимка реплики."""
+    state = read_state(alias)
+    if state is None:
+        return None
+    current = source_mtime(_path(DEFAULT_DB_ALIAS))
+    return max(current - state['source_mtime'], 0.0)
+
+
+def pin_seconds():
+    """REPLICA_PIN_SECONDS, но не меньше REPLICA_MAX_LAG плюс интервал
+    копирования: короче закрепления отставшая реплика отдала бы страницу
+    без только что записанного."""
+    least = (getattr(settings, 'REPLICA_MAX_LAG', 10)
+             + getattr(settings, 'REPLICA_SYNC_INTERVAL', 5))
+    return max(getattr(settings, 'REPLICA_PIN_SECONDS', least), least)
+
+
+def mark_down(alias):
+    _down[alias] = time.monotonic() + getattr(
+        settings, 'REPLICA_RETRY_SECONDS', 30)
+
+
+def _fail(alias):
+    """Реплика выбывает, чтения потока уходят в основную базу."""
+    mark_down(alias)
+    if current() == alias:
+        _local.replica = None
+    metrics.inc('yatube_db_replica_fallbacks_total', {'database': alias})
+
+
+def healthy():
+    max_lag = getattr(settings, 'REPLICA_MAX_LAG', 10)
+    now = time.monotonic()
+    result = []
+    for alias in getattr(settings, 'DATABASE_REPLICAS', []):
+        if _down.get(alias, 0) > now:
+            continue
+        behind = lag(alias)
+        if behind is not None and behind <= max_lag:
+            result.append(alias)
+    return result
+
+
+def choose():
+    aliases = healthy()
+    return random.choice(aliases) if aliases else None
+
+
+def route(alias):
+    """Чтения текущего потока идут в alias (None — в основную базу)."""
+    _local.replica = alias
+    _local.wrote = False
+
+
+def current():
+    return getattr(_local, 'replica', None)
+
+
+def wrote():
+    return getattr(_local, 'wrote', False)
+
+
+def fallback(execute, sql, params, many, context):
+    """execute_wrapper реплики: упавший запрос повторяется в `default`.
+
+    Результат читается из курсора основной базы, подставленного в
+    курсор реплики, поэтому вызывающий код ошибки не замечает.
+    """
+    try:
+        return execute(sql, params, many, context)
+    except DatabaseError:
+        alias = context['connection'].alias
+        if alias not in getattr(settings, 'DATABASE_REPLICAS', []):
+            raise
+        _fail(alias)
+    cursor = context['cursor']
+    cursor.cursor.close()
+    primary = connections[DEFAULT_DB_ALIAS].cursor()
+    cursor.cursor = primary.cursor
+    if many:
+        return primary.executemany(sql, params)
+    return primary.execute(sql, params)
+
+
+def install(sender, connection, **kwargs):
+    """Обработчик connection_created: fallback на соединения реплик."""
+    if (connection.alias in getattr(settings, 'DATABASE_REPLICAS', [])
+            and fallback not in connection.execute_wrappers):
+        connection.execute_wrappers.append(fallback)
+
+
+def _connected(alias):
+    """Открывает соединение реплики; не открылось — реплика выбывает."""
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        _fail(alias)
+        return False
+    return True
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if wrote():
+            return DEFAULT_DB_ALIAS
+        alias = current()
+        if alias is not None and not _connected(alias):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # После записи и этот запрос дочитывает из основной базы.
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in getattr(settings, 'DATABASE_REPLICAS', []):
+            return False
+        return None
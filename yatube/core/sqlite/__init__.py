@@ -0,0 +1,59 @@
+"""Боевой режим SQLite.
+
+Движок `core.sqlite` начинает транзакции с BEGIN IMMEDIATE: пишущие
+транзакции выстраиваются в очередь на блокировке ещё до первого
+чтения, а не падают с «database is locked» при её повышении. Прагмы
+из SQLITE_PRAGMAS (WAL, synchronous=NORMAL, mmap, кэш страниц,
+busy_timeout) ставятся на каждое новое соединение этого движка.
+Если блокировка так и не досталась за busy_timeout, `retry_on_lock`
+повторяет запись с растущей паузой.
+"""
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+from core import metrics
+
+ENGINE = 'core.sqlite'
+
+
+def configure(sender, connection, **kwargs):
+    """Обработчик connection_created: прагмы для соединений движка."""
+    if connection.settings_dict['ENGINE'] != ENGINE:
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    return 'database is locked' in str(error)
+
+
+def retry_on_lock(func=None, *, using=DEFAULT_DB_ALIAS):
+    """Повторяет func, пока база занята другим писателем.
+
+    Не больше SQLITE_WRITE_RETRIES раз, пауза удваивается от
+    SQLITE_WRITE_BACKOFF с разбросом. Внутри внешней транзакции
+    повторять нечего — ошибка пробрасывается.
+    """
+    if func is None:
+        return functools.partial(retry_on_lock, using=using)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = getattr(settings, 'SQLITE_WRITE_RETRIES', 3)
+        backoff = getattr(settings, 'SQLITE_WRITE_BACKOFF', 0.05)
+        for attempt in range(retries + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as error:
+                if (not is_locked(error) or attempt == retries
+                        or connections[using].in_atomic_block):
+                    raise
+            metrics.inc('yatube_db_write_retries_total',
+                        {'function': func.__name__})
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+    return wrapper
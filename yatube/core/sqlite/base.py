@@ -0,0 +1,9 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def _start_transaction_under_autocommit(self):
+        # Блокировка на запись берётся сразу и ждёт busy_timeout;
+        # отложенная транзакция падала бы при первой записи после чтения.
+        self.cursor().execute('BEGIN IMMEDIATE')
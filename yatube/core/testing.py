@@ -0,0 +1,24 @@
+"""Помощники тестов проекта."""
+from django.test import TestCase, TransactionTestCase, override_settings
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetTestCase(TestCase):
+    """TestCase, в котором превышение бюджета запросов роняет тест.
+
+    QueryBudgetMiddleware бросает QueryBudgetExceeded, и тестовый клиент
+    пробрасывает его из любого запроса.
+    """
+
+    def assertQueryBudget(self, response, limit):
+        """Проверяет более жёсткий бюджет для отдельного запроса."""
+        stats = response.wsgi_request.query_stats
+        self.assertLessEqual(
+            stats.count, limit,
+            f'{response.wsgi_request.path}: {stats.count} запросов '
+            f'при бюджете {limit}')
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class QueryBudgetTransactionTestCase(TransactionTestCase):
+    """То же для тестов, которым нужны настоящие транзакции."""
@@ -0,0 +1,517 @@
+import shutil
+import sqlite3
+import tempfile
+import json
+import os
+import subprocess
+import sys
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.core.management import call_command
+from django.db import OperationalError, connections, transaction
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core import metrics, profiling, replicas, sqlite
+from core.cache import TwoTierCache
+from core.middleware.query_budget import (QueryBudgetExceeded,
+                                          QueryBudgetMiddleware)
+from posts.models import Post
+
+User = get_user_model()
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    """Учёт и бюджет SQL-запросов на представление."""
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(QUERY_BUDGETS={'posts:main_page': 0})
+    def test_over_budget_is_logged(self):
+        """Превышение бюджета попадает в лог с именем маршрута."""
+        with self.assertLogs('yatube.queries', 'WARNING') as logs:
+            response = self.client.get(reverse('posts:main_page'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('posts:main_page', logs.output[0])
+        self.assertGreater(response.wsgi_request.query_stats.count, 0)
+
+    @override_settings(QUERY_BUDGETS={'posts:main_page': 0},
+                       QUERY_BUDGET_RAISE=True)
+    def test_over_budget_raises_in_strict_mode(self):
+        """В строгом режиме превышение роняет запрос."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:main_page'))
+
+    def test_duplicates_are_reported(self):
+        """Один и тот же запрос с теми же параметрами — повтор."""
+        def view(request):
+            for _ in range(3):
+                User.objects.filter(username='same').exists()
+            User.objects.filter(username='other').exists()
+            return HttpResponse()
+
+        request = RequestFactory().get('/n-plus-one/')
+        with self.assertLogs('yatube.queries', 'WARNING') as logs:
+            QueryBudgetMiddleware(view)(request)
+        stats = request.query_stats
+        self.assertEqual(stats.count, 4)
+        self.assertEqual(sum(stats.duplicates.values()), 2)
+        self.assertIn('/n-plus-one/: 2 повторов', logs.output[0])
+
+    def test_transaction_control_not_counted(self):
+        """BEGIN, SAVEPOINT и RELEASE не считаются ни запросами, ни
+        повторами: повторяется только сам UPDATE."""
+        def view(request):
+            for _ in range(2):
+                with transaction.atomic():
+                    User.objects.filter(username='same').update(
+                        is_active=False)
+            return HttpResponse()
+
+        request = RequestFactory().get('/atomic/')
+        QueryBudgetMiddleware(view)(request)
+        stats = request.query_stats
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(sum(stats.duplicates.values()), 1)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Профилирование запросов по требованию."""
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(PROFILING_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.url = reverse('posts:main_page')
+
+    def test_not_profiled_by_default(self):
+        """Обычные запросы и флаг от не-сотрудника не профилируются."""
+        response = self.client.get(self.url, {'_profile': 1})
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(profiling.profiles(), [])
+
+    def test_staff_query_flag(self):
+        """Сотрудник включает профиль флагом в адресе."""
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(self.url, {'_profile': 1})
+        profile_id = response['X-Profile-Id']
+        summary = profiling.summarize(profile_id)
+        self.assertEqual(summary['url_name'], 'posts:main_page')
+        self.assertEqual(summary['reason'], 'staff')
+        self.assertGreater(summary['areas_ms']['template'], 0)
+        self.assertTrue(summary['functions'])
+
+    def test_feed_cache_is_cache_area(self):
+        """Карточки и версии лент считаются кэшем, а не шаблонами."""
+        for filename, name in (
+                ('/app/posts/templatetags/feed_cache.py', 'post_cards'),
+                ('/app/posts/caching.py', 'versions')):
+            with self.subTest(filename=filename):
+                self.assertEqual(profiling._area(filename, name), 'cache')
+
+    def test_signed_header(self):
+        """Подписанный заголовок включает профиль, поддельный — нет."""
+        response = self.client.get(self.url, HTTP_X_PROFILE='forged')
+        self.assertNotIn('X-Profile-Id', response)
+        token = StringIO()
+        call_command('profiles', token=True, stdout=token)
+        response = self.client.get(
+            self.url, HTTP_X_PROFILE=token.getvalue().strip())
+        self.assertIn('X-Profile-Id', response)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_KEEP=2)
+    def test_sampling_keeps_latest(self):
+        """Выборочные профили хранятся в ограниченном числе."""
+        ids = [self.client.get(self.url)['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual([profile['id'] for profile in profiling.profiles()],
+                         sorted(ids[1:], reverse=True))
+        out = StringIO()
+        call_command('profiles', stdout=out)
+        self.assertIn(ids[-1], out.getvalue())
+        out = StringIO()
+        call_command('profiles', ids[-1], stdout=out)
+        self.assertIn('Собственное время по областям', out.getvalue())
+
+
+class MetricsTests(TestCase):
+    """Метрики Prometheus на /metrics."""
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = mock.patch.object(metrics, 'registry', metrics.Registry())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scrape(self, **extra):
+        response = self.client.get(reverse('metrics'), **extra)
+        return response, response.content.decode()
+
+    def test_request_metrics(self):
+        """Статусы, гистограмма времени, шаблоны, база и кэш ленты."""
+        self.client.force_login(User.objects.create_user(username='reader'))
+        for _ in range(2):
+            self.client.get(reverse('posts:main_page'))
+        response, text = self.scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        for line in (
+            'yatube_http_requests_total'
+            '{status="200",view="posts:main_page"} 2.0',
+            'yatube_http_request_duration_seconds_count'
+            '{view="posts:main_page"} 2',
+            'yatube_http_request_duration_seconds_bucket'
+            '{view="posts:main_page",le="+Inf"} 2',
+            'yatube_feed_cache_requests_total'
+            '{feed="index",layer="page",result="hit"} 1.0',
+            'yatube_feed_cache_requests_total'
+            '{feed="index",layer="page",result="miss"} 1.0',
+            'yatube_feed_cache_requests_total'
+            '{feed="index_feed",layer="fragment",result="miss"} 1.0',
+            'yatube_template_render_seconds_count'
+            '{template="posts/index.html"} 2',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, text)
+        self.assertIn('yatube_db_queries_total{view="posts:main_page"}',
+                      text)
+
+    def test_processes_are_summed(self):
+        """Файлы других процессов складываются с текущим."""
+        self.client.get(reverse('posts:main_page'))
+        other = {
+            'counters': [['yatube_http_requests_total',
+                          [['status', '200'], ['view', 'posts:main_page']],
+                          3]],
+            'histograms': [],
+        }
+        with open(os.path.join(self.directory,
+                               f'{os.getppid()}-other.json'), 'w') as file:
+            json.dump(other, file)
+        _, text = self.scrape()
+        self.assertIn('yatube_http_requests_total'
+                      '{status="200",view="posts:main_page"} 4.0', text)
+
+    def test_dead_processes_are_pruned(self):
+        """Файлы завершившихся процессов удаляются при сборе."""
+        finished = subprocess.Popen([sys.executable, '-c', ''])
+        finished.wait()
+        dead = os.path.join(self.directory, f'{finished.pid}-dead.json')
+        with open(dead, 'w') as file:
+            json.dump({'counters': [['yatube_db_write_retries_total',
+                                     [], 5]],
+                       'histograms': []}, file)
+        _, text = self.scrape()
+        self.assertNotIn('yatube_db_write_retries_total 5', text)
+        self.assertFalse(os.path.exists(dead))
+
+    def test_access(self):
+        """Снаружи и через прокси — только по токену или сотрудникам."""
+        outside = {'REMOTE_ADDR': '203.0.113.7'}
+        response, _ = self.scrape(**outside)
+        self.assertEqual(response.status_code, 403)
+        proxied = {'REMOTE_ADDR': '127.0.0.1',
+                   'HTTP_X_FORWARDED_FOR': '203.0.113.7'}
+        self.assertEqual(self.scrape(**proxied)[0].status_code, 403)
+        self.assertEqual(
+            self.scrape(REMOTE_ADDR='127.0.0.1')[0].status_code, 200)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.scrape(
+                HTTP_AUTHORIZATION='Bearer wrong', **proxied)[0].status_code,
+                403)
+            self.assertEqual(self.scrape(
+                HTTP_AUTHORIZATION='Bearer secret', **proxied)[0].status_code,
+                200)
+        self.client.force_login(
+            User.objects.create_user(username='ops', is_staff=True))
+        response, _ = self.scrape(**outside)
+        self.assertEqual(response.status_code, 200)
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    """LRU процесса поверх общего файла SQLite."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.location = os.path.join(directory, 'cache.sqlite3')
+
+    def backend(self, **options):
+        options.setdefault('INVALIDATION_INTERVAL', 0)
+        return TwoTierCache(self.location, {'OPTIONS': options})
+
+    def test_values_are_shared_between_processes(self):
+        """Запись одного процесса читается другим через общий уровень."""
+        first, second = self.backend(), self.backend()
+        first.set('key', {'value': 1})
+        self.assertEqual(second.get('key'), {'value': 1})
+        self.assertEqual(second.get('key'), {'value': 1})
+        self.assertEqual(second.stats, {'local_hit': 1, 'local_miss': 1,
+                                        'shared_hit': 1, 'shared_miss': 0})
+        self.assertEqual(second.hit_rates(), {'local': 0.5, 'shared': 1.0})
+        self.assertIsNone(second.get('missing'))
+        self.assertFalse(second.add('key', 'other'))
+        self.assertEqual(second.get_many(['key', 'missing']),
+                         {'key': {'value': 1}})
+
+    def test_invalidation_is_broadcast(self):
+        """Запись и удаление выбрасывают ключ из LRU других процессов."""
+        first, second = self.backend(), self.backend()
+        first.set('key', 'old')
+        self.assertEqual(second.get('key'), 'old')
+        first.set('key', 'new')
+        self.assertEqual(second.get('key'), 'new')
+        first.delete('key')
+        self.assertIsNone(second.get('key'))
+        second.set('other', 1)
+        first.clear()
+        self.assertIsNone(second.get('other'))
+
+    def test_local_tier_is_bounded(self):
+        """LRU процесса вытесняет давно не читанные ключи."""
+        cache_ = self.backend(LOCAL_MAX_ENTRIES=2)
+        for key in ('a', 'b', 'c'):
+            cache_.set(key, key)
+        self.assertEqual(list(cache_.local.data), [':1:b', ':1:c'])
+        self.assertEqual(cache_.get('a'), 'a')
+        self.assertEqual(list(cache_.local.data), [':1:c', ':1:a'])
+
+    def test_large_values_are_compressed(self):
+        """Большие значения хранятся в общем уровне сжатыми."""
+        cache_ = self.backend(COMPRESS_MIN_BYTES=100)
+        cache_.set_many({'small': 'x', 'large': 'x' * 10000})
+        rows = dict(cache_._db().execute('SELECT key, value FROM cache'))
+        self.assertEqual(bytes(rows[':1:small'])[:1], b'p')
+        self.assertEqual(bytes(rows[':1:large'])[:1], b'z')
+        self.assertLess(len(rows[':1:large']), 1000)
+        self.assertEqual(self.backend().get('large'), 'x' * 10000)
+
+    def test_expired_values_are_missing(self):
+        """Истёкшие записи не отдаются ни одним уровнем."""
+        cache_ = self.backend()
+        cache_.set('key', 'value', timeout=0)
+        self.assertIsNone(cache_.get('key'))
+        self.assertTrue(cache_.add('key', 'fresh'))
+        self.assertEqual(cache_.get('key'), 'fresh')
+
+    def test_shared_tier_is_culled(self):
+        """Общий уровень не растёт сверх MAX_ENTRIES."""
+        cache_ = self.backend(MAX_ENTRIES=50)
+        cache_.set_many({f'key{number}': number for number in range(150)})
+        count = cache_._db().execute('SELECT COUNT(*) FROM cache').fetchone()
+        self.assertLessEqual(count[0], 50)
+
+
+class SQLiteProductionTests(SimpleTestCase):
+    """Боевой режим SQLite: прагмы, BEGIN IMMEDIATE, повтор записи."""
+
+    alias = 'sqlite_production'
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'db.sqlite3')
+        connections.databases[self.alias] = {
+            **connections.databases['default'],
+            'ENGINE': sqlite.ENGINE,
+            'NAME': self.path,
+        }
+        self.addCleanup(connections.databases.pop, self.alias)
+        self.addCleanup(self.close)
+
+    def close(self):
+        connections[self.alias].close()
+        del connections[self.alias]
+
+    def test_pragmas_are_applied(self):
+        """Новое соединение движка получает прагмы из настроек."""
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_transaction_takes_write_lock(self):
+        """Транзакция сразу занимает базу на запись."""
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with transaction.atomic(using=self.alias):
+            with self.assertRaises(sqlite3.OperationalError):
+                other.execute('BEGIN IMMEDIATE')
+
+    @mock.patch('core.sqlite.time.sleep')
+    def test_locked_write_is_retried(self, sleep):
+        """Запись повторяется с растущей паузой, но не бесконечно."""
+        calls = []
+
+        @sqlite.retry_on_lock
+        def write(fail_times):
+            calls.append(1)
+            if len(calls) <= fail_times:
+                raise OperationalError('database is locked')
+            return 'done'
+
+        self.assertEqual(write(2), 'done')
+        self.assertEqual(len(calls), 3)
+        first, second = (call[0][0] for call in sleep.call_args_list)
+        self.assertLess(first, second)
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            write(10)
+        self.assertEqual(len(calls), 4)
+
+    def test_other_errors_are_not_retried(self):
+        """Ошибки, кроме занятой базы, пробрасываются сразу."""
+        write = mock.Mock(side_effect=OperationalError('no such table'),
+                          __name__='write')
+        with self.assertRaises(OperationalError):
+            sqlite.retry_on_lock(write)()
+        self.assertEqual(write.call_count, 1)
+
+
+class ReplicaTests(TestCase):
+    """Чтение лент с реплик и закрепление за основной базой."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(replicas._down.clear)
+        self.addCleanup(replicas.route, None)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.paths = {
+            'default': os.path.join(directory, 'primary.sqlite3'),
+            'replica1': os.path.join(directory, 'replica1.sqlite3'),
+        }
+        patcher = mock.patch.object(replicas, '_path', self.paths.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        primary = sqlite3.connect(self.paths['default'])
+        primary.execute('CREATE TABLE item (name TEXT)')
+        primary.execute("INSERT INTO item VALUES ('first')")
+        primary.commit()
+        primary.close()
+
+    def add_replica(self, alias, path):
+        """Соединение alias с файлом path, как у реплики из настроек."""
+        patcher = mock.patch.dict(connections.databases, {alias: {
+            **connections.databases['default'], 'NAME': path}})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(delattr, connections._connections, alias)
+        self.addCleanup(lambda: connections[alias].close())
+
+    def touch_primary(self, ahead):
+        mtime = os.stat(self.paths['default']).st_mtime + ahead
+        os.utime(self.paths['default'], (mtime, mtime))
+
+    @override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_MAX_LAG=0)
+    def test_replica_health(self):
+        """Реплика годится, пока снимок не отстал и она не падала."""
+        self.assertEqual(replicas.healthy(), [])
+        replicas.replicate('replica1')
+        replica = sqlite3.connect(self.paths['replica1'])
+        self.addCleanup(replica.close)
+        self.assertEqual(replica.execute('SELECT name FROM item').fetchall(),
+                         [('first',)])
+        self.assertEqual(replicas.lag('replica1'), 0)
+        self.assertEqual(replicas.choose(), 'replica1')
+        self.touch_primary(3)
+        self.assertAlmostEqual(replicas.lag('replica1'), 3, places=3)
+        self.assertIsNone(replicas.choose())
+        with override_settings(REPLICA_MAX_LAG=5):
+            self.assertEqual(replicas.healthy(), ['replica1'])
+            replicas.mark_down('replica1')
+            self.assertEqual(replicas.healthy(), [])
+
+    def test_router(self):
+        """Чтения идут в выбранную реплику до первой записи."""
+        self.add_replica('replica1', self.paths['replica1'])
+        router = replicas.ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Post))
+        replicas.route('replica1')
+        self.assertEqual(router.db_for_read(Post), 'replica1')
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertEqual(router.db_for_read(Post), 'default')
+        with override_settings(DATABASE_REPLICAS=['replica1']):
+            self.assertFalse(router.allow_migrate('replica1', 'posts'))
+            self.assertIsNone(router.allow_migrate('default', 'posts'))
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_failed_read_falls_back(self):
+        """Упавшее на реплике чтение отдаёт данные основной базы."""
+        self.add_replica('replica1', self.paths['replica1'])
+        Post.objects.create(author=User.objects.create_user(username='u'),
+                            text='Пост')
+        replicas.route('replica1')
+        self.assertEqual(list(Post.objects.values_list('text', flat=True)),
+                         ['Пост'])
+        self.assertIsNone(replicas.current())
+        self.assertNotIn('replica1', replicas.healthy())
+        self.assertEqual(Post.objects.count(), 1)
+
+    @override_settings(DATABASE_REPLICAS=['replica2'])
+    def test_unreachable_replica_not_routed(self):
+        """Реплика, к которой не подключиться, выбывает до запроса."""
+        self.add_replica('replica2', os.path.join(
+            self.paths['replica1'], 'missing', 'db.sqlite3'))
+        replicas.route('replica2')
+        router = replicas.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertIn('replica2', replicas._down)
+        self.assertIsNone(router.db_for_read(Post))
+
+    @override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_MAX_LAG=10,
+                       REPLICA_SYNC_INTERVAL=5, REPLICA_PIN_SECONDS=1)
+    def test_pin_outlasts_lagging_replica(self):
+        """Запись читается из основной базы, пока годная реплика может
+        её не содержать."""
+        self.add_replica('replica1', self.paths['replica1'])
+        replicas.replicate('replica1')
+        self.touch_primary(10)
+        self.assertEqual(replicas.healthy(), ['replica1'])
+        self.assertEqual(replicas.pin_seconds(), 15)
+        user = User.objects.create_user(username='writer')
+        post = Post.objects.create(author=user, text='Пост')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[post.pk]), {'text': 'Свой'})
+        self.assertEqual(
+            response.cookies[replicas.PIN_COOKIE]['max-age'], 15)
+        with mock.patch.object(replicas, 'choose',
+                               wraps=replicas.choose) as choose:
+            response = self.client.get(
+                reverse('posts:post_detail', args=[post.pk]))
+        choose.assert_not_called()
+        self.assertContains(response, 'Свой')
+        self.assertNotIn('replica1', replicas._down)
+
+    @mock.patch('core.replicas.choose', return_value=None)
+    def test_middleware_pins_after_write(self, choose):
+        """Запись закрепляет пользователя за основной базой."""
+        self.client.get(reverse('posts:main_page'))
+        self.client.get(reverse('posts:search'))
+        self.assertEqual(choose.call_count, 1)
+        user = User.objects.create_user(username='writer')
+        post = Post.objects.create(author=user, text='Пост')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[post.pk]), {'text': 'Да'})
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        self.client.get(reverse('posts:post_detail', args=[post.pk]))
+        self.assertEqual(choose.call_count, 1)
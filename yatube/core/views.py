@@ -1,5 +1,12 @@
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 
+from core import metrics as core_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -11,3 +18,39 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+PROXY_HEADERS = ('HTTP_X_FORWARDED_FOR', 'HTTP_X_REAL_IP', 'HTTP_FORWARDED')
+
+
+def _internal(request):
+    """Прямой запрос с внутреннего адреса.
+
+    За обратным прокси REMOTE_ADDR — адрес самого прокси, поэтому
+    запросы с заголовками прокси внутренними не считаются.
+    """
+    if any(header in request.META for header in PROXY_HEADERS):
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network)
+               for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def _token(request):
+    expected = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(expected) and hmac.compare_digest(
+        header.encode(), f'Bearer {expected}'.encode())
+
+
+def metrics(request):
+    """Метрики Prometheus: по токену, с внутренних адресов, сотрудникам."""
+    if not (_token(request) or _internal(request)
+            or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(core_metrics.render(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
@@ -0,0 +1,208 @@
+"""Помощники для команд замера производительности страниц."""
+import math
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from .models import Follow, Post
+
+User = get_user_model()
+
+
+def sample_objects():
+    """Типичные объекты базы для замеров: читатель, автор, группа, пост."""
+    post = Post.objects.order_by('-pub_date', '-id').first()
+    if post is None:
+        return None
+    grouped = (
+        Post.objects.filter(group__isnull=False)
+        .select_related('group').order_by('-pub_date', '-id').first()
+    )
+    reader = (
+        Follow.objects.values('user').annotate(total=Count('id'))
+        .order_by('-total').values_list('user', flat=True).first()
+    )
+    return {
+        'reader': User.objects.get(pk=reader) if reader else post.author,
+        'author': post.author,
+        'group': grouped.group if grouped else None,
+        'post': post,
+    }
+
+
+def read_urls(objects):
+    """Адреса читающих страниц по имени маршрута."""
+    urls = {
+        'posts:main_page': reverse('posts:main_page'),
+        'posts:profile': reverse(
+            'posts:profile', args=[objects['author'].username]),
+        'posts:post_detail': reverse(
+            'posts:post_detail', args=[objects['post'].pk]),
+        'posts:follow_index': reverse('posts:follow_index'),
+    }
+    if objects['group'] is not None:
+        urls['posts:group_list'] = reverse(
+            'posts:group_list', args=[objects['group'].slug])
+    return urls
+
+
+@contextmanager
+def private_cache():
+    """Отдельный файл кэша на время замера.
+
+    Очистка «холодного» замера и записи, которые потом откатятся, не
+    должны задевать общий кэш сайта.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        default = {**settings.CACHES['default'],
+                   'LOCATION': os.path.join(directory, 'cache.sqlite3')}
+        with override_settings(CACHES={**settings.CACHES,
+                                       'default': default}):
+            yield
+
+
+@contextmanager
+def disposable_database():
+    """Основная база на время замера подменяется своей копией.
+
+    Представления пишут в копию в autocommit, как на сайте, так что в
+    замер входят COMMIT и fsync; после замера копия удаляется. Копия
+    снимается backup API SQLite и не видит незафиксированного, поэтому
+    вызывать вне транзакции.
+    """
+    original = connections[DEFAULT_DB_ALIAS]
+    original.ensure_connection()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.sqlite3')
+        target = sqlite3.connect(path)
+        try:
+            original.connection.backup(target)
+        finally:
+            target.close()
+        copy = type(original)({**original.settings_dict, 'NAME': path},
+                              DEFAULT_DB_ALIAS)
+        setattr(connections._connections, DEFAULT_DB_ALIAS, copy)
+        try:
+            yield
+        finally:
+            copy.close()
+            setattr(connections._connections, DEFAULT_DB_ALIAS, original)
+
+
+@contextmanager
+def bench_client(user=None):
+    """Тестовый клиент с собственным кэшем."""
+    with private_cache(), override_settings(ALLOWED_HOSTS=['testserver']):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        yield client
+
+
+def capture_queries(client, url, **extra):
+    """Выполняет запрос с холодным кэшем и возвращает ответ и SQL.
+
+    Клиент должен быть из bench_client: очищается его кэш.
+    """
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, **extra)
+    return response, [query['sql'] for query in context.captured_queries]
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def scenarios(objects):
+    """Замеряемые представления: пользователь, метод, адрес, данные.
+
+    Данные — функция от номера запроса, чтобы каждая запись была новой.
+    """
+    post, group, reader = objects['post'], objects['group'], objects['reader']
+
+    def new_post(number):
+        return {'text': f'Замер производительности {number}',
+                'group': group.pk if group else ''}
+
+    def new_comment(number):
+        return {'text': f'Комментарий замера {number}'}
+
+    result = {
+        'index': (None, 'get', reverse('posts:main_page'), None),
+        'profile': (None, 'get', reverse(
+            'posts:profile', args=[objects['author'].username]), None),
+        'post_detail': (None, 'get', reverse(
+            'posts:post_detail', args=[post.pk]), None),
+        'follow_index': (reader, 'get', reverse('posts:follow_index'), None),
+        'post_create': (reader, 'post', reverse('posts:post_create'),
+                        new_post),
+        'add_comment': (reader, 'post', reverse(
+            'posts:add_comment', args=[post.pk]), new_comment),
+    }
+    if group is not None:
+        result['group_posts'] = (None, 'get', reverse(
+            'posts:group_list', args=[group.slug]), None)
+    return result
+
+
+def _request(client, method, url, data, number, cold):
+    if cold:
+        cache.clear()
+    kwargs = {} if data is None else {'data': data(number)}
+    return getattr(client, method)(url, **kwargs)
+
+
+def measure(scenario, repeat, warmup=2, memory_repeat=3, cold=False):
+    """Задержки, число запросов и пиковая память одного сценария."""
+    user, method, url, data = scenario
+    timings, queries, statuses = [], [], set()
+    with bench_client(user) as client:
+        for number in range(warmup):
+            _request(client, method, url, data, -number - 1, cold)
+        for number in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = _request(client, method, url, data, number, cold)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context.captured_queries))
+            statuses.add(response.status_code)
+        # tracemalloc замедляет код в разы, поэтому память — отдельным
+        # коротким проходом, не смешиваясь с замером времени.
+        peak = 0
+        tracemalloc.start()
+        try:
+            for number in range(memory_repeat):
+                tracemalloc.reset_peak()
+                _request(client, method, url, data, repeat + number, cold)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    return {
+        'method': method.upper(),
+        'url': url,
+        'status': sorted(statuses),
+        'requests': repeat,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': percentile(queries, 50),
+        'queries_max': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
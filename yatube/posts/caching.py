@@ -0,0 +1,188 @@
+"""Кэш страниц лент с версионными пространствами ключей.
+
+Ключ страницы включает версии всех пространств, от которых она зависит
+(`index`, `group:<id>`, `author:<id>`, `follow:<user_id>`,
+`comments:<post_id>`). Запись меняет версию, и старые ключи просто
+перестают запрашиваться, поэтому изменения видны сразу.
+"""
+import hashlib
+import time
+from datetime import datetime
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.timezone import utc
+from django.views.decorators.http import condition
+
+from core import metrics
+
+from .models import Follow
+from .utils import paginator
+
+FEED_TIMEOUT = 60 * 10
+PAGE_TIMEOUT = 60 * 10
+# Сколько секунд обратный прокси может отдавать страницу без проверки.
+PROXY_MAX_AGE = 30
+
+
+def _version_key(namespace):
+    return f'feedver:{namespace}'
+
+
+def versions(*namespaces):
+    """Текущие версии пространств; отсутствующие создаются."""
+    keys = [_version_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        now = time.time_ns() // 1000
+        for key in missing:
+            cache.add(key, now, None)
+        found.update(cache.get_many(missing))
+    return tuple(found.get(key, 0) for key in keys)
+
+
+def bump(*namespaces):
+    """Сдвигает версии пространств. Версия — метка времени в мкс."""
+    keys = [_version_key(namespace) for namespace in namespaces]
+    current = cache.get_many(keys)
+    now = time.time_ns() // 1000
+    cache.set_many(
+        {key: max(now, current.get(key, 0) + 1) for key in keys}, None)
+
+
+def page_key(request, kind, namespaces):
+    digest = hashlib.md5(
+        repr((versions(*namespaces), request.GET.urlencode())).encode()
+    ).hexdigest()
+    return f'feed:{kind}:{digest}'
+
+
+def cached_page(request, kind, namespaces, source, per_page, **kwargs):
+    """Страница ленты из кэша; ленивый source читается только при промахе."""
+    key = page_key(request, kind, namespaces)
+    page = cache.get(key)
+    metrics.inc('yatube_feed_cache_requests_total', {
+        'layer': 'page', 'feed': kind,
+        'result': 'miss' if page is None else 'hit',
+    })
+    if page is None:
+        page = paginator(request, source, per_page, **kwargs)
+        cache.set(key, page, FEED_TIMEOUT)
+    return page, key
+
+
+def post_changed(post, old_group_id=None):
+    namespaces = {'index', f'author:{post.author_id}'}
+    for group_id in (post.group_id, old_group_id):
+        if group_id:
+            namespaces.add(f'group:{group_id}')
+    if post.fanned_out:
+        follower_ids = getattr(post, 'follower_ids', None)
+        if follower_ids is None:
+            follower_ids = Follow.objects.filter(
+                author_id=post.author_id).values_list('user_id', flat=True)
+        namespaces.update(f'follow:{user_id}' for user_id in follower_ids)
+    bump(*namespaces)
+
+
+def _page_state(request, namespaces, args, kwargs):
+    """ETag и Last-Modified анонимной страницы; считаются раз на запрос.
+
+    Схема и хост входят в ETag, а значит и в ключ кэша ответа: ленты
+    RSS строят абсолютные ссылки из адреса запроса.
+    """
+    if not hasattr(request, '_page_state'):
+        current = versions(*namespaces(request, *args, **kwargs))
+        etag = hashlib.md5(repr((
+            current, request.scheme, request.get_host(),
+            request.get_full_path(),
+        )).encode()).hexdigest()
+        request._page_state = etag, datetime.fromtimestamp(
+            max(current) / 1e6, tz=utc)
+    return request._page_state
+
+
+def conditional(namespaces):
+    """Условный GET по версиям пространств для любых пользователей.
+
+    Ответ должен зависеть только от пространств: пространства ленты
+    подписок включают id читателя, остальные общие.
+    """
+    def etag(request, *args, **kwargs):
+        return _page_state(request, namespaces, args, kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return _page_state(request, namespaces, args, kwargs)[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def cache_anonymous_page(namespaces):
+    """Полный кэш страницы для анонимных читателей.
+
+    namespaces(request, *args, **kwargs) возвращает пространства
+    версий, от которых зависит страница; версия — время последнего
+    изменения, поэтому она же служит Last-Modified. Условные запросы
+    получают 304 до вызова представления. Страницы авторизованных
+    пользователей не кэшируются и помечаются как private.
+    """
+    def decorator(view):
+        def etag(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return None
+            return _page_state(request, namespaces, args, kwargs)[0]
+
+        def last_modified(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return None
+            return _page_state(request, namespaces, args, kwargs)[1]
+
+        @wraps(view)
+        @condition(etag_func=etag, last_modified_func=last_modified)
+        def wrapper(request, *args, **kwargs):
+            if request.user.is_authenticated:
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+            else:
+                response = _cached_response(
+                    request, 'page', view.__name__, namespaces, view,
+                    args, kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+def _cached_response(request, prefix, name, namespaces, view, args, kwargs):
+    """Ответ из кэша по ETag страницы или свежий, публичный для прокси."""
+    key = f'{prefix}:' + _page_state(request, namespaces, args, kwargs)[0]
+    response = cache.get(key)
+    metrics.inc('yatube_feed_cache_requests_total', {
+        'layer': 'response', 'feed': name,
+        'result': 'miss' if response is None else 'hit',
+    })
+    if response is None:
+        response = view(request, *args, **kwargs)
+        if (response.status_code == 200
+                and not request.META.get('CSRF_COOKIE_USED')):
+            cache.set(key, response, PAGE_TIMEOUT)
+    patch_cache_control(response, public=True, max_age=0,
+                        s_maxage=PROXY_MAX_AGE)
+    return response
+
+
+def cache_public_response(namespaces, name):
+    """Кэш ответа, одинакового для всех читателей, например RSS.
+
+    Ответ строится один раз на версию пространств, условные запросы
+    получают 304 до вызова представления.
+    """
+    def decorator(view):
+        @conditional(namespaces)
+        def wrapper(request, *args, **kwargs):
+            return _cached_response(request, 'public', name, namespaces,
+                                    view, args, kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,111 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются F-выражениями в той же транзакции, что и запись,
+а расхождения исправляет команда recount.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+COUNTERS = (
+    (UserStats, {
+        'posts_count': (Post, 'author_id'),
+        'followers_count': (Follow, 'author_id'),
+        'following_count': (Follow, 'user_id'),
+    }),
+    (Group, {'posts_count': (Post, 'group_id')}),
+    (Post, {'comments_count': (Comment, 'post_id')}),
+)
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    queryset.update(**{field: F(field) + delta})
+
+
+def post_created(post):
+    _change(UserStats.objects.filter(user_id=post.author_id),
+            'posts_count', 1)
+    if post.group_id:
+        _change(Group.objects.filter(pk=post.group_id), 'posts_count', 1)
+
+
+def post_moved(old_group_id, post):
+    if old_group_id == post.group_id:
+        return
+    if old_group_id:
+        _change(Group.objects.filter(pk=old_group_id), 'posts_count', -1)
+    if post.group_id:
+        _change(Group.objects.filter(pk=post.group_id), 'posts_count', 1)
+
+
+def comment_created(comment):
+    _change(Post.objects.filter(pk=comment.post_id), 'comments_count', 1)
+
+
+def follow_changed(user_id, author_id, delta):
+    _change(UserStats.objects.filter(user_id=user_id),
+            'following_count', delta)
+    _change(UserStats.objects.filter(user_id=author_id),
+            'followers_count', delta)
+
+
+def _chunks(queryset, chunk_size):
+    last = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last is not None:
+            chunk = chunk.filter(pk__gt=last)
+        chunk = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+def _actual(model, field, ids):
+    return dict(
+        model.objects.filter(**{f'{field}__in': ids}).order_by()
+        .values_list(field).annotate(total=Count('pk'))
+    )
+
+
+def recount(chunk_size=1000, fix=True):
+    """Сверяет счётчики с данными и возвращает число расхождений."""
+    drift = {}
+    missing = User.objects.filter(stats__isnull=True)
+    for chunk in _chunks(missing, chunk_size):
+        drift['UserStats (нет строки)'] = (
+            drift.get('UserStats (нет строки)', 0) + len(chunk))
+        if fix:
+            UserStats.objects.bulk_create(
+                (UserStats(user_id=user_id) for user_id in chunk),
+                ignore_conflicts=True,
+            )
+    for model, fields in COUNTERS:
+        name = model.__name__
+        drift[name] = 0
+        for chunk in _chunks(model.objects.all(), chunk_size):
+            with transaction.atomic():
+                actual = {
+                    counter: _actual(source, field, chunk)
+                    for counter, (source, field) in fields.items()
+                }
+                rows = model.objects.filter(pk__in=chunk).values_list(
+                    'pk', *fields)
+                for pk, *stored in rows:
+                    expected = {
+                        counter: actual[counter].get(pk, 0)
+                        for counter in fields
+                    }
+                    if list(expected.values()) == stored:
+                        continue
+                    drift[name] += 1
+                    if fix:
+                        model.objects.filter(pk=pk).update(**expected)
+    return drift
@@ -0,0 +1,122 @@
+"""RSS и Atom: последние посты сайта, группы и автора."""
+import mimetypes
+
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Rss201rev2Feed
+from django.utils.html import format_html, linebreaks
+from django.utils.text import Truncator
+
+from . import thumbnails
+from .models import Group, Post, User
+
+FEED_SIZE = 20
+TITLE_WORDS = 8
+
+
+class Channel:
+    """Что показывает лента: заголовок, ссылка, описание и посты."""
+
+    def __init__(self, request, title, link, description, posts):
+        self.request = request
+        self.title = title
+        self.link = link
+        self.description = description
+        self.posts = posts
+
+
+class PostFeed(Feed):
+    """Общая часть лент; подклассы собирают Channel в get_object."""
+
+    def __init__(self, feed_type=Rss201rev2Feed):
+        super().__init__()
+        self.feed_type = feed_type
+
+    def __call__(self, request, *args, **kwargs):
+        response = super().__call__(request, *args, **kwargs)
+        # Last-Modified ставит условный GET по версиям пространств:
+        # дата последнего поста не меняется при удалении.
+        del response['Last-Modified']
+        return response
+
+    def title(self, obj):
+        return obj.title
+
+    def link(self, obj):
+        return obj.link
+
+    def description(self, obj):
+        return obj.description
+
+    subtitle = description
+
+    def items(self, obj):
+        posts = list(
+            obj.posts.select_related('author', 'group')[:FEED_SIZE])
+        for post in posts:
+            post.image_url = None
+            if post.image:
+                post.image_url = obj.request.build_absolute_uri(
+                    thumbnails.lookup(post.image).url)
+        return posts
+
+    def item_title(self, post):
+        return Truncator(post.text).words(TITLE_WORDS)
+
+    def item_description(self, post):
+        text = linebreaks(post.text, autoescape=True)
+        if post.image_url is None:
+            return text
+        return format_html('<p><img src="{}" alt=""></p>{}',
+                           post.image_url, text)
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_author_link(self, post):
+        return reverse('posts:profile', args=[post.author.username])
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group else []
+
+    def item_enclosure_url(self, post):
+        return post.image_url
+
+    def item_enclosure_length(self, post):
+        return 0
+
+    def item_enclosure_mime_type(self, post):
+        return mimetypes.guess_type(post.image_url)[0] or 'image/jpeg'
+
+
+class SiteFeed(PostFeed):
+
+    def get_object(self, request):
+        return Channel(request, 'Yatube', reverse('posts:main_page'),
+                       'Последние записи на сайте.', Post.objects.all())
+
+
+class GroupFeed(PostFeed):
+
+    def get_object(self, request, slug):
+        group = get_object_or_404(Group, slug=slug)
+        return Channel(request, f'Yatube: {group.title}',
+                       reverse('posts:group_list', args=[group.slug]),
+                       group.description, group.posts.all())
+
+
+class AuthorFeed(PostFeed):
+
+    def get_object(self, request, username):
+        author = get_object_or_404(User, username=username)
+        name = author.get_full_name() or author.username
+        return Channel(request, f'Yatube: {name}',
+                       reverse('posts:profile', args=[author.username]),
+                       f'Записи пользователя {name}.', author.posts.all())
@@ -0,0 +1,151 @@
+"""Подписки одним запросом и пакетный импорт подписок.
+
+Подписка — INSERT, пропускающий уже существующую пару по ограничению
+unique_follow, отписка — один DELETE. Число затронутых строк говорит,
+изменилось ли что-то, и только тогда меняются счётчики и рассылаются
+post_save/post_delete для лент и кэша. Повторный клик ничего не делает.
+"""
+from collections import Counter
+
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+
+from . import caching, counters, graph, timeline
+from .models import Follow, User, UserStats
+
+# Пользователи и авторы пачки вместе укладываются в graph.IN_LIMIT
+# параметров одного IN.
+CHUNK_SIZE = graph.IN_LIMIT // 2
+
+
+def _connection():
+    # Через роутер, чтобы запрос считался записью и закреплял
+    # пользователя за основной базой.
+    return connections[router.db_for_write(Follow)]
+
+
+def _execute(connection, sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def _insert_sql(connection):
+    ops, table = connection.ops, Follow._meta.db_table
+    return '{} {} ({}, {}) VALUES (%s, %s) {}'.format(
+        ops.insert_statement(ignore_conflicts=True), ops.quote_name(table),
+        ops.quote_name('user_id'), ops.quote_name('author_id'),
+        ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    ).strip()
+
+
+def follow(user_id, author_id):
+    """Подписывает; возвращает True, если подписки ещё не было."""
+    if user_id == author_id:
+        return False
+    connection = _connection()
+    with transaction.atomic(using=connection.alias):
+        created = _execute(connection, _insert_sql(connection),
+                           [user_id, author_id]) == 1
+        if created:
+            counters.follow_changed(user_id, author_id, 1)
+            post_save.send(
+                sender=Follow, created=True, raw=False,
+                using=connection.alias, update_fields=None,
+                instance=Follow(user_id=user_id, author_id=author_id))
+    return created
+
+
+def unfollow(user_id, author_id):
+    """Отписывает; возвращает True, если подписка была."""
+    connection = _connection()
+    ops, table = connection.ops, Follow._meta.db_table
+    with transaction.atomic(using=connection.alias):
+        deleted = _execute(
+            connection, 'DELETE FROM {} WHERE {} = %s AND {} = %s'.format(
+                ops.quote_name(table), ops.quote_name('user_id'),
+                ops.quote_name('author_id')),
+            [user_id, author_id]) == 1
+        if deleted:
+            counters.follow_changed(user_id, author_id, -1)
+            post_delete.send(
+                sender=Follow, using=connection.alias,
+                instance=Follow(user_id=user_id, author_id=author_id))
+    return deleted
+
+
+def _shift(field, deltas):
+    """Один UPDATE на каждое значение прироста счётчика."""
+    by_delta = {}
+    for user_id, delta in deltas.items():
+        by_delta.setdefault(delta, []).append(user_id)
+    for delta, user_ids in by_delta.items():
+        UserStats.objects.filter(user_id__in=user_ids).update(
+            **{field: F(field) + delta})
+
+
+def _import_chunk(pairs):
+    """Создаёт новые пары пачки и возвращает их число.
+
+    Пары с несуществующими пользователями отбрасываются.
+    """
+    users = {user_id for user_id, _ in pairs}
+    authors = {author_id for _, author_id in pairs}
+    known = set(User.objects.filter(pk__in=users | authors)
+                .values_list('pk', flat=True))
+    existing = set(
+        Follow.objects.filter(user_id__in=users, author_id__in=authors)
+        .values_list('user_id', 'author_id'))
+    new = [pair for pair in pairs if pair not in existing
+           and pair[0] in known and pair[1] in known]
+    with transaction.atomic():
+        Follow.objects.bulk_create(
+            (Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in new),
+            ignore_conflicts=True,
+        )
+        _shift('following_count', Counter(user for user, _ in new))
+        _shift('followers_count', Counter(author for _, author in new))
+        for user_id, author_id in new:
+            timeline.backfill(user_id, author_id)
+    if new:
+        readers = {user_id for user_id, _ in new}
+        caching.bump(*(f'follow:{user_id}' for user_id in readers),
+                     *(graph.namespace(user_id) for user_id in readers),
+                     *{f'followers:{author_id}' for _, author_id in new})
+    return len(new)
+
+
+def import_follows(pairs, chunk_size=CHUNK_SIZE, progress=None):
+    """Импортирует пары (user_id, author_id) пачками по chunk_size.
+
+    Пачка не больше CHUNK_SIZE, каким бы ни был chunk_size: иначе её id
+    не поместились бы в IN. Каждая пачка — одна транзакция с
+    bulk_create(ignore_conflicts=True).
+    Подписки, созданные параллельно с импортом, могут сбить счётчики —
+    их сверит команда recount. progress(stats) вызывается после пачки.
+    Возвращает {'read', 'created'}: прочитано пар и создано подписок.
+    """
+    chunk_size = min(chunk_size, CHUNK_SIZE)
+    stats = {'read': 0, 'created': 0}
+    chunk, seen = [], set()
+
+    def flush():
+        stats['created'] += _import_chunk(chunk)
+        chunk.clear()
+        seen.clear()
+        if progress is not None:
+            progress(stats)
+
+    for user_id, author_id in pairs:
+        stats['read'] += 1
+        pair = int(user_id), int(author_id)
+        if pair[0] != pair[1] and pair not in seen:
+            seen.add(pair)
+            chunk.append(pair)
+        if len(chunk) == chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return stats
@@ -1,5 +1,8 @@
 from django import forms
-from .models import Comment, Post
+from django.core.files.uploadedfile import UploadedFile
+
+from .images import ingest
+from .models import Comment, Group, Post
 
 
 class PostForm(forms.ModelForm):
@@ -13,6 +16,12 @@ class PostForm(forms.ModelForm):
             'group': 'Choose the group'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return ingest(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -20,3 +29,11 @@ class CommentForm(forms.ModelForm):
         fields = ['text']
         labels = {'text': 'Добавить комментарий'}
         help_texts = {'text': 'Текст комментария'}
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Искать', max_length=200, required=False)
+    group = forms.ModelChoiceField(
+        Group.objects.all(), to_field_name='slug', required=False,
+        label='Группа', empty_label='Все группы')
+    author = forms.CharField(label='Автор', max_length=150, required=False)
@@ -0,0 +1,68 @@
+"""Приём загруженных картинок постов.
+
+Перед сохранением картинка проверяется по размеру файла и числу
+пикселей (по заголовку, без полного декодирования), поворачивается по
+EXIF, теряет метаданные, уменьшается до MAX_SIDE и перекодируется.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+MAX_PIXELS = 40_000_000
+MAX_SIDE = 2048
+JPEG_QUALITY = 85
+
+
+def _has_alpha(image):
+    return (
+        image.mode in ('RGBA', 'LA', 'PA')
+        or (image.mode == 'P' and 'transparency' in image.info)
+    )
+
+
+def _reencode(uploaded):
+    image = Image.open(uploaded)
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise ValidationError('Слишком большое разрешение картинки.')
+    # JPEG можно сразу декодировать в уменьшенном масштабе.
+    image.draft('RGB', (MAX_SIDE, MAX_SIDE))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    if _has_alpha(image):
+        image.convert('RGBA').save(output, 'PNG', optimize=True)
+        extension = 'png'
+    else:
+        image.convert('RGB').save(
+            output, 'JPEG', quality=JPEG_QUALITY,
+            optimize=True, progressive=True,
+        )
+        extension = 'jpg'
+    output.seek(0)
+    stem = os.path.splitext(os.path.basename(uploaded.name))[0]
+    return File(output, name=f'{stem}.{extension}')
+
+
+def ingest(uploaded):
+    """Возвращает перекодированную картинку или бросает ValidationError.
+
+    Проверка формы читает только заголовок, поэтому обрезанный или
+    испорченный файл обнаруживается здесь, при декодировании.
+    """
+    if uploaded.size > MAX_UPLOAD_BYTES:
+        raise ValidationError(
+            f'Файл больше {MAX_UPLOAD_BYTES // (1024 * 1024)} МБ.')
+    uploaded.seek(0)
+    try:
+        return _reencode(uploaded)
+    except Image.DecompressionBombError:
+        raise ValidationError('Слишком большое разрешение картинки.')
+    except OSError:
+        raise ValidationError('Картинка повреждена или обрезана.')
@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.benchmarks import (disposable_database, measure, sample_objects,
+                              scenarios)
+from posts.models import Comment, Follow, Group, Post, User
+
+SCENARIOS = ('index', 'group_posts', 'profile', 'post_detail',
+             'follow_index', 'post_create', 'add_comment')
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет основные страницы через тестовый клиент и печатает '
+            'p50/p95/p99, число SQL-запросов и пиковую память в JSON. '
+            'Замер идёт на копии базы: записи фиксируются, как на сайте, '
+            'а копия потом удаляется.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                            help=f'Что замерять: {", ".join(SCENARIOS)}.')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кэш замера перед каждым запросом.')
+        parser.add_argument('--output', help='Записать JSON ещё и в файл.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть положительным.')
+        if connection.in_atomic_block:
+            raise CommandError('Замер копирует базу и пишет в autocommit, '
+                               'внутри транзакции он не запускается.')
+        unknown = set(options['scenarios']) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}.')
+        objects = sample_objects()
+        if objects is None:
+            raise CommandError('В базе нет постов; запустите seed_bench.')
+        available = scenarios(objects)
+        names = [name for name in options['scenarios'] or SCENARIOS
+                 if name in available]
+        report = {
+            'database': {model.__name__.lower(): model.objects.count()
+                         for model in (User, Group, Post, Follow, Comment)},
+            'repeat': options['repeat'],
+            'cold_cache': options['cold'],
+            'scenarios': {},
+        }
+        with disposable_database():
+            for name in names:
+                report['scenarios'][name] = measure(
+                    available[name], options['repeat'],
+                    warmup=options['warmup'], cold=options['cold'])
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
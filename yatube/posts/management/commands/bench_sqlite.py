@@ -0,0 +1,161 @@
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from core import sqlite
+from posts.benchmarks import percentile
+from posts.models import Comment, Post, User
+
+MODES = {
+    'default': 'django.db.backends.sqlite3',
+    'production': sqlite.ENGINE,
+}
+
+
+def _p95_ms(timings):
+    return round(percentile(timings, 95) * 1000, 3) if timings else None
+
+
+def _operations(alias):
+    """Чтение первой страницы ленты и запись комментария к посту."""
+    posts = list(Post.objects.using(alias).values_list('pk', flat=True)
+                 .order_by('-pk')[:100])
+    users = list(User.objects.using(alias).values_list('pk', flat=True)
+                 [:100])
+
+    def read():
+        list(Post.objects.using(alias).select_related('author', 'group')
+             .order_by('-pub_date', '-id')[:10])
+
+    def write():
+        with transaction.atomic(using=alias):
+            post = Post.objects.using(alias).get(pk=random.choice(posts))
+            Comment.objects.using(alias).bulk_create([Comment(
+                post=post, author_id=random.choice(users),
+                text='Нагрузочный комментарий')])
+            Post.objects.using(alias).filter(pk=post.pk).update(
+                comments_count=F('comments_count') + 1)
+
+    return read, write
+
+
+def _worker(alias, read, write, options, barrier, results):
+    timings = {'read': [], 'write': []}
+    errors = 0
+    barrier.wait()
+    deadline = time.monotonic() + options['duration']
+    try:
+        while time.monotonic() < deadline:
+            kind = ('write' if random.random() < options['write_ratio']
+                    else 'read')
+            started = time.perf_counter()
+            try:
+                (write if kind == 'write' else read)()
+            except OperationalError:
+                errors += 1
+                continue
+            timings[kind].append(time.perf_counter() - started)
+    finally:
+        connections[alias].close()
+    results.append((timings, errors))
+
+
+class Command(BaseCommand):
+    help = ('Нагружает копии базы параллельными чтениями ленты и записью '
+            'комментариев в обычном и боевом режиме SQLite и печатает '
+            'пропускную способность в JSON. Рабочая база не меняется.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=5,
+                            help='Секунд на каждый режим.')
+        parser.add_argument('--write-ratio', type=float, default=0.2,
+                            help='Доля операций записи.')
+        parser.add_argument('--output', help='Записать JSON ещё и в файл.')
+
+    def handle(self, *args, **options):
+        source = connections['default']
+        if source.vendor != 'sqlite' or source.is_in_memory_db():
+            raise CommandError('Нужна база SQLite в файле.')
+        if not Post.objects.exists():
+            raise CommandError('В базе нет постов; запустите seed_bench.')
+        directory = tempfile.mkdtemp()
+        try:
+            report = {
+                'threads': options['threads'],
+                'duration': options['duration'],
+                'write_ratio': options['write_ratio'],
+                'modes': {
+                    mode: self._run(mode, directory, options)
+                    for mode in MODES
+                },
+            }
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        modes = report['modes']
+        report['speedup'] = {
+            key: round(modes['production'][key] / modes['default'][key], 2)
+            for key in ('reads_per_second', 'writes_per_second')
+            if modes['default'][key]
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
+
+    def _copy(self, mode, directory):
+        """Копия рабочей базы под отдельным псевдонимом."""
+        path = os.path.join(directory, f'{mode}.sqlite3')
+        source = sqlite3.connect(connections['default'].settings_dict['NAME'])
+        target = sqlite3.connect(path)
+        source.backup(target)
+        source.close()
+        if mode == 'default':
+            target.execute('PRAGMA journal_mode=DELETE')
+        target.close()
+        alias = f'bench_{mode}'
+        connections.databases[alias] = {
+            **connections.databases['default'],
+            'ENGINE': MODES[mode],
+            'NAME': path,
+            'CONN_MAX_AGE': 0,
+        }
+        return alias
+
+    def _run(self, mode, directory, options):
+        alias = self._copy(mode, directory)
+        read, write = _operations(alias)
+        if mode == 'production':
+            write = sqlite.retry_on_lock(write, using=alias)
+        results = []
+        barrier = threading.Barrier(options['threads'])
+        threads = [
+            threading.Thread(target=_worker, args=(
+                alias, read, write, options, barrier, results))
+            for _ in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        del connections.databases[alias]
+        reads = sorted(t for timings, _ in results for t in timings['read'])
+        writes = sorted(t for timings, _ in results for t in timings['write'])
+        duration = options['duration']
+        return {
+            'reads_per_second': round(len(reads) / duration, 1),
+            'writes_per_second': round(len(writes) / duration, 1),
+            'errors': sum(errors for _, errors in results),
+            'read_p95_ms': _p95_ms(reads),
+            'write_p95_ms': _p95_ms(writes),
+        }
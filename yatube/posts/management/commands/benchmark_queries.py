@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.migrations.loader import MigrationLoader
+
+from posts.benchmarks import (bench_client, capture_queries, read_urls,
+                              sample_objects)
+
+INDEX_MIGRATION = ('posts', '0006_indexes')
+BEFORE_ALIAS = 'benchmark_before'
+
+
+class Command(BaseCommand):
+    help = ('Печатает EXPLAIN QUERY PLAN и время запросов каждой страницы '
+            'до и после составных индексов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Сколько раз выполнять каждый запрос.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замер поддерживает только SQLite.')
+        objects = sample_objects()
+        if objects is None:
+            raise CommandError('В базе нет постов для замера.')
+        captured = {}
+        with bench_client(objects['reader']) as client:
+            for name, url in read_urls(objects).items():
+                _, queries = capture_queries(client, url)
+                captured[name] = list(dict.fromkeys(queries))
+        with tempfile.TemporaryDirectory() as directory:
+            before = self._baseline_copy(os.path.join(directory, 'before'))
+            try:
+                self._report(captured, before, options['repeat'])
+            finally:
+                before.close()
+
+    def _baseline_copy(self, path):
+        """Копия базы без индексов миграции INDEX_MIGRATION.
+
+        Откатываются только её операции: остальная схема, в том числе
+        поля более поздних миграций, остаётся как есть.
+        """
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        target.close()
+        connections.databases[BEFORE_ALIAS] = {
+            **connections.databases[connection.alias], 'NAME': path,
+        }
+        try:
+            before = connections[BEFORE_ALIAS]
+            loader = MigrationLoader(before)
+            state = loader.project_state(INDEX_MIGRATION, at_end=True)
+            with before.schema_editor() as editor:
+                loader.graph.nodes[INDEX_MIGRATION].unapply(state, editor)
+        finally:
+            connections[BEFORE_ALIAS].close()
+            del connections.databases[BEFORE_ALIAS]
+        return sqlite3.connect(path)
+
+    def _timing(self, database, sql, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            database.execute(sql).fetchall()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000
+
+    def _report(self, captured, before, repeat):
+        after = connection.connection
+        for name, queries in captured.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for sql in queries:
+                self.stdout.write(f'  {sql}')
+                for label, database in (('до', before), ('после', after)):
+                    plan = database.execute(
+                        f'EXPLAIN QUERY PLAN {sql}').fetchall()
+                    elapsed = self._timing(database, sql, repeat)
+                    self.stdout.write(f'    {label}: {elapsed:.3f} мс')
+                    for row in plan:
+                        self.stdout.write(f'      {row[-1]}')
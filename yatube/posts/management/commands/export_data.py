@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в JSONL '
+            'или одну модель в CSV, читая таблицы порциями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help='Файл или - для stdout.')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            default='jsonl')
+        parser.add_argument('--model', action='append', dest='models',
+                            choices=list(transfer.MODELS),
+                            help='Модель; можно указать несколько раз '
+                                 '(для CSV — ровно одну).')
+        parser.add_argument('--chunk-size', type=int,
+                            default=transfer.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            lines = transfer.export_lines(
+                options['models'] or tuple(transfer.MODELS),
+                options['format'], options['chunk_size'])
+        except ValueError as error:
+            raise CommandError(error)
+        if options['path'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['path'], 'w', newline='',
+                  encoding='utf-8') as file:
+            file.writelines(lines)
@@ -0,0 +1,66 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+
+
+def _init_worker():
+    django.setup()
+    connections.close_all()
+
+
+def _generate(names):
+    from core import metrics
+    from posts import thumbnails
+
+    failed = []
+    for name in names:
+        try:
+            thumbnails.generate(name)
+        except Exception as error:
+            failed.append(f'{name}: {error}')
+    metrics.registry.flush(force=True)
+    connections.close_all()
+    return len(names), failed
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для всех картинок постов в пуле процессов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Число процессов; по умолчанию — число ядер.')
+        parser.add_argument('--chunk-size', type=int, default=50)
+
+    def _chunks(self, chunk_size):
+        names = (
+            Post.objects.exclude(image='').order_by('image')
+            .values_list('image', flat=True).distinct()
+        )
+        chunk = []
+        for name in names.iterator():
+            chunk.append(name)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        chunks = list(self._chunks(options['chunk_size']))
+        connections.close_all()
+        done = 0
+        with ProcessPoolExecutor(options['workers'],
+                                 initializer=_init_worker) as pool:
+            for processed, failed in pool.map(_generate, chunks):
+                done += processed
+                for message in failed:
+                    self.stderr.write(message)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {done} за {elapsed:.1f} с'))
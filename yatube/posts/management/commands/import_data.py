@@ -0,0 +1,98 @@
+import os
+import re
+import sys
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает выгрузку export_data пачками через bulk_create '
+            'с новыми id групп и постов. Несколько файлов загружаются '
+            'одним проходом в порядке зависимостей, поэтому comments.csv '
+            'находит посты из posts.csv.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', metavar='path',
+                            help='Файлы или - для stdin.')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            default=None,
+                            help='По умолчанию — по расширению файла.')
+        parser.add_argument('--model', choices=list(transfer.MODELS),
+                            help='Модель файла CSV; по умолчанию — по '
+                                 'имени файла (groups.csv, posts.csv).')
+        parser.add_argument('--chunk-size', type=int,
+                            default=transfer.CHUNK_SIZE)
+        parser.add_argument('--images-from', default=None,
+                            help='MEDIA_ROOT источника: скопировать '
+                                 'картинки постов.')
+        parser.add_argument('--create-users', action='store_true',
+                            help='Создавать неизвестных авторов без '
+                                 'пароля вместо ошибки в их строках.')
+
+    def _source(self, path, options):
+        """(формат, модель CSV) файла."""
+        fmt = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        if fmt != 'csv':
+            return fmt, None
+        if options['model']:
+            return fmt, options['model']
+        stem = os.path.splitext(os.path.basename(path))[0].lower()
+        for word in re.split(r'[^a-z]+', stem):
+            name = word[:-1] if word.endswith('s') else word
+            if name in transfer.MODELS:
+                return fmt, name
+        raise CommandError(f'{path}: не понять модель CSV, укажите --model '
+                           f'или назовите файл по ней (posts.csv).')
+
+    def _sources(self, options):
+        """Файлы в порядке зависимостей: JSONL, затем CSV по моделям."""
+        paths = options['paths']
+        if '-' in paths and len(paths) > 1:
+            raise CommandError('stdin загружается только отдельно.')
+        if options['model'] and len(paths) > 1:
+            raise CommandError('--model задаётся только для одного файла.')
+        order = list(transfer.MODELS)
+        sources = [(path, *self._source(path, options)) for path in paths]
+        return sorted(sources, key=lambda source: (
+            -1 if source[2] is None else order.index(source[2])))
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть положительным.')
+        sources = self._sources(options)
+        self.started = time.perf_counter()
+        importer = transfer.Importer(
+            chunk_size=options['chunk_size'],
+            images_from=options['images_from'],
+            create_users=options['create_users'],
+            progress=self._progress,
+        )
+        try:
+            with ExitStack() as stack:
+                stats = importer.load(*(
+                    transfer.read_records(
+                        sys.stdin if path == '-' else stack.enter_context(
+                            open(path, newline='', encoding='utf-8')),
+                        fmt, model)
+                    for path, fmt, model in sources))
+        except (ValueError, KeyError) as error:
+            raise CommandError(f'Неверная выгрузка: {error}')
+        self.stdout.write(self.style.SUCCESS('Загружено: ' + ', '.join(
+            f'{name} {counts["created"]} из {counts["read"]}'
+            for name, counts in stats.items())))
+        errors = sum(counts['errors'] for counts in stats.values())
+        if errors:
+            for message in importer.errors:
+                self.stderr.write(message)
+            raise CommandError(f'Строк с неразрешёнными ссылками: {errors}.')
+
+    def _progress(self, name, stats):
+        rate = stats['read'] / max(time.perf_counter() - self.started, 1e-9)
+        self.stdout.write(
+            f'{name}: прочитано {stats["read"]}, создано '
+            f'{stats["created"]}, {rate:.0f} строк/с')
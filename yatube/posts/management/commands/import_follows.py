@@ -0,0 +1,82 @@
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import follows
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Импортирует подписки из CSV со столбцами user и author '
+            '(имена пользователей или id с --ids) пачками через '
+            'bulk_create; существующие подписки пропускаются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл CSV или - для stdin.')
+        parser.add_argument('--ids', action='store_true',
+                            help='В столбцах id, а не имена.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=follows.CHUNK_SIZE)
+        parser.add_argument('--delimiter', default=',')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть положительным.')
+        self.unknown = 0
+        if options['path'] == '-':
+            self._import(sys.stdin, options)
+            return
+        with open(options['path'], newline='', encoding='utf-8') as file:
+            self._import(file, options)
+
+    def _rows(self, file, options):
+        reader = csv.DictReader(file, delimiter=options['delimiter'])
+        if not {'user', 'author'} <= set(reader.fieldnames or ()):
+            raise CommandError('Нужны столбцы user и author.')
+        for row in reader:
+            yield row['user'].strip(), row['author'].strip()
+
+    def _pairs(self, rows, chunk_size):
+        """Пары id; имена переводятся одним запросом на пачку."""
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield from self._resolve(chunk)
+                chunk = []
+        yield from self._resolve(chunk)
+
+    def _resolve(self, chunk):
+        names = {name for row in chunk for name in row}
+        ids = dict(User.objects.filter(username__in=names)
+                   .values_list('username', 'pk'))
+        for user, author in chunk:
+            if user in ids and author in ids:
+                yield ids[user], ids[author]
+            else:
+                self.unknown += 1
+
+    def _import(self, file, options):
+        started = time.monotonic()
+
+        def progress(stats):
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                'Прочитано {read}, создано {created}, {rate:.0f} строк/с'
+                .format(**stats, rate=stats['read'] / elapsed))
+
+        rows = self._rows(file, options)
+        if not options['ids']:
+            rows = self._pairs(rows, options['chunk_size'])
+        try:
+            stats = follows.import_follows(
+                rows, options['chunk_size'], progress=progress)
+        except ValueError as error:
+            raise CommandError(f'Неверный id: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            'Готово: прочитано {read}, создано {created}, неизвестных '
+            'пользователей {unknown} за {elapsed:.1f} с'.format(
+                **stats, unknown=self.unknown,
+                elapsed=time.monotonic() - started)))
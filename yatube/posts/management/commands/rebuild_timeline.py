@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='id читателя; можно указать несколько раз.',
+        )
+
+    def handle(self, *args, **options):
+        created = timeline.rebuild(options['user_ids'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Записей в лентах: {created}')
+        )
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import recommender
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «кого почитать» по графу подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов; по умолчанию по числу ядер, 1 — без пула.',
+        )
+        parser.add_argument('--top', type=int, default=recommender.TOP_N,
+                            help='Сколько авторов хранить на читателя.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=recommender.CHUNK_SIZE,
+                            help='Читателей в одной задаче и транзакции.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(stats):
+            rate = stats['users'] / max(time.perf_counter() - started, 1e-9)
+            self.stdout.write(
+                f'Читателей {stats["users"]}, строк {stats["rows"]}, '
+                f'{rate:.0f} читателей/с')
+
+        stats = recommender.build(
+            top_n=options['top'], workers=options['workers'],
+            chunk_size=options['chunk_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендации готовы: читателей {stats["users"]}, '
+            f'строк {stats["rows"]} '
+            f'за {time.perf_counter() - started:.1f} с'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет и исправляет счётчики постов, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать расхождения.')
+
+    def handle(self, *args, **options):
+        drift = counters.recount(options['chunk_size'],
+                                 fix=not options['dry_run'])
+        for name, total in drift.items():
+            style = self.style.WARNING if total else self.style.SUCCESS
+            self.stdout.write(style(f'{name}: расхождений {total}'))
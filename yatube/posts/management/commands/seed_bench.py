@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import seeding
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу пользователями, группами, постами с картинками, '
+            'подписками и комментариями для замеров производительности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--images', type=int, default=20,
+                            help='Сколько разных картинок создать.')
+        parser.add_argument('--image-ratio', type=float, default=0.2,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--group-ratio', type=float, default=0.7,
+                            help='Доля постов в группе.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты.')
+        parser.add_argument('--batch-size', type=int,
+                            default=seeding.BATCH_SIZE)
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Зерно генератора для повторяемых данных.')
+
+    def _progress(self, name, done, total):
+        if done == total or done % (self.batch_size * 20) == 0:
+            self.stdout.write(f'  {name}: {done}/{total}')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+        created = seeding.seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            follows=options['follows'],
+            comments=options['comments'],
+            images=options['images'],
+            image_ratio=options['image_ratio'],
+            group_ratio=options['group_ratio'],
+            days=options['days'],
+            batch_size=self.batch_size,
+            seed=options['seed'],
+            progress=self._progress,
+        )
+        elapsed = time.monotonic() - started
+        summary = ', '.join(f'{name}: {total}'
+                            for name, total in created.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {summary} за {elapsed:.1f} с'))
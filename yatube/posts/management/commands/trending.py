@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает популярные посты сайта и групп.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Повторять каждые N секунд, пока не '
+                                 'прервут.')
+        parser.add_argument('--top', type=int, default=trending.TOP_K,
+                            help='Сколько постов хранить на сайт и группу.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            active = trending.rollup(top_k=options['top'])
+            self.stdout.write(
+                f'Постов с обсуждением: {active}, '
+                f'{time.monotonic() - started:.2f} с')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
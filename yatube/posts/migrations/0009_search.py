@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from posts import search
+
+
+def install(apps, schema_editor):
+    if search.enabled(schema_editor.connection):
+        search.install(schema_editor.connection)
+        search.rebuild(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    if search.enabled(schema_editor.connection):
+        search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -11,6 +11,7 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return Truncator(self.title).chars(TRUNCATE_CHARS)
@@ -19,6 +20,7 @@ class Group(models.Model):
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -36,12 +38,27 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    fanned_out = models.BooleanField(default=False, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return Truncator(self.text).chars(TRUNCATE_CHARS)
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_date_idx'),
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_date_id_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_pull_author_date_idx',
+                condition=models.Q(fanned_out=False),
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -50,6 +67,12 @@ class Follow(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="following")
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
@@ -59,5 +82,96 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField("date published", auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые вместе с записями."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name="stats")
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок читателя, записанный при публикации."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="timeline")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="timeline_entries")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+class Recommendation(models.Model):
+    """Автор, которого стоит предложить читателю; строится командой."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="recommendations")
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name="+")
+    score = models.FloatField()
+    created = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_recommendation'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-score'],
+                         name='recommendation_user_score_idx'),
+        ]
+
+
+class PostActivity(models.Model):
+    """Число комментариев к посту за один час (корзину)."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="+")
+    bucket = models.IntegerField()
+    comments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'bucket'],
+                                    name='unique_post_activity'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='activity_bucket_idx'),
+        ]
+
+
+class TrendingPost(models.Model):
+    """Место поста в популярном сайта (group пуст) или группы."""
+    group = models.ForeignKey(Group, on_delete=models.CASCADE,
+                              blank=True, null=True, related_name="+")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="+")
+    rank = models.PositiveIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'rank'],
+                         name='trending_group_rank_idx'),
+        ]
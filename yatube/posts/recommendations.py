@@ -0,0 +1,24 @@
+"""Блок «кого почитать»: готовые рекомендации из Recommendation.
+
+Таблицу заполняет команда recommend (posts.recommender). Запрос к ней —
+одно чтение по индексу (user, -score); авторов, на которых читатель
+подписался после расчёта, отсеивает кэш графа подписок.
+"""
+from . import graph
+from .models import Recommendation
+
+SHOWN = 5
+# Запас строк на случай свежих подписок.
+SPARE = 5
+
+
+def for_user(user_id, limit=SHOWN):
+    rows = list(
+        Recommendation.objects.filter(user_id=user_id)
+        .select_related('author__stats')
+        .order_by('-score')[:limit + SPARE]
+    )
+    followed = graph.followed_among(user_id,
+                                    [row.author_id for row in rows])
+    return [row.author for row in rows
+            if row.author_id not in followed][:limit]
@@ -0,0 +1,167 @@
+"""Расчёт рекомендаций «кого почитать» по графу подписок.
+
+Граф читается из Follow в два CSR-массива NumPy: подписки (читатель →
+авторы) и подписчики (автор → читатели). Оценка автора для читателя
+складывается из двух частей:
+
+* друзья друзей — сколько авторов читателя сами подписаны на автора;
+* совместные подписки — подписки похожих читателей, взвешенные
+  косинусной близостью их подписок к подпискам читателя.
+
+Читатели делятся на пачки и считаются в пуле процессов, граф попадает
+в каждый процесс один раз. Лучшие TOP_N авторов каждого читателя
+пишутся в Recommendation, где их читает posts.recommendations.
+"""
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Follow, Recommendation
+
+TOP_N = 20
+CHUNK_SIZE = 500
+READ_CHUNK_SIZE = 10000
+FOF_WEIGHT = 1.0
+COFOLLOW_WEIGHT = 2.0
+# Подписчики популярного автора почти ничего не говорят о сходстве
+# читателей, а перебирать их дороже всего остального.
+COFOLLOW_MAX_FOLLOWERS = 1000
+
+_graphs = None
+
+
+class Graph:
+    """Рёбра в CSR: соседи вершины v — indices[indptr[v]:indptr[v + 1]]."""
+
+    def __init__(self, sources, targets, size):
+        order = np.lexsort((targets, sources))
+        self.indices = targets[order]
+        self.indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=size),
+                  out=self.indptr[1:])
+
+    def degree(self, vertices):
+        return self.indptr[vertices + 1] - self.indptr[vertices]
+
+    def neighbours(self, vertex):
+        return self.indices[self.indptr[vertex]:self.indptr[vertex + 1]]
+
+    def gather(self, vertices):
+        """Соседи всех vertices подряд и номер вершины для каждого соседа."""
+        starts = self.indptr[vertices]
+        lengths = self.indptr[vertices + 1] - starts
+        shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        offsets = np.arange(int(lengths.sum())) + shifts
+        return (self.indices[offsets],
+                np.repeat(np.arange(len(vertices)), lengths))
+
+
+def load_graph():
+    """Подписки и подписчики из Follow одним проходом по таблице."""
+    users, authors = array('q'), array('q')
+    for user_id, author_id in (
+            Follow.objects.order_by().values_list('user_id', 'author_id')
+            .iterator(chunk_size=READ_CHUNK_SIZE)):
+        users.append(user_id)
+        authors.append(author_id)
+    users = np.frombuffer(users, dtype=np.int64)
+    authors = np.frombuffer(authors, dtype=np.int64)
+    size = int(max(users.max(), authors.max())) + 1 if len(users) else 0
+    return Graph(users, authors, size), Graph(authors, users, size)
+
+
+def score(user_id, forward, reverse, top_n=TOP_N):
+    """Лучшие новые авторы для читателя: массивы id и оценок по убыванию."""
+    followed = forward.neighbours(user_id)
+    candidates, _ = forward.gather(followed)
+    weights = np.full(len(candidates), FOF_WEIGHT)
+    narrow = followed[reverse.degree(followed) <= COFOLLOW_MAX_FOLLOWERS]
+    similar, overlap = np.unique(reverse.gather(narrow)[0],
+                                 return_counts=True)
+    keep = similar != user_id
+    similar, overlap = similar[keep], overlap[keep]
+    if len(similar):
+        cosine = overlap / np.sqrt(forward.degree(similar) * len(followed))
+        authors, owners = forward.gather(similar)
+        candidates = np.concatenate([candidates, authors])
+        weights = np.concatenate([weights, COFOLLOW_WEIGHT * cosine[owners]])
+    authors, inverse = np.unique(candidates, return_inverse=True)
+    scores = np.bincount(inverse, weights=weights)
+    fresh = (authors != user_id) & ~np.isin(authors, followed)
+    authors, scores = authors[fresh], scores[fresh]
+    if len(authors) > top_n:
+        best = np.argpartition(-scores, top_n - 1)[:top_n]
+        authors, scores = authors[best], scores[best]
+    order = np.lexsort((authors, -scores))
+    return authors[order], scores[order]
+
+
+def _init(forward, reverse):
+    global _graphs
+    _graphs = forward, reverse
+
+
+def _score_chunk(task):
+    user_ids, top_n = task
+    forward, reverse = _graphs
+    result = []
+    for user_id in user_ids:
+        authors, scores = score(user_id, forward, reverse, top_n)
+        result.append((int(user_id), authors.tolist(), scores.tolist()))
+    return result
+
+
+def _scored(tasks, forward, reverse, workers):
+    global _graphs
+    if workers == 1:
+        _init(forward, reverse)
+        try:
+            yield from map(_score_chunk, tasks)
+        finally:
+            _graphs = None
+        return
+    with ProcessPoolExecutor(workers, initializer=_init,
+                             initargs=(forward, reverse)) as pool:
+        yield from pool.map(_score_chunk, tasks)
+
+
+def _save(chunk, created):
+    with transaction.atomic():
+        Recommendation.objects.filter(
+            user_id__in=[user_id for user_id, _, _ in chunk]).delete()
+        Recommendation.objects.bulk_create(
+            (
+                Recommendation(user_id=user_id, author_id=author_id,
+                               score=value, created=created)
+                for user_id, authors, scores in chunk
+                for author_id, value in zip(authors, scores)
+            ),
+            batch_size=CHUNK_SIZE,
+        )
+
+
+def build(top_n=TOP_N, workers=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Пересчитывает Recommendation целиком.
+
+    workers — число процессов (None — по числу ядер, 1 — без пула).
+    Каждая пачка читателей заменяется одной транзакцией, строки
+    читателей, у которых больше нет кандидатов, удаляются в конце.
+    progress(stats) вызывается после пачки. Возвращает {'users', 'rows'}.
+    """
+    started = timezone.now()
+    forward, reverse = load_graph()
+    readers = np.flatnonzero(np.diff(forward.indptr))
+    tasks = [(readers[start:start + chunk_size], top_n)
+             for start in range(0, len(readers), chunk_size)]
+    stats = {'users': 0, 'rows': 0}
+    for chunk in _scored(tasks, forward, reverse, workers):
+        _save(chunk, started)
+        stats['users'] += len(chunk)
+        stats['rows'] += sum(len(authors) for _, authors, _ in chunk)
+        if progress is not None:
+            progress(stats)
+    Recommendation.objects.filter(created__lt=started).delete()
+    return stats
@@ -0,0 +1,201 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Таблица `posts_post_fts` хранит только индекс (external content) над
+`posts_post.text` и синхронизируется триггерами, поэтому её не обходят
+ни `update()`, ни `bulk_create()`. Пересоздание таблицы постов
+миграцией SQLite удаляет триггеры — после таких миграций нужно снова
+вызвать `install()` (это же делает команда rebuild_search_index).
+"""
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .utils import QuerySetSource
+
+TABLE = 'posts_post_fts'
+SNIPPET_TOKENS = 24
+
+INSTALL_SQL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        text, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+)
+
+UNINSTALL_SQL = (
+    f'DROP TRIGGER IF EXISTS {TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {TABLE}_update',
+    f'DROP TABLE IF EXISTS {TABLE}',
+)
+
+# Маркеры подсветки не встречаются в тексте и переживают escape().
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+
+def enabled(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создаёт индекс и триггеры, если их ещё нет."""
+    with using.cursor() as cursor:
+        for statement in INSTALL_SQL:
+            cursor.execute(statement)
+
+
+def uninstall(using=connection):
+    with using.cursor() as cursor:
+        for statement in UNINSTALL_SQL:
+            cursor.execute(statement)
+
+
+def rebuild(using=connection):
+    """Перестраивает индекс по таблице постов и сжимает его."""
+    install(using)
+    with using.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+        cursor.execute('SELECT COUNT(*) FROM posts_post')
+        return cursor.fetchone()[0]
+
+
+def match_expression(query):
+    """Запрос пользователя как FTS5-выражение: все слова, каждое — фраза.
+
+    Кавычки и операторы FTS5 из ввода не интерпретируются.
+    """
+    return ' '.join(
+        '"{}"'.format(word.replace('"', '""')) for word in query.split()
+    )
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(_MARK_START, '<mark>')
+        .replace(_MARK_END, '</mark>')
+    )
+
+
+def matching(queryset, query):
+    """Фильтр queryset постов по совпадению с запросом, без ранжирования."""
+    if not enabled():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+        (match_expression(query),),
+    ))
+
+
+class SearchSource:
+    """Найденные посты по релевантности (bm25), затем по id.
+
+    Источник для CursorPaginator: ключ строки — (rank, id), страница
+    выбирается условием на ключ, а не OFFSET. Каждый пост получает
+    атрибуты `rank` и `snippet` с подсвеченным фрагментом текста.
+    """
+
+    fields = ('rank', 'id')
+    descending = False
+
+    def __init__(self, query, group=None, author=None):
+        self.expression = match_expression(query)
+        self.group = group
+        self.author = author
+
+    def key(self, post):
+        return post.rank, post.pk
+
+    def parse_key(self, values):
+        rank, pk = values
+        return float(rank), int(pk)
+
+    def _select(self, columns, after=None, reverse=False, limit=None,
+                offset=0):
+        where, params = [f'{TABLE} MATCH %s'], [self.expression]
+        if self.group is not None:
+            where.append('post.group_id = %s')
+            params.append(getattr(self.group, 'pk', self.group))
+        if self.author is not None:
+            where.append('post.author_id = %s')
+            params.append(getattr(self.author, 'pk', self.author))
+        sign, order = ('<', 'DESC') if reverse else ('>', 'ASC')
+        if after is not None:
+            where.append(f'({TABLE}.rank {sign} %s OR '
+                         f'({TABLE}.rank = %s AND post.id {sign} %s))')
+            params.extend((after[0], after[0], after[1]))
+        params.extend((limit, offset))
+        sql = (
+            f'SELECT {columns} FROM {TABLE} '
+            f'JOIN posts_post post ON post.id = {TABLE}.rowid '
+            f'WHERE {" AND ".join(where)} '
+            f'ORDER BY {TABLE}.rank {order}, post.id {order} '
+            f'LIMIT %s OFFSET %s'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _posts(self, rows):
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _, _ in rows])
+        result = []
+        for pk, rank, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.rank = rank
+                post.snippet = highlight(snippet)
+                result.append(post)
+        return result
+
+    def _rows(self, **kwargs):
+        if not self.expression:
+            return []
+        return self._posts(self._select(
+            f"post.id, {TABLE}.rank, snippet({TABLE}, 0, "
+            f"'{_MARK_START}', '{_MARK_END}', '…', {SNIPPET_TOKENS})",
+            **kwargs,
+        ))
+
+    def rows(self, after, limit):
+        return self._rows(after=after, limit=limit)
+
+    def rows_at(self, offset, limit):
+        return self._rows(limit=limit, offset=offset)
+
+    def keys_after(self, key, limit):
+        return self._select(f'{TABLE}.rank, post.id', after=key, limit=limit)
+
+    def keys_before(self, key, limit):
+        return self._select(f'{TABLE}.rank, post.id', after=key,
+                            reverse=True, limit=limit)
+
+
+def search(query, group=None, author=None):
+    """Источник результатов поиска для CursorPaginator."""
+    if enabled():
+        return SearchSource(query, group, author)
+    queryset = matching(Post.objects.select_related('author', 'group'), query)
+    if group is not None:
+        queryset = queryset.filter(group=group)
+    if author is not None:
+        queryset = queryset.filter(author=author)
+    return QuerySetSource(queryset)
@@ -0,0 +1,226 @@
+"""Наполнение базы большими объёмами данных для замеров.
+
+Строки пишутся пачками через bulk_create, поэтому сигналы не
+срабатывают: счётчики пересчитываются и ленты подписок пересобираются
+в конце (посты небольших авторов раскладываются, как при публикации, и
+bench follow_index меряет материализованную ленту, а не только pull),
+а поисковый индекс обновляют триггеры базы.
+"""
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.timezone import utc
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from . import counters, thumbnails, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+TEXT_POOL = 2000
+PASSWORD = 'bench-password'
+IMAGE_SIZE = (1200, 800)
+
+
+def _skewed(items, rng):
+    """Элемент с перекосом к началу: немногие авторы пишут и читаются
+    больше остальных."""
+    return items[int(len(items) * rng.random() ** 3)]
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _max_pk(model):
+    return model.objects.aggregate(top=Max('pk'))['top'] or 0
+
+
+@contextmanager
+def _explicit_dates():
+    """Даёт bulk_create сохранить заданные даты вместо auto_now_add."""
+    fields = [Post._meta.get_field('pub_date'),
+              Comment._meta.get_field('created')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Seeder:
+    """Генератор данных; progress(name, done, total) сообщает о ходе."""
+
+    def __init__(self, batch_size=BATCH_SIZE, days=365, seed=None,
+                 progress=None):
+        self.batch_size = batch_size
+        self.span = timedelta(days=days)
+        self.rng = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.progress = progress or (lambda name, done, total: None)
+        self.run = timezone.now().strftime('%y%m%d%H%M%S')
+        self.texts = [self.fake.text(max_nb_chars=400)
+                      for _ in range(TEXT_POOL)]
+
+    def _text(self):
+        return ' '.join(self.rng.sample(self.texts, self.rng.randint(1, 3)))
+
+    def _insert(self, name, model, objects, total, **kwargs):
+        """Пишет объекты пачками и возвращает id новых строк по порядку."""
+        before = _max_pk(model)
+        done = 0
+        for batch in _batches(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+            done += len(batch)
+            self.progress(name, done, total)
+        return list(
+            model.objects.filter(pk__gt=before).order_by('pk')
+            .values_list('pk', flat=True).iterator()
+        )
+
+    def users(self, total):
+        password = make_password(PASSWORD)
+        return self._insert('users', User, (
+            User(username=f'bench{self.run}_{number}', password=password,
+                 first_name=self.fake.first_name(),
+                 last_name=self.fake.last_name())
+            for number in range(total)
+        ), total)
+
+    def groups(self, total):
+        return self._insert('groups', Group, (
+            Group(title=self.fake.catch_phrase()[:200],
+                  slug=f'bench-{self.run}-{number}',
+                  description=self.fake.paragraph())
+            for number in range(total)
+        ), total)
+
+    def images(self, total):
+        """Несколько картинок на диске с готовыми миниатюрами."""
+        names = []
+        for number in range(total):
+            image = Image.new('RGB', IMAGE_SIZE, tuple(
+                self.rng.randrange(256) for _ in range(3)))
+            draw = ImageDraw.Draw(image)
+            for _ in range(12):
+                x, y = (self.rng.randrange(side) for side in IMAGE_SIZE)
+                draw.ellipse((x, y, x + 200, y + 160), fill=tuple(
+                    self.rng.randrange(256) for _ in range(3)))
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=85, progressive=True)
+            name = default_storage.save(
+                f'posts/bench_{self.run}_{number}.jpg',
+                ContentFile(buffer.getvalue()))
+            thumbnails.generate(name)
+            names.append(name)
+            self.progress('images', number + 1, total)
+        return names
+
+    def posts(self, total, authors, groups, images, image_ratio,
+              group_ratio):
+        """Посты равномерно по периоду; возвращает id и даты по порядку."""
+        start = timezone.now() - self.span
+        step = self.span / max(total, 1)
+        times = array('d')
+
+        def generate():
+            for number in range(total):
+                pub_date = start + step * number
+                times.append(pub_date.timestamp())
+                yield Post(
+                    text=self._text(),
+                    author_id=_skewed(authors, self.rng),
+                    group_id=(self.rng.choice(groups)
+                              if groups and self.rng.random() < group_ratio
+                              else None),
+                    image=(self.rng.choice(images)
+                           if images and self.rng.random() < image_ratio
+                           else ''),
+                    pub_date=pub_date,
+                )
+
+        with _explicit_dates():
+            ids = self._insert('posts', Post, generate(), total)
+        return ids, times
+
+    def follows(self, total, users):
+        def generate():
+            for _ in range(total):
+                user_id = self.rng.choice(users)
+                author_id = _skewed(users, self.rng)
+                if user_id != author_id:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        return self._insert('follows', Follow, generate(), total,
+                            ignore_conflicts=True)
+
+    def comments(self, total, users, post_ids, post_times):
+        """Комментарии чаще к свежим постам и не раньше самого поста."""
+        now = timezone.now()
+        day = timedelta(days=1).total_seconds()
+
+        def generate():
+            for _ in range(total):
+                index = len(post_ids) - 1 - int(
+                    len(post_ids) * self.rng.random() ** 3)
+                posted = post_times[index]
+                created = min(posted + self.rng.random() * 2 * day,
+                              now.timestamp())
+                yield Comment(
+                    post_id=post_ids[index],
+                    author_id=self.rng.choice(users),
+                    text=self.fake.sentence(),
+                    created=datetime.fromtimestamp(created, tz=utc),
+                )
+
+        with _explicit_dates():
+            return self._insert('comments', Comment, generate(), total)
+
+
+def seed(users, groups, posts, follows, comments, images=0,
+         image_ratio=0.2, group_ratio=0.7, **options):
+    """Создаёт данные, пересчитывает счётчики и ленты; возвращает число
+    строк."""
+    seeder = Seeder(**options)
+    user_ids = seeder.users(users)
+    group_ids = seeder.groups(groups)
+    image_names = seeder.images(images)
+    created = {'users': len(user_ids), 'groups': len(group_ids),
+               'images': len(image_names)}
+    if not user_ids:
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        if not user_ids:
+            return created
+    post_ids, post_times = seeder.posts(
+        posts, user_ids, group_ids, image_names, image_ratio, group_ratio)
+    created['posts'] = len(post_ids)
+    created['follows'] = len(seeder.follows(follows, user_ids))
+    if post_ids:
+        created['comments'] = len(seeder.comments(
+            comments, user_ids, post_ids, post_times))
+    counters.recount(chunk_size=seeder.batch_size)
+    created['timeline'] = timeline.rebuild()
+    return created
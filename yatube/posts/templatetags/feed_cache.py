@@ -0,0 +1,96 @@
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from core import metrics
+
+from ..caching import FEED_TIMEOUT
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/post_skeleton.html'
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+class FeedCacheNode(template.Node):
+
+    def __init__(self, nodelist, fragment, vary_on):
+        self.nodelist = nodelist
+        self.fragment = fragment
+        self.vary_on = vary_on
+
+    def render(self, context):
+        key = make_template_fragment_key(
+            self.fragment, [self.vary_on.resolve(context)])
+        value = cache.get(key)
+        metrics.inc('yatube_feed_cache_requests_total', {
+            'layer': 'fragment', 'feed': self.fragment,
+            'result': 'miss' if value is None else 'hit',
+        })
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(key, value, FEED_TIMEOUT)
+        return value
+
+
+@register.tag
+def feed_cache(parser, token):
+    """{% feed_cache <фрагмент> <ключ> %} — как {% cache %}, но со
+    счётчиком попаданий для /metrics."""
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} принимает имя фрагмента и ключ.')
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    return FeedCacheNode(nodelist, bits[1], parser.compile_filter(bits[2]))
+
+
+def card_key(post):
+    """Ключ карточки: пост, время его правки и показанные поля автора
+    и группы, чтобы переименование меняло ключ без сброса кэша."""
+    author, group = post.author, post.group
+    shown = (author.username, author.get_full_name(),
+             group.slug if group else '', group.title if group else '')
+    digest = hashlib.md5(repr(shown).encode()).hexdigest()[:12]
+    return f'card:{post.pk}:{post.updated.timestamp():.6f}:{digest}'
+
+
+@register.simple_tag
+def post_cards(posts):
+    """{% post_cards page_obj as cards %} — пары (пост, карточка).
+
+    Карточка одинакова во всех лентах и хранится по card_key: правка
+    поста меняет ключ только его карточки, переименование автора или
+    группы — ключи их карточек.
+    Карточки страницы читаются одним get_many, отрисовываются и
+    сохраняются одним set_many только отсутствующие. Карточка с
+    картинкой, миниатюры которой ещё не готовы, не сохраняется: иначе
+    исходная картинка осталась бы в ней на CARD_TIMEOUT.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {key: post for key, post in zip(keys, posts)
+               if key not in cards}
+    for result, count in (('hit', len(posts) - len(missing)),
+                          ('miss', len(missing))):
+        if count:
+            metrics.inc('yatube_feed_cache_requests_total', {
+                'layer': 'card', 'feed': 'post', 'result': result,
+            }, count)
+    if missing:
+        card = get_template(CARD_TEMPLATE)
+        ready = {}
+        for key, post in missing.items():
+            pending = set()
+            cards[key] = card.render(
+                {'post': post, 'pending_thumbnails': pending})
+            if not pending:
+                ready[key] = cards[key]
+        cache.set_many(ready, CARD_TIMEOUT)
+    return [(post, mark_safe(cards[key])) for key, post in zip(keys, posts)]
@@ -0,0 +1,28 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_image.html', takes_context=True)
+def post_image(context, image):
+    """Картинка поста с набором заранее созданных размеров.
+
+    Пока миниатюры создаются, отдаётся исходная картинка без srcset, а
+    её имя попадает в pending_thumbnails контекста, если он есть, —
+    такую карточку post_cards не кэширует.
+    """
+    if not image:
+        return {}
+    sources = thumbnails.lookup_all(image)
+    if len(sources) < len(thumbnails.SRCSET_WIDTHS):
+        pending = context.get('pending_thumbnails')
+        if pending is not None:
+            pending.add(image.name)
+        return {'src': image.url}
+    return {
+        'src': sources[thumbnails.FEED_WIDTH].url,
+        'srcset': ', '.join(f'{sources[width].url} {width}w'
+                            for width in thumbnails.SRCSET_WIDTHS),
+    }
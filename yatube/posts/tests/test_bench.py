@@ -0,0 +1,139 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+
+from .. import benchmarks
+from ..models import Comment, Follow, Group, Post, TimelineEntry, UserStats
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchCommandsTests(TransactionTestCase):
+    """Наполнение базы и замер основных страниц.
+
+    Замер копирует базу backup API SQLite, поэтому без транзакции теста.
+    """
+
+    def setUp(self):
+        call_command('seed_bench', users=20, groups=3, posts=120,
+                     follows=60, comments=200, images=2, batch_size=50,
+                     seed=1, stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed_bench(self):
+        """Данные созданы пачками, счётчики сходятся."""
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(0 < Follow.objects.count() <= 60)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertEqual(
+            Post.objects.dates('pub_date', 'day').count() > 1, True)
+        self.assertEqual(UserStats.objects.count(), 20)
+        self.assertEqual(
+            sum(UserStats.objects.values_list('posts_count', flat=True)),
+            120)
+        comment = Comment.objects.select_related('post').first()
+        self.assertGreaterEqual(comment.created, comment.post.pub_date)
+        follow = Follow.objects.filter(author__posts__isnull=False).first()
+        self.assertFalse(Post.objects.filter(
+            author=follow.author, fanned_out=False).exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=follow.user, author=follow.author).exists())
+
+    def test_bench_report(self):
+        """Отчёт в JSON по всем сценариям; записи замера фиксируются в
+        копии базы и в основную не попадают."""
+        posts = Post.objects.count()
+        original = connection.settings_dict['NAME']
+        seen = []
+
+        def measure(*args, **kwargs):
+            seen.append((connection.settings_dict['NAME'],
+                         connection.get_autocommit()))
+            return benchmarks.measure(*args, **kwargs)
+
+        out = StringIO()
+        with mock.patch('posts.management.commands.bench.measure', measure):
+            call_command('bench', repeat=3, warmup=1, stdout=out)
+        self.assertNotIn(original, {name for name, _ in seen})
+        self.assertEqual({autocommit for _, autocommit in seen}, {True})
+        self.assertEqual(connection.settings_dict['NAME'], original)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['scenarios']), {
+            'index', 'group_posts', 'profile', 'post_detail',
+            'follow_index', 'post_create', 'add_comment'})
+        for name, result in report['scenarios'].items():
+            with self.subTest(name=name):
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertLessEqual(result['queries'],
+                                     result['queries_max'])
+                self.assertGreater(result['peak_memory_kb'], 0)
+        self.assertEqual(report['scenarios']['index']['status'], [200])
+        self.assertEqual(report['scenarios']['post_create']['status'], [302])
+        self.assertEqual(Post.objects.count(), posts)
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__text__startswith='Замер').exists())
+
+    def test_cold_cache(self):
+        """С холодным кэшем страница ходит в базу на каждый запрос."""
+        out = StringIO()
+        call_command('bench', 'index', repeat=2, cold=True, stdout=out)
+        result = json.loads(out.getvalue())['scenarios']['index']
+        self.assertGreater(result['queries'], 0)
+
+    def test_bench_keeps_shared_cache(self):
+        """Замер работает со своим кэшем и не очищает общий."""
+        cache.set('bench-marker', 1)
+        call_command('bench', 'index', repeat=1, warmup=0, cold=True,
+                     stdout=StringIO())
+        self.assertEqual(cache.get('bench-marker'), 1)
+
+    def test_bench_outside_transaction(self):
+        """Замер не запускается внутри транзакции."""
+        with transaction.atomic(), \
+                self.assertRaisesMessage(CommandError, 'транзакции'):
+            call_command('bench', 'index', repeat=1, stdout=StringIO())
+
+    def test_bench_sqlite_needs_file_database(self):
+        """Нагрузочный замер SQLite работает только с базой в файле."""
+        with self.assertRaisesMessage(CommandError, 'в файле'):
+            call_command('bench_sqlite', duration=0.1, stdout=StringIO())
+
+
+class BenchmarkQueriesTests(TransactionTestCase):
+    """Планы запросов до и после индексов.
+
+    Копия базы снимается через backup SQLite, которому мешает открытая
+    транзакция TestCase.
+    """
+
+    def test_benchmark_queries(self):
+        """Планы до и после индексов на копии с текущей схемой."""
+        call_command('seed_bench', users=5, groups=2, posts=30, follows=10,
+                     comments=20, images=0, seed=1, stdout=StringIO())
+        cache.set('bench-marker', 1)
+        out = StringIO()
+        call_command('benchmark_queries', repeat=1, stdout=out)
+        report = out.getvalue()
+        for name in ('posts:main_page', 'posts:group_list', 'posts:profile',
+                     'posts:post_detail', 'posts:follow_index'):
+            self.assertIn(name, report)
+        before, after = report.count('до:'), report.count('после:')
+        self.assertEqual(before, after)
+        self.assertGreater(before, 0)
+        self.assertIn('post_date_id_idx', report)
+        self.assertEqual(cache.get('bench-marker'), 1)
@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.test import Client
+from django.urls import reverse
+
+from core.testing import QueryBudgetTestCase
+
+from .. import caching
+from ..models import Group, Post
+from ..templatetags import feed_cache
+
+User = get_user_model()
+
+
+class PostCardCacheTests(QueryBudgetTestCase):
+    """Карточки постов кэшируются отдельно и общие для всех лент."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [Post.objects.create(text=f'Пост {number}',
+                                         author=cls.author, group=cls.group)
+                     for number in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def get(self, url):
+        """Ответ и число отрисованных при нём карточек."""
+        card = get_template(feed_cache.CARD_TEMPLATE)
+        with mock.patch.object(feed_cache, 'get_template',
+                               return_value=card), \
+                mock.patch.object(card, 'render',
+                                  wraps=card.render) as render:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, render.call_count
+
+    def test_cards_shared_between_feeds(self):
+        """Карточки главной переиспользуются в группе и профиле."""
+        _, rendered = self.get(reverse('posts:main_page'))
+        self.assertEqual(rendered, 3)
+        for url in (reverse('posts:group_list', args=[self.group.slug]),
+                    reverse('posts:profile', args=[self.author.username])):
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url)[1], 0)
+
+    def test_edit_invalidates_own_card(self):
+        """Правка поста меняет только его карточку."""
+        self.get(reverse('posts:main_page'))
+        edited = self.posts[0]
+        old_key = feed_cache.card_key(edited)
+        self.client.post(reverse('posts:post_edit', args=[edited.pk]),
+                         {'text': 'Исправленный пост'})
+        edited.refresh_from_db()
+        self.assertNotEqual(feed_cache.card_key(edited), old_key)
+        response, rendered = self.get(reverse('posts:main_page'))
+        self.assertEqual(rendered, 1)
+        self.assertContains(response, 'Исправленный пост')
+        self.assertNotContains(response, 'Пост 0')
+
+    def test_rename_changes_card_keys(self):
+        """Карточки живут дольше лент: после истечения ленты в ней новое
+        имя автора и адрес группы, а не суточная карточка."""
+        url = reverse('posts:main_page')
+        self.get(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name, author.last_name = 'Лев', 'Толстой'
+        author.save()
+        caching.bump('index')
+        response, rendered = self.get(url)
+        self.assertEqual(rendered, 3)
+        self.assertContains(response, 'Лев Толстой', count=3)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        caching.bump('index')
+        response, rendered = self.get(url)
+        self.assertEqual(rendered, 3)
+        self.assertContains(response, '/group/renamed/', count=3)
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.testing import QueryBudgetTestCase
+
+from ..models import Comment, Post
+from ..views import COMMENTS_QUANTITY
+
+User = get_user_model()
+
+
+class CommentThreadTests(QueryBudgetTestCase):
+    """Комментарии на странице поста."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.url = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def add_comments(self, total):
+        for num in range(total):
+            Comment.objects.create(
+                post=self.post, text=f'Комментарий {num}',
+                author=User.objects.create_user(username=f'reader{num}'),
+            )
+
+    def count_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        return len(context)
+
+    def test_query_count_does_not_grow_with_comments(self):
+        """Число запросов не зависит от числа комментариев."""
+        self.add_comments(2)
+        few = self.count_queries()
+        Comment.objects.all().delete()
+        User.objects.filter(username__startswith='reader').delete()
+        self.add_comments(COMMENTS_QUANTITY * 2)
+        self.assertEqual(self.count_queries(), few)
+
+    def test_comments_are_paginated(self):
+        """Страница поста показывает ограниченное число комментариев."""
+        self.add_comments(COMMENTS_QUANTITY + 5)
+        response = self.client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_QUANTITY)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertTrue(comments.has_next())
+
+    def test_load_more_fragment(self):
+        """Фрагмент «ещё комментарии» продолжает ветку по курсору."""
+        self.add_comments(COMMENTS_QUANTITY + 5)
+        response = self.client.get(self.url)
+        query = response.context['comments'].paginator.next_query
+        more = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]) + '?' + query)
+        self.assertTemplateUsed(more, 'includes/comment_list.html')
+        self.assertEqual(len(more.context['comments']), 5)
+        self.assertContains(more, f'Комментарий {COMMENTS_QUANTITY}')
+        self.assertNotContains(more, 'Показать ещё комментарии')
+
+    def test_new_comment_visible_immediately(self):
+        """Новый комментарий сразу виден на странице поста."""
+        self.client.get(self.url)
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Свежий комментарий')
+        self.assertContains(self.client.get(self.url), 'Свежий комментарий')
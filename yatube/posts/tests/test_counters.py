@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+
+from core.testing import QueryBudgetTestCase
+
+from ..models import Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CounterTests(QueryBudgetTestCase):
+    """Денормализованные счётчики."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='counted', description='Описание')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_views_update_counters(self):
+        """Создание поста, комментария и подписка меняют счётчики."""
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'Пост', 'group': self.group.pk})
+        post = Post.objects.get()
+        self.client.post(reverse('posts:add_comment', args=[post.pk]),
+                         {'text': 'Комментарий'})
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.reader.username]))
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.assertEqual(self.stats(self.reader).followers_count, 1)
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.reader.username]))
+        self.assertEqual(self.stats(self.reader).followers_count, 0)
+
+    def test_profile_shows_counters(self):
+        """Профиль показывает сохранённый счётчик постов."""
+        Post.objects.create(text='Пост', author=self.user)
+        call_command('recount', stdout=StringIO())
+        response = self.client.get(
+            reverse('posts:profile', args=[self.user.username]))
+        self.assertContains(response, 'Всего постов: 1')
+
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет расхождения."""
+        Post.objects.create(text='Пост', author=self.user, group=self.group)
+        UserStats.objects.filter(user=self.user).update(posts_count=7)
+        call_command('recount', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
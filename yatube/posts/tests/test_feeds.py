@@ -0,0 +1,139 @@
+import shutil
+import tempfile
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class FeedTests(TestCase):
+    """RSS и Atom сайта, группы и автора."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой', author=cls.author, group=cls.group,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                     content_type='image/gif'))
+        cls.other_post = Post.objects.create(text='Чужой пост',
+                                             author=cls.other)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def rss_items(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith(
+            'application/rss+xml'))
+        return ElementTree.fromstring(response.content).findall(
+            'channel/item')
+
+    def test_rss(self):
+        """Ленты сайта, группы и автора содержат свои посты."""
+        cases = {
+            reverse('posts:site_rss'): ['Чужой пост', 'Пост с картинкой'],
+            reverse('posts:group_rss', args=[self.group.slug]):
+                ['Пост с картинкой'],
+            reverse('posts:author_rss', args=[self.other.username]):
+                ['Чужой пост'],
+        }
+        for url, titles in cases.items():
+            with self.subTest(url=url):
+                items = self.rss_items(url)
+                self.assertEqual([item.findtext('title') for item in items],
+                                 titles)
+
+    def test_absolute_links_and_images(self):
+        """Ссылки и картинки в ленте абсолютные."""
+        item = self.rss_items(reverse('posts:site_rss'))[-1]
+        self.assertEqual(
+            item.findtext('link'), 'http://testserver' + reverse(
+                'posts:post_detail', args=[self.post.pk]))
+        enclosure = item.find('enclosure')
+        self.assertTrue(enclosure.get('url').startswith(
+            'http://testserver/media/'))
+        self.assertIn(enclosure.get('url'), item.findtext('description'))
+        self.assertEqual(item.findtext('category'), 'Группа')
+
+    def test_atom(self):
+        """Atom-версия той же ленты."""
+        response = self.client.get(
+            reverse('posts:author_atom', args=[self.author.username]))
+        self.assertEqual(response.status_code, 200)
+        feed = ElementTree.fromstring(response.content)
+        self.assertEqual(
+            [entry.findtext(f'{ATOM}title')
+             for entry in feed.findall(f'{ATOM}entry')],
+            ['Пост с картинкой'])
+
+    def test_cached_until_content_changes(self):
+        """Лента строится раз на версию, клиенты получают 304."""
+        url = reverse('posts:site_rss')
+        first = self.client.get(url)
+        self.assertIn('public', first['Cache-Control'])
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        not_modified = self.client.get(
+            url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Новый пост', response.content.decode())
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'mirror.example'])
+    def test_cached_per_host_and_scheme(self):
+        """Ссылки в закэшированной ленте — от адреса текущего запроса."""
+        url = reverse('posts:site_rss')
+        self.client.get(url)
+        for extra, origin in (
+                ({'HTTP_HOST': 'mirror.example'}, 'http://mirror.example'),
+                ({'secure': True}, 'https://testserver')):
+            with self.subTest(origin=origin):
+                response = self.client.get(url, **extra)
+                item = ElementTree.fromstring(
+                    response.content).findall('channel/item')[-1]
+                self.assertTrue(item.findtext('link').startswith(
+                    origin + '/'))
+
+    def test_unknown_group(self):
+        """Лента несуществующей группы — 404."""
+        response = self.client.get(reverse('posts:group_rss',
+                                           args=['missing']))
+        self.assertEqual(response.status_code, 404)
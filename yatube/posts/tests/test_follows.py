@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from core.testing import QueryBudgetTestCase
+
+from .. import counters, follows, graph
+from ..models import Follow, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+
+class FollowTests(QueryBudgetTestCase):
+    """Подписка и отписка одним запросом, пакетный импорт."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [User.objects.create_user(username=f'user{number}')
+                     for number in range(4)]
+        cls.reader, cls.author = cls.users[:2]
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка и отписка ничего не меняют."""
+        self.assertTrue(follows.follow(self.reader.pk, self.author.pk))
+        self.assertFalse(follows.follow(self.reader.pk, self.author.pk))
+        self.assertFalse(follows.follow(self.reader.pk, self.reader.pk))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.post).exists())
+        self.assertTrue(follows.unfollow(self.reader.pk, self.author.pk))
+        self.assertFalse(follows.unfollow(self.reader.pk, self.author.pk))
+        self.assertEqual(Follow.objects.count(), 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_double_click(self):
+        """Два запроса подписки подряд создают одну подписку."""
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:profile_follow', args=[self.author.username])
+        for _ in range(2):
+            response = client.get(url)
+            self.assertRedirects(
+                response,
+                reverse('posts:profile', args=[self.author.username]))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        response = client.get(reverse('posts:profile_follow',
+                                      args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_import_follows(self):
+        """Импорт пропускает повторы, себя и неизвестных; счётчики верны."""
+        follows.follow(self.reader.pk, self.author.pk)
+        before = counters.recount(fix=False)
+        ids = [user.pk for user in self.users]
+        pairs = [(ids[0], ids[1]), (ids[0], ids[2]), (ids[0], ids[2]),
+                 (ids[3], ids[3]), (ids[3], 0), (ids[2], ids[1]),
+                 (ids[3], ids[1])]
+        progress = []
+        stats = follows.import_follows(pairs, chunk_size=2,
+                                       progress=progress.append)
+        self.assertEqual(stats, {'read': 7, 'created': 3})
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(Follow.objects.count(), 4)
+        self.assertEqual(self.stats(self.author).followers_count, 3)
+        self.assertEqual(counters.recount(fix=False), before)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user_id=ids[3], post=self.post).exists())
+
+    def test_import_chunk_fits_in_limit(self):
+        """Большая пачка делится так, что IN не длиннее graph.IN_LIMIT."""
+        User.objects.bulk_create(User(username=f'bulk{number}')
+                                 for number in range(graph.IN_LIMIT))
+        ids = list(User.objects.filter(username__startswith='bulk')
+                   .values_list('pk', flat=True))
+        pairs = list(zip(ids, ids[1:] + ids[:1]))
+        bound = []
+
+        def record(execute, sql, params, many, context):
+            if not many:
+                bound.append(len(params or ()))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            stats = follows.import_follows(pairs, chunk_size=10000)
+        self.assertEqual(stats['created'], len(pairs))
+        self.assertLessEqual(max(bound), graph.IN_LIMIT)
+
+    def test_import_command(self):
+        """Команда читает CSV с именами пользователей."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'follows.csv')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('user,author\nuser0,user1\nuser2,user1\n'
+                       'user3,nobody\n')
+        out = StringIO()
+        call_command('import_follows', path, chunk_size=1, stdout=out)
+        self.assertIn('создано 2', out.getvalue())
+        self.assertIn('неизвестных пользователей 1', out.getvalue())
+        self.assertEqual(self.stats(self.author).followers_count, 2)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('follower,followed\n')
+        with self.assertRaises(CommandError):
+            call_command('import_follows', path, stdout=StringIO())
@@ -1,18 +1,32 @@
+import os
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError
+from django.test import Client, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from core.testing import QueryBudgetTestCase, QueryBudgetTransactionTestCase
+
+from .. import counters, images
+from ..forms import PostForm
+from ..images import MAX_SIDE
 from ..models import Group, Post
 
 User = get_user_model()
 
+ORIENTATION_TAG = 0x0112
+
 
-class PostFormTests(TestCase):
+class PostFormTests(QueryBudgetTestCase):
     """Форма создания и редактирования поста."""
 
     @classmethod
@@ -96,3 +110,132 @@ class PostFormTests(TestCase):
         post_2 = Post.objects.get(id=PostFormTests.group.id)
         self.assertEqual(response_edit.status_code, HTTPStatus.OK)
         self.assertEqual(post_2.text, 'edited')
+
+
+class ImageIngestionTests(QueryBudgetTestCase):
+    """Обработка картинки при загрузке через форму поста."""
+
+    @staticmethod
+    def upload(image, name='photo.jpg', **save_options):
+        buffer = BytesIO()
+        image.save(buffer, **save_options)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def clean(self, upload):
+        form = PostForm(data={'text': 'Пост'}, files={'image': upload})
+        form.is_valid()
+        return form
+
+    def test_exif_orientation_applied_and_stripped(self):
+        """Поворот из EXIF применяется, метаданные удаляются."""
+        exif = Image.Exif()
+        exif[ORIENTATION_TAG] = 6
+        upload = self.upload(Image.new('RGB', (40, 20)), format='JPEG',
+                             exif=exif.tobytes())
+        form = self.clean(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+        stored = Image.open(form.cleaned_data['image'])
+        self.assertEqual(stored.size, (20, 40))
+        self.assertNotIn('exif', stored.info)
+        self.assertEqual(stored.format, 'JPEG')
+
+    def test_dimensions_capped(self):
+        """Большие стороны уменьшаются до MAX_SIDE."""
+        upload = self.upload(Image.new('RGB', (MAX_SIDE * 2, 100)),
+                             name='wide.png', format='PNG')
+        form = self.clean(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+        stored = Image.open(form.cleaned_data['image'])
+        self.assertEqual(stored.size[0], MAX_SIDE)
+        self.assertTrue(form.cleaned_data['image'].name.endswith('.jpg'))
+
+    def test_transparency_kept_as_png(self):
+        """Картинка с прозрачностью остаётся PNG."""
+        upload = self.upload(Image.new('RGBA', (10, 10)),
+                             name='alpha.png', format='PNG')
+        form = self.clean(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertTrue(form.cleaned_data['image'].name.endswith('.png'))
+
+    def test_pixel_limit(self):
+        """Слишком большое разрешение отклоняется до декодирования."""
+        upload = self.upload(Image.new('RGB', (50, 50)), format='PNG',
+                             name='big.png')
+        with mock.patch.object(images, 'MAX_PIXELS', 100):
+            form = self.clean(upload)
+        self.assertIn('image', form.errors)
+
+    def test_byte_limit(self):
+        """Слишком большой файл отклоняется."""
+        upload = self.upload(Image.new('RGB', (50, 50)), format='PNG',
+                             name='heavy.png')
+        with mock.patch.object(images, 'MAX_UPLOAD_BYTES', 10):
+            form = self.clean(upload)
+        self.assertIn('image', form.errors)
+
+    def test_truncated_image(self):
+        """Обрезанный файл — ошибка поля, а не ошибка сервера."""
+        upload = self.upload(Image.effect_noise((200, 200), 64),
+                             format='JPEG')
+        upload = SimpleUploadedFile('cut.jpg', upload.read()[:2000])
+        form = self.clean(upload)
+        self.assertIn('image', form.errors)
+        client = Client()
+        client.force_login(User.objects.create_user(username='author'))
+        upload.seek(0)
+        response = client.post(reverse('posts:post_create'),
+                               {'text': 'Пост', 'image': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'image',
+                             'Картинка повреждена или обрезана.')
+
+    def test_decompression_bomb(self):
+        """Бомба распаковки Pillow — ValidationError, а не 500."""
+        upload = self.upload(Image.new('RGB', (50, 50)), format='PNG',
+                             name='bomb.png')
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 10), \
+                self.assertRaisesMessage(ValidationError, 'разрешение'):
+            images.ingest(upload)
+
+
+class LockedWriteTests(QueryBudgetTransactionTestCase):
+    """Повтор записи, заставшей базу занятой.
+
+    Повтор возможен только вне транзакции, поэтому не TestCase.
+    """
+
+    def setUp(self):
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.client.force_login(User.objects.create_user(username='mando'))
+
+    # Повторённая транзакция заново читает подписчиков и отмечает пост
+    # разложенным; остальные повторы и превышение бюджета роняют тест.
+    @override_settings(QUERY_BUDGET_DUPLICATES=2)
+    @mock.patch('core.sqlite.time.sleep')
+    def test_locked_create_stores_image_once(self, sleep):
+        """Повторяется только транзакция: картинка сохраняется один раз."""
+        post_created = counters.post_created
+        calls = []
+
+        def locked_once(post):
+            calls.append(post.pk)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            post_created(post)
+
+        upload = ImageIngestionTests.upload(
+            Image.new('RGB', (10, 10)), name='locked.jpg', format='JPEG')
+        with mock.patch.object(counters, 'post_created', locked_once):
+            response = self.client.post(
+                reverse('posts:post_create'),
+                {'text': 'locked', 'image': upload})
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertEqual(len(calls), 2)
+        post = Post.objects.get(text='locked')
+        stored = [name for name in os.listdir(
+            os.path.dirname(post.image.path)) if name.startswith('locked')]
+        self.assertEqual(stored, [os.path.basename(post.image.name)])
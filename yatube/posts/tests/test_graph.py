@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from core.testing import QueryBudgetTestCase
+
+from .. import follows, graph
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+class FollowGraphTests(QueryBudgetTestCase):
+    """Кэш подписок читателя."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{number}')
+                       for number in range(3)]
+        for author in cls.authors:
+            Post.objects.create(text=f'Пост {author.username}', author=author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_sorted_ids(self):
+        """Подписки — отсортированный массив, второй раз без запросов."""
+        for author in reversed(self.authors[:2]):
+            follows.follow(self.reader.pk, author.pk)
+        expected = sorted(author.pk for author in self.authors[:2])
+        self.assertEqual(list(graph.following_ids(self.reader.pk)), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                graph.followed_among(
+                    self.reader.pk, [author.pk for author in self.authors]),
+                set(expected))
+            self.assertFalse(
+                graph.is_following(self.reader.pk, self.authors[2].pk))
+
+    def test_invalidated_on_change(self):
+        """Подписка, отписка и импорт сразу видны в графе."""
+        author = self.authors[0]
+        self.assertFalse(graph.is_following(self.reader.pk, author.pk))
+        follows.follow(self.reader.pk, author.pk)
+        self.assertTrue(graph.is_following(self.reader.pk, author.pk))
+        follows.unfollow(self.reader.pk, author.pk)
+        self.assertFalse(graph.is_following(self.reader.pk, author.pk))
+        Follow.objects.create(user=self.reader, author=author)
+        self.assertTrue(graph.is_following(self.reader.pk, author.pk))
+        follows.import_follows([(self.reader.pk, self.authors[1].pk)])
+        self.assertTrue(graph.is_following(self.reader.pk,
+                                           self.authors[1].pk))
+
+    def test_followed_filter(self):
+        """Фильтр по подпискам одинаков через IN и через JOIN."""
+        follows.follow(self.reader.pk, self.authors[1].pk)
+        expected = ['Пост author1']
+        queryset = Post.objects.order_by('pk')
+        self.assertEqual(
+            [post.text for post in graph.followed(queryset, self.reader.pk)],
+            expected)
+        with mock.patch.object(graph, 'IN_LIMIT', 0):
+            self.assertEqual(
+                [post.text
+                 for post in graph.followed(queryset, self.reader.pk)],
+                expected)
+
+    def test_profile_follow_state(self):
+        """Кнопка подписки на странице автора берёт состояние из графа."""
+        client = Client()
+        client.force_login(self.reader)
+        author = self.authors[0]
+        url = reverse('posts:profile', args=[author.username])
+        self.assertFalse(client.get(url).context['following'])
+        client.get(reverse('posts:profile_follow', args=[author.username]))
+        self.assertTrue(client.get(url).context['following'])
+        client.get(reverse('posts:profile_unfollow', args=[author.username]))
+        self.assertFalse(client.get(url).context['following'])
@@ -1,6 +1,10 @@
+from importlib import import_module
+
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.db.migrations.loader import MigrationLoader
 from django.test import TestCase
-from ..models import Group, Post
+from ..models import Follow, Group, Post
 
 User = get_user_model()
 
@@ -34,3 +38,40 @@ class PostGroupModelTest(TestCase):
         group = PostGroupModelTest.group
         expected_object_name = PostGroupModelTest.group.title
         self.assertEqual(expected_object_name, str(group))
+
+
+class FollowModelTest(TestCase):
+    """Ограничения модели подписок."""
+
+    def test_follow_pair_is_unique(self):
+        """Повторная подписка на того же автора невозможна."""
+        user = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='writer')
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=user, author=author)
+
+    def test_dedupe_migration_binds_no_ids(self):
+        """Миграция удаляет повторы одним DELETE с подзапросом."""
+        User.objects.bulk_create(
+            User(username=f'user{number}') for number in range(30))
+        users = list(User.objects.all())
+        Follow.objects.bulk_create(
+            Follow(user=user, author=author)
+            for user in users for author in users if user != author)
+        apps = MigrationLoader(connection).project_state(
+            ('posts', '0006_indexes')).apps
+        migration = import_module('posts.migrations.0007_unique_follow')
+        executed = []
+
+        def record(execute, sql, params, many, context):
+            executed.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            migration.remove_duplicate_follows(apps, None)
+        self.assertEqual(len(executed), 1)
+        sql, params = executed[0]
+        self.assertTrue(sql.startswith('DELETE'))
+        self.assertLess(len(params), 10)
+        self.assertEqual(Follow.objects.count(), 30 * 29)
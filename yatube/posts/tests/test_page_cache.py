@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    """Полный кэш страниц и условные запросы для анонимных читателей."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+        cls.urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.author.username]),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_headers(self):
+        """Анонимный ответ кэшируется прокси и зависит от cookie."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('s-maxage', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_cached_page_is_not_rendered(self):
+        """Повторный запрос отдаётся из кэша без шаблонов."""
+        first = self.client.get(self.urls[0])
+        with self.assertNumQueries(0):
+            second = self.client.get(self.urls[0])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second.templates, [])
+
+    def test_not_modified(self):
+        """If-None-Match и If-Modified-Since дают 304 без представления."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                not_modified = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.templates, [])
+                not_modified = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_writes_change_version(self):
+        """Пост, комментарий и подписка меняют ETag своих страниц."""
+        index, _, profile, detail = self.urls
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(index,
+                                   HTTP_IF_NONE_MATCH=etags[index])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый пост')
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Комментарий')
+        response = self.client.get(detail)
+        self.assertNotEqual(response['ETag'], etags[detail])
+        self.assertContains(response, 'Комментарий')
+        etags[profile] = self.client.get(profile)['ETag']
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'),
+            author=self.author)
+        self.assertNotEqual(self.client.get(profile)['ETag'],
+                            etags[profile])
+
+    def test_authenticated_pages_are_private(self):
+        """Страницы авторизованных не кэшируются и не делятся."""
+        self.client.force_login(self.author)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotIn('ETag', response)
+                self.assertIn('private', response['Cache-Control'])
+
+    def test_missing_object(self):
+        """Несуществующие объекты по-прежнему дают 404."""
+        for url in (reverse('posts:group_list', args=['missing']),
+                    reverse('posts:profile', args=['missing']),
+                    reverse('posts:post_detail', args=[10 ** 6])):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,98 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import follows, graph, recommendations, recommender
+from ..models import Recommendation
+
+User = get_user_model()
+
+EDGES = (('reader', 'friend'), ('friend', 'author'), ('friend', 'other'),
+         ('twin', 'friend'), ('twin', 'favourite'), ('friend', 'reader'))
+
+
+class RecommendationTests(TestCase):
+    """Друзья друзей и совместные подписки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = {name for edge in EDGES for name in edge}
+        cls.users = {name: User.objects.create_user(username=name)
+                     for name in sorted(names)}
+        for user, author in EDGES:
+            follows.follow(cls.users[user].pk, cls.users[author].pk)
+
+    def setUp(self):
+        cache.clear()
+
+    def names(self, user_ids):
+        by_id = {user.pk: name for name, user in self.users.items()}
+        return [by_id[user_id] for user_id in user_ids]
+
+    def test_score(self):
+        """Похожий читатель весит больше, подписки и сам читатель — нет."""
+        forward, reverse = recommender.load_graph()
+        authors, scores = recommender.score(self.users['reader'].pk,
+                                            forward, reverse)
+        self.assertEqual(self.names(authors),
+                         ['favourite', 'author', 'other'])
+        self.assertAlmostEqual(scores[0], 2 / 2 ** 0.5)
+        self.assertEqual(list(scores[1:]), [1.0, 1.0])
+        authors, _ = recommender.score(self.users['reader'].pk,
+                                       forward, reverse, top_n=1)
+        self.assertEqual(self.names(authors), ['favourite'])
+
+    def test_build(self):
+        """Пул процессов даёт ту же таблицу, устаревшие строки удаляются."""
+        stats = recommender.build(workers=1, chunk_size=2)
+        rows = list(Recommendation.objects.order_by(
+            'user_id', '-score', 'author_id').values_list(
+            'user_id', 'author_id', 'score'))
+        self.assertEqual(stats, {'users': 3, 'rows': len(rows)})
+        recommender.build(workers=2, chunk_size=1)
+        self.assertEqual(list(Recommendation.objects.order_by(
+            'user_id', '-score', 'author_id').values_list(
+            'user_id', 'author_id', 'score')), rows)
+        follows.unfollow(self.users['twin'].pk, self.users['friend'].pk)
+        follows.unfollow(self.users['twin'].pk, self.users['favourite'].pk)
+        recommender.build(workers=1)
+        self.assertFalse(Recommendation.objects.filter(
+            user=self.users['twin']).exists())
+
+    def test_for_user(self):
+        """Блок — одно чтение таблицы; свежие подписки отсеиваются."""
+        recommender.build(workers=1)
+        reader = self.users['reader']
+        graph.following_ids(reader.pk)
+        with self.assertNumQueries(1):
+            authors = recommendations.for_user(reader.pk)
+            self.assertEqual([author.username for author in authors],
+                             ['favourite', 'author', 'other'])
+            self.assertEqual(authors[0].stats.followers_count, 1)
+        follows.follow(reader.pk, self.users['favourite'].pk)
+        self.assertEqual(
+            [author.username
+             for author in recommendations.for_user(reader.pk, limit=1)],
+            ['author'])
+
+    def test_pages(self):
+        """Блок «кого почитать» на странице автора и в ленте подписок."""
+        call_command('recommend', workers=1, stdout=StringIO())
+        client = Client()
+        client.force_login(self.users['reader'])
+        for url in (reverse('posts:follow_index'),
+                    reverse('posts:profile', args=['friend'])):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertContains(response, 'Кого почитать')
+                self.assertEqual(
+                    [author.username
+                     for author in response.context['recommended']],
+                    ['favourite', 'author', 'other'])
+        response = Client().get(reverse('posts:profile', args=['friend']))
+        self.assertNotContains(response, 'Кого почитать')
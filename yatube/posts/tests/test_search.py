@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    """Полнотекстовый поиск по постам."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(title='Коты', slug='cats',
+                                         description='Про котов')
+        cls.rare = Post.objects.create(
+            text='Рыжий кот спит на подоконнике', author=cls.author,
+            group=cls.group)
+        cls.often = Post.objects.create(
+            text='кот кот кот', author=cls.other)
+        cls.dog = Post.objects.create(
+            text='Собака гуляет во дворе', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+
+    def results(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        self.assertEqual(response.status_code, 200)
+        page_obj = response.context['page_obj']
+        return [] if page_obj is None else list(page_obj)
+
+    def test_ranked_results(self):
+        """Найденные посты упорядочены по релевантности."""
+        self.assertEqual(self.results(q='КОТ'), [self.often, self.rare])
+        self.assertEqual(self.results(q='рыжий кот'), [self.rare])
+        self.assertEqual(self.results(q='кит'), [])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Совпадения подсвечены, разметка из текста экранирована."""
+        Post.objects.create(text='<b>кот</b> и мышь', author=self.author)
+        post, = self.results(q='мышь')
+        self.assertEqual(post.snippet,
+                         '&lt;b&gt;кот&lt;/b&gt; и <mark>мышь</mark>')
+
+    def test_filters(self):
+        """Фильтры по группе и автору."""
+        self.assertEqual(self.results(q='кот', group='cats'), [self.rare])
+        self.assertEqual(self.results(q='кот', author='other'), [self.often])
+        self.assertEqual(self.results(q='кот', author='nobody'), [])
+
+    def test_fts_syntax_is_not_interpreted(self):
+        """Операторы FTS5 во вводе не ломают запрос."""
+        self.assertEqual(self.results(q='"кот OR NEAR('), [])
+        self.assertEqual(self.results(q='кот*'), [self.often, self.rare])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Триггеры держат индекс в актуальном состоянии."""
+        Post.objects.filter(pk=self.dog.pk).update(text='Пёс и кошка')
+        self.assertEqual(self.results(q='кошка'), [self.dog])
+        self.assertEqual(self.results(q='собака'), [])
+        Post.objects.filter(pk=self.dog.pk).delete()
+        self.assertEqual(self.results(q='кошка'), [])
+
+    def test_cursor_pagination(self):
+        """Результаты листаются курсорами без повторов и пропусков."""
+        Post.objects.bulk_create(
+            Post(text=f'кот номер {num}', author=self.other)
+            for num in range(25)
+        )
+        expected = search.search('кот').rows(None, 100)
+        url = reverse('posts:search') + '?q=кот'
+        seen = []
+        while True:
+            page_obj = self.client.get(url).context['page_obj']
+            seen.extend(page_obj)
+            if not page_obj.has_next():
+                break
+            url = reverse('posts:search') + '?' + (
+                page_obj.paginator.next_query)
+        self.assertEqual(len(seen), 27)
+        self.assertEqual(seen, expected)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin)
+        with mock.patch.object(search, 'matching',
+                               wraps=search.matching) as matching:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'собака'})
+        matching.assert_called_once()
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.dog])
+
+    def test_rebuild_command(self):
+        """Команда пересоздаёт потерянный индекс и триггеры."""
+        search.uninstall()
+        call_command('rebuild_search_index', stdout=mock.MagicMock())
+        self.assertEqual(self.results(q='собака'), [self.dog])
+        Post.objects.create(text='Новая собака', author=self.other)
+        self.assertEqual(len(self.results(q='собака')), 2)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' "
+                "AND name LIKE 'posts_post_fts_%'")
+            self.assertEqual(cursor.fetchone()[0], 3)
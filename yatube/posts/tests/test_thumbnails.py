@@ -0,0 +1,106 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from core.testing import QueryBudgetTestCase
+
+from .. import caching, thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(QueryBudgetTestCase):
+    """Миниатюры создаются при сохранении, а не при чтении."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='photographer')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    @staticmethod
+    def image_file(name='photo.png'):
+        buffer = BytesIO()
+        Image.new('RGB', (120, 80), color=(0, 128, 255)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(),
+                                  content_type='image/png')
+
+    def test_lookup_does_not_generate(self):
+        """Без готовой миниатюры страница получает исходную картинку."""
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   image=self.image_file())
+        self.assertEqual(thumbnails.lookup(post.image).name, post.image.name)
+
+    def test_create_pregenerates_all_sizes(self):
+        """Создание поста с картинкой готовит все размеры для srcset."""
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'Пост', 'image': self.image_file()})
+        post = Post.objects.get()
+        for width in thumbnails.SRCSET_WIDTHS:
+            with self.subTest(width=width):
+                thumbnail = thumbnails.lookup(post.image, width)
+                self.assertNotEqual(thumbnail.name, post.image.name)
+                self.assertEqual(thumbnail.width, width)
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, 'srcset=')
+        self.assertContains(
+            response, thumbnails.lookup(post.image).url)
+
+    def test_kvstore_batched(self):
+        """Записи sorl для всех размеров — одно чтение и одна запись."""
+        with CaptureQueriesContext(connection) as context:
+            self.client.post(reverse('posts:post_create'),
+                             {'text': 'Пост', 'image': self.image_file()})
+        kvstore = [query['sql'].split()[0]
+                   for query in context.captured_queries
+                   if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(kvstore, ['SELECT', 'DELETE', 'INSERT'])
+        post = Post.objects.get()
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.generate(post.image)
+
+    def test_lookup_all_one_query(self):
+        """Все размеры картинки ищутся одним запросом, промахи — в кэше."""
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   image=self.image_file())
+        with self.assertNumQueries(1):
+            self.assertEqual(thumbnails.lookup_all(post.image), {})
+        with self.assertNumQueries(0):
+            thumbnails.lookup_all(post.image)
+        thumbnails.generate(post.image)
+        cache.clear()
+        with self.assertNumQueries(1):
+            found = thumbnails.lookup_all(post.image)
+        self.assertEqual(sorted(found), sorted(thumbnails.SRCSET_WIDTHS))
+
+    def test_pending_thumbnails_not_cached(self):
+        """Без миниатюр нет srcset, и карточка не кэшируется."""
+        post = Post.objects.create(text='Пост', author=self.user,
+                                   image=self.image_file())
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, post.image.url)
+        self.assertNotContains(response, 'srcset=')
+        thumbnails.generate(post.image)
+        caching.bump('index')
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, thumbnails.lookup(post.image, 320).url)
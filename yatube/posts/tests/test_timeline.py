@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+
+from core.testing import QueryBudgetTestCase
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(QueryBudgetTestCase):
+    """Материализованная лента подписок."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.star = User.objects.create_user(username='star')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_post_is_pushed_to_followers(self):
+        """Пост автора раскладывается по лентам подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='push', author=self.author)
+        post.refresh_from_db()
+        self.assertTrue(post.fanned_out)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.feed(), [post])
+
+    def test_popular_author_is_pulled(self):
+        """Посты популярного автора подмешиваются при чтении."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.star)
+        pushed = Post.objects.create(text='push', author=self.author)
+        with mock.patch.object(timeline, 'FANOUT_LIMIT', 0):
+            pulled = Post.objects.create(text='pull', author=self.star)
+        self.assertFalse(TimelineEntry.objects.filter(post=pulled).exists())
+        self.assertEqual(self.feed(), [pulled, pushed])
+
+    def test_pulled_post_of_small_author_invalidated(self):
+        """Правка неразложенного поста обычного автора видна в ленте."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='legacy', author=self.author)
+        Post.objects.filter(pk=post.pk).update(fanned_out=False)
+        TimelineEntry.objects.all().delete()
+        self.assertEqual([item.text for item in self.feed()], ['legacy'])
+        author = Client()
+        author.force_login(self.author)
+        author.post(reverse('posts:post_edit', args=[post.pk]),
+                    {'text': 'edited'})
+        self.assertEqual([item.text for item in self.feed()], ['edited'])
+        Post.objects.get(pk=post.pk).delete()
+        self.assertEqual(self.feed(), [])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дополняет ленту, отписка очищает её."""
+        post = Post.objects.create(text='old', author=self.author)
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        self.assertEqual(self.feed(), [post])
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username]))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timeline восстанавливает ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='push', author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timeline', stdout=mock.MagicMock())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
@@ -0,0 +1,231 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import transfer
+from ..models import Comment, Follow, Group, Post, User, UserStats
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TransferTests(TestCase):
+    """Выгрузка и загрузка данных."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [
+            Post.objects.create(text='Первый, "с кавычками"',
+                                author=cls.author, group=cls.group,
+                                image=SimpleUploadedFile(
+                                    'small.gif', SMALL_GIF,
+                                    content_type='image/gif')),
+            Post.objects.create(text='Второй', author=cls.reader),
+        ]
+        Comment.objects.create(post=cls.posts[0], author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def export(self, name='dump.jsonl', **options):
+        path = os.path.join(self.directory, name)
+        call_command('export_data', path, stdout=StringIO(), **options)
+        return path
+
+    def clear(self):
+        for model in (Follow, Comment, Post, Group):
+            model.objects.all().delete()
+
+    def test_export_jsonl(self):
+        """Все модели в порядке зависимостей, авторы — по имени."""
+        with open(self.export(), encoding='utf-8') as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual([record['model'] for record in records],
+                         ['group', 'post', 'post', 'comment', 'follow'])
+        self.assertEqual(records[1]['author'], 'author')
+        self.assertEqual(records[1]['group'], self.group.pk)
+        self.assertEqual(records[-1], {'model': 'follow', 'user': 'reader',
+                                       'author': 'author'})
+
+    def test_round_trip(self):
+        """Загрузка восстанавливает связи, даты и счётчики с новыми id."""
+        path = self.export()
+        old_dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', 'updated'))
+        self.clear()
+        Post.objects.create(text='Занимает id', author=self.author)
+        out = StringIO()
+        call_command('import_data', path, chunk_size=1, stdout=out)
+        self.assertIn('post: прочитано 2, создано 2', out.getvalue())
+        self.assertIn('Загружено: group 1 из 1, post 2 из 2, '
+                      'comment 1 из 1, follow 1 из 1', out.getvalue())
+        first = Post.objects.get(text='Первый, "с кавычками"')
+        self.assertNotIn(first.pk, [post.pk for post in self.posts])
+        self.assertEqual(first.group.slug, 'group')
+        self.assertEqual(first.comments.get().text, 'Комментарий')
+        self.assertEqual(first.comments_count, 1)
+        self.assertEqual(
+            list(Post.objects.exclude(text='Занимает id').order_by('pk')
+                 .values_list('pub_date', 'updated')), old_dates)
+        self.assertTrue(Follow.objects.filter(user=self.reader,
+                                              author=self.author).exists())
+        self.assertEqual(UserStats.objects.get(user=self.author).posts_count,
+                         2)
+
+    def test_csv_and_unknown_users(self):
+        """CSV по модели на файл; неизвестные авторы — ошибка или создаются."""
+        groups = self.export('groups.csv', format='csv', models=['group'])
+        posts = self.export('posts.csv', format='csv', models=['post'])
+        self.clear()
+        User.objects.filter(username='reader').delete()
+        errors = StringIO()
+        with self.assertRaisesMessage(CommandError, 'ссылками: 1'):
+            call_command('import_data', posts, groups, stdout=StringIO(),
+                         stderr=errors)
+        self.assertIn(f'post {self.posts[1].pk}: нет пользователя reader',
+                      errors.getvalue())
+        post = Post.objects.get()
+        self.assertEqual(post.text, 'Первый, "с кавычками"')
+        self.assertEqual(post.group.slug, 'group')
+        call_command('import_data', posts, groups, create_users=True,
+                     stdout=StringIO())
+        created = User.objects.get(username='reader')
+        self.assertFalse(created.has_usable_password())
+        self.assertEqual(UserStats.objects.get(user=created).posts_count, 1)
+        self.assertEqual(Group.objects.count(), 1)
+        unnamed = os.path.join(self.directory, 'dump.csv')
+        os.rename(posts, unnamed)
+        with self.assertRaises(CommandError):
+            call_command('import_data', unnamed, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('export_data', unnamed, format='csv',
+                         stdout=StringIO())
+
+    def test_files_share_ids(self):
+        """Комментарии из отдельного файла находят посты той же загрузки."""
+        paths = [self.export(f'{name}s.csv', format='csv', models=[name])
+                 for name in ('comment', 'post', 'group')]
+        self.clear()
+        out = StringIO()
+        call_command('import_data', *paths, stdout=out)
+        self.assertIn('Загружено: group 1 из 1, post 2 из 2, comment 1 из 1',
+                      out.getvalue())
+        first = Post.objects.get(text='Первый, "с кавычками"')
+        self.assertEqual(first.group.slug, 'group')
+        self.assertEqual(first.comments.get().text, 'Комментарий')
+        self.assertEqual(first.comments_count, 1)
+
+    def test_unresolved_references(self):
+        """Посты без группы и комментарии без поста — ошибки, не пропуск."""
+        posts = self.export('posts.csv', format='csv', models=['post'])
+        comments = self.export('comments.csv', format='csv',
+                               models=['comment'])
+        comment_id = Comment.objects.get().pk
+        self.clear()
+        errors = StringIO()
+        with self.assertRaisesMessage(CommandError, 'ссылками: 2'):
+            call_command('import_data', comments, posts, stdout=StringIO(),
+                         stderr=errors)
+        self.assertEqual(errors.getvalue().splitlines(), [
+            f'post {self.posts[0].pk}: нет группы {self.group.pk}',
+            f'comment {comment_id}: нет поста {self.posts[0].pk}',
+        ])
+        self.assertEqual(list(Post.objects.values_list('text', flat=True)),
+                         ['Второй'])
+
+    def test_images_copied(self):
+        """С --images-from картинки копируются в новое хранилище."""
+        path = self.export()
+        media = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.clear()
+        with override_settings(MEDIA_ROOT=media):
+            call_command('import_data', path, images_from=TEMP_MEDIA_ROOT,
+                         stdout=StringIO())
+            image = Post.objects.exclude(image='').get().image
+            self.assertTrue(os.path.isfile(image.path))
+            self.assertTrue(image.path.startswith(media))
+
+    def test_image_outside_source(self):
+        """Путь картинки за пределы каталога — ошибка строки, не сбой."""
+        path = os.path.join(self.directory, 'dump.jsonl')
+        rows = [
+            {'model': 'post', 'id': 1, 'text': 'Чужая', 'author': 'author',
+             'group': None, 'image': '../secret.gif',
+             'pub_date': '2022-01-01T00:00:00+00:00', 'updated': None},
+            {'model': 'post', 'id': 2, 'text': 'Своя', 'author': 'author',
+             'group': None, 'image': None,
+             'pub_date': '2022-01-01T00:00:00+00:00', 'updated': None},
+        ]
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(row) + '\n' for row in rows)
+        with open(os.path.join(self.directory, 'secret.gif'), 'wb') as file:
+            file.write(SMALL_GIF)
+        source = os.path.join(self.directory, 'media')
+        os.mkdir(source)
+        self.clear()
+        errors = StringIO()
+        with self.assertRaisesMessage(CommandError, 'ссылками: 1'):
+            call_command('import_data', path, images_from=source,
+                         stdout=StringIO(), stderr=errors)
+        self.assertIn('post 1: картинка ../secret.gif', errors.getvalue())
+        self.assertEqual(list(Post.objects.values_list('text', flat=True)),
+                         ['Своя'])
+
+    def test_staff_download(self):
+        """Потоковая выгрузка только для сотрудников."""
+        url = reverse('posts:export')
+        client = Client()
+        self.assertEqual(client.get(url).status_code, 403)
+        client.force_login(self.reader)
+        self.assertEqual(client.get(url).status_code, 403)
+        client.force_login(User.objects.create_user(username='staff',
+                                                    is_staff=True))
+        response = client.get(url, {'format': 'csv', 'model': 'follow'})
+        self.assertTrue(response.streaming)
+        self.assertIn('yatube-follow-', response['Content-Disposition'])
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['user,author', 'reader,author'])
+        response = client.get(url)
+        self.assertEqual(
+            len(b''.join(response.streaming_content).splitlines()), 5)
+        for params in ({'format': 'xml'}, {'format': 'csv'},
+                       {'model': 'user'}):
+            with self.subTest(params=params):
+                self.assertEqual(client.get(url, params).status_code, 400)
+
+    def test_export_lines_are_lazy(self):
+        """Строки читаются по мере выдачи, а не всей таблицей."""
+        lines = transfer.export_lines(['post'], chunk_size=1)
+        with self.assertNumQueries(1):
+            self.assertIn('"model": "post"', next(lines))
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core.testing import QueryBudgetTestCase
+
+from .. import trending
+from ..models import Group, Post, PostActivity, TrendingPost
+
+User = get_user_model()
+
+
+class TrendingTests(QueryBudgetTestCase):
+    """Популярное по корзинам активности."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.quiet = Post.objects.create(text='Тихий', author=cls.user)
+        cls.lively = Post.objects.create(text='Обсуждаемый',
+                                         author=cls.user, group=cls.group)
+        cls.other = Post.objects.create(text='Другой', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def comment(self, post, times=1):
+        for _ in range(times):
+            self.client.post(reverse('posts:add_comment', args=[post.pk]),
+                             {'text': 'Комментарий'})
+
+    def test_comment_fills_bucket(self):
+        """Комментарии копятся в корзине текущего часа."""
+        self.comment(self.lively, 2)
+        activity = PostActivity.objects.get()
+        self.assertEqual((activity.post_id, activity.comments),
+                         (self.lively.pk, 2))
+        self.assertEqual(activity.bucket, trending.bucket())
+
+    def test_rollup(self):
+        """Места по активности в окне, отдельный список группы."""
+        self.comment(self.lively, 3)
+        self.comment(self.other)
+        stale = trending.bucket() - trending.WINDOW_BUCKETS
+        PostActivity.objects.create(post=self.quiet, bucket=stale,
+                                    comments=100)
+        self.assertEqual(trending.rollup(), 2)
+        self.assertFalse(PostActivity.objects.filter(post=self.quiet))
+        site = TrendingPost.objects.filter(group=None).order_by('rank')
+        self.assertEqual([entry.post_id for entry in site],
+                         [self.lively.pk, self.other.pk])
+        self.assertEqual(
+            list(TrendingPost.objects.filter(group=self.group)
+                 .values_list('post_id', 'rank')),
+            [(self.lively.pk, 1)])
+        trending.rollup(top_k=1)
+        self.assertEqual(TrendingPost.objects.filter(group=None).count(), 1)
+
+    def test_recency_decay(self):
+        """Старый пост уступает новому с тем же обсуждением."""
+        self.comment(self.quiet)
+        self.comment(self.other)
+        Post.objects.filter(pk=self.quiet.pk).update(
+            pub_date=timezone.now() - timedelta(days=3))
+        trending.rollup()
+        self.assertEqual(
+            list(TrendingPost.objects.filter(group=None).order_by('rank')
+                 .values_list('post_id', flat=True)),
+            [self.other.pk, self.quiet.pk])
+
+    def test_pages(self):
+        """Страницы читают готовый список и обновляются после пересчёта."""
+        self.comment(self.lively)
+        call_command('trending', stdout=StringIO())
+        anonymous = Client()
+        response = anonymous.get(reverse('posts:trending'))
+        self.assertEqual([post.pk for post in response.context['page_obj']],
+                         [self.lively.pk])
+        with self.assertNumQueries(0):
+            anonymous.get(reverse('posts:trending'))
+        response = anonymous.get(reverse('posts:group_trending',
+                                         args=[self.group.slug]))
+        self.assertContains(response, 'Обсуждаемый')
+        self.comment(self.other, 2)
+        trending.rollup()
+        response = anonymous.get(reverse('posts:trending'))
+        self.assertEqual([post.pk for post in response.context['page_obj']],
+                         [self.other.pk, self.lively.pk])
+        response = anonymous.get(reverse('posts:group_trending',
+                                         args=['missing']))
+        self.assertEqual(response.status_code, 404)
@@ -1,13 +1,15 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.test import Client
+
+from core.testing import QueryBudgetTestCase
 from ..models import Post, Group
 
 User = get_user_model()
 
 
-class PostURLTests(TestCase):
+class PostURLTests(QueryBudgetTestCase):
     """Тесты доступности страниц."""
     @classmethod
     def setUpClass(cls):
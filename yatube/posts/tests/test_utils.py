@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.paginator import Page
+from django.http import QueryDict
+from django.test import TestCase
+
+from ..models import Post
+from ..utils import CursorPaginator, decode_cursor, QuerySetSource
+
+User = get_user_model()
+
+PER_PAGE = 10
+POSTS_TOTAL = 45
+
+
+class CursorPaginatorTests(TestCase):
+    """Постраничный вывод по курсору."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {num}', author=cls.user)
+            for num in range(POSTS_TOTAL)
+        )
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def page(self, query=''):
+        return CursorPaginator(
+            Post.objects.all(), PER_PAGE, QueryDict(query)
+        ).get_page()
+
+    def test_first_page(self):
+        """Первая страница без курсора."""
+        page = self.page()
+        self.assertIsInstance(page, Page)
+        self.assertEqual(page.number, 1)
+        self.assertEqual(list(page), self.ordered[:PER_PAGE])
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_walk_forward_and_back(self):
+        """Курсоры следующей и предыдущей страницы ведут по ленте."""
+        page = self.page()
+        seen = list(page)
+        while page.has_next():
+            page = self.page(page.paginator.next_query)
+            seen.extend(page)
+        self.assertEqual(seen, self.ordered)
+        self.assertEqual(page.number, 5)
+        back = self.page(page.paginator.previous_query)
+        self.assertEqual(back.number, 4)
+        self.assertEqual(list(back), self.ordered[30:40])
+
+    def test_window_links(self):
+        """Окно ссылок ограничено соседними страницами."""
+        page = self.page('page=3')
+        self.assertEqual(list(page), self.ordered[20:30])
+        self.assertEqual(page.paginator.page_range, [1, 2, 3, 4, 5])
+        for number, query in page.paginator.links:
+            with self.subTest(number=number):
+                linked = self.page(query)
+                start = (number - 1) * PER_PAGE
+                self.assertEqual(linked.number, number)
+                self.assertEqual(
+                    list(linked), self.ordered[start:start + PER_PAGE]
+                )
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        self.assertIsNone(
+            decode_cursor(QuerySetSource(Post.objects.all()), 'garbage')
+        )
+        page = self.page('cursor=garbage')
+        self.assertEqual(page.number, 1)
+
+    def test_no_count_query(self):
+        """Страница по курсору не выполняет COUNT(*)."""
+        query = self.page().paginator.next_query
+        with self.assertNumQueries(3):
+            page = self.page(query)
+        self.assertEqual(page.number, 2)
@@ -2,9 +2,11 @@ from django import forms
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client
 from django.urls import reverse
 
+from core.testing import QueryBudgetTestCase
+
 from ..models import Group, Follow, Post
 
 User = get_user_model()
@@ -15,7 +17,7 @@ ZERO = 0
 ONE = 1
 
 
-class PostPagesTests(TestCase):
+class PostPagesTests(QueryBudgetTestCase):
     """Проверка шаблонов на правильное содержание."""
 
     @classmethod
@@ -68,6 +70,7 @@ class PostPagesTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(PostPagesTests.user)
@@ -176,15 +179,38 @@ class PostPagesTests(TestCase):
     def test_cache_index(self):
         """Тест кэширования страницы index.html"""
         first_state = self.authorized_client.get(PostPagesTests.main)
-        post_1 = Post.objects.get(pk=1)
-        post_1.text = 'Измененный текст'
-        post_1.save()
+        Post.objects.filter(pk=1).update(text='Изменённый в обход ORM')
         second_state = self.authorized_client.get(PostPagesTests.main)
         self.assertEqual(first_state.content, second_state.content)
         cache.clear()
         third_state = self.authorized_client.get(PostPagesTests.main)
         self.assertNotEqual(first_state.content, third_state.content)
 
+    def test_cache_index_invalidated_on_save(self):
+        """Сохранение поста сразу сбрасывает кэш ленты."""
+        first_state = self.authorized_client.get(PostPagesTests.main)
+        post_1 = Post.objects.get(pk=1)
+        post_1.text = 'Измененный текст'
+        post_1.save()
+        second_state = self.authorized_client.get(PostPagesTests.main)
+        self.assertNotEqual(first_state.content, second_state.content)
+        self.assertContains(second_state, 'Измененный текст')
+
+    def test_feed_cache_keyed_by_page(self):
+        """Разные страницы ленты не делят одну запись кэша."""
+        Post.objects.bulk_create(
+            Post(text=f'Пост {num}', author=PostPagesTests.user)
+            for num in range(PAGE_NUM_TOTAL)
+        )
+        cache.clear()
+        first = self.client.get(PostPagesTests.index)
+        second = self.client.get(PostPagesTests.index, {'page': 2})
+        self.assertNotEqual(
+            list(first.context['page_obj']),
+            list(second.context['page_obj']),
+        )
+        self.assertNotEqual(first.content, second.content)
+
     def test_add_comment(self):
         """Проверка работы комментариев."""
         comment_url = reverse(
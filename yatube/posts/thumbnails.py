@@ -0,0 +1,166 @@
+"""Миниатюры картинок постов, создаваемые заранее.
+
+Страницы только ищут готовые миниатюры в хранилище sorl; Pillow
+запускается после сохранения поста или командой generate_thumbnails.
+Записи хранилища (cached_db по умолчанию) generate и lookup_all читают
+и пишут пачкой, а не по запросу на каждый размер, как sorl.
+"""
+import time
+
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.helpers import deserialize, serialize
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from core import metrics
+from core.sqlite import retry_on_lock
+
+FEED_WIDTH, FEED_HEIGHT = 960, 339
+SRCSET_WIDTHS = (320, 640, FEED_WIDTH)
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def geometry(width):
+    return f'{width}x{round(width * FEED_HEIGHT / FEED_WIDTH)}'
+
+
+def variants():
+    """Геометрии всех заранее создаваемых миниатюр."""
+    return [geometry(width) for width in SRCSET_WIDTHS]
+
+
+def _thumbnail(source, size):
+    """(размер, опции, файл) миниатюры source, созданной или нет."""
+    options = default.backend._options(source, dict(OPTIONS))
+    name = default.backend._get_thumbnail_filename(source, size, options)
+    return size, options, ImageFile(name, default.storage)
+
+
+def _read(keys):
+    """Значения хранилища sorl по ключам: кэш, затем один запрос.
+
+    Прочитанное из базы, как и у sorl, кладётся в кэш вместе с
+    отметками об отсутствующих ключах.
+    """
+    values = default.kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStore.objects.filter(key__in=missing)
+                     .values_list('key', 'value'))
+        default.kvstore.cache.set_many(
+            {key: found.get(key, EMPTY_VALUE) for key in missing},
+            settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    return {key: value for key, value in values.items()
+            if value is not EMPTY_VALUE}
+
+
+@retry_on_lock
+def _write(values):
+    """Записывает значения хранилища sorl двумя запросами.
+
+    Повторяется только запись: файлы миниатюр к этому времени готовы.
+    """
+    with transaction.atomic():
+        KVStore.objects.filter(key__in=values).delete()
+        KVStore.objects.bulk_create(
+            KVStore(key=key, value=value) for key, value in values.items())
+    default.kvstore.cache.set_many(values, settings.THUMBNAIL_CACHE_TIMEOUT)
+
+
+def _create(source, planned):
+    """Создаёт файлы миниатюр, открыв исходную картинку один раз."""
+    engine, backend = default.engine, default.backend
+    source_image = engine.get_image(source)
+    try:
+        source.set_size(engine.get_image_size(source_image))
+        info = engine.get_image_info(source_image)
+        for size, options, thumbnail in planned:
+            if thumbnail.exists():
+                thumbnail.set_size()
+                continue
+            options['image_info'] = info
+            backend._create_thumbnail(source_image, size, options, thumbnail)
+            backend._create_alternative_resolutions(
+                source_image, size, options, thumbnail.name)
+    finally:
+        engine.cleanup(source_image)
+
+
+def generate(image):
+    """Создаёт все миниатюры картинки; вызывается вне чтения страниц."""
+    started = time.perf_counter()
+    source = ImageFile(image)
+    planned = [_thumbnail(source, size) for size in variants()]
+    source_key = add_prefix(source.key)
+    list_key = add_prefix(source.key, 'thumbnails')
+    stored = _read([source_key, list_key] + [
+        add_prefix(thumbnail.key) for _, _, thumbnail in planned])
+    planned = [item for item in planned
+               if add_prefix(item[2].key) not in stored]
+    if planned:
+        _create(source, planned)
+        thumbnail_keys = set(deserialize(stored.get(list_key, '[]')))
+        values = {add_prefix(thumbnail.key): thumbnail.serialize()
+                  for _, _, thumbnail in planned}
+        thumbnail_keys.update(thumbnail.key for _, _, thumbnail in planned)
+        values[list_key] = serialize(sorted(thumbnail_keys))
+        if source_key not in stored:
+            values[source_key] = source.serialize()
+        _write(values)
+    metrics.observe('yatube_thumbnail_generation_seconds', {},
+                    time.perf_counter() - started)
+
+
+def lookup(image, width=FEED_WIDTH):
+    return default.backend.get_thumbnail(image, geometry(width), **OPTIONS)
+
+
+def lookup_all(image):
+    """Готовые миниатюры картинки: {ширина из SRCSET_WIDTHS: файл}.
+
+    Ключи всех размеров читаются одним get_many кэша и не больше чем
+    одним запросом. Ширин, для которых миниатюры нет, в ответе нет.
+    """
+    source = ImageFile(image)
+    keys = {width: add_prefix(_thumbnail(source, geometry(width))[2].key)
+            for width in SRCSET_WIDTHS}
+    stored = _read(list(keys.values()))
+    return {width: deserialize_image_file(stored[key])
+            for width, key in keys.items() if key in stored}
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    """Backend sorl, который при чтении страниц не создаёт миниатюры.
+
+    Если миниатюры ещё нет, возвращается исходная картинка, а создать
+    её можно передав generate=True.
+    """
+
+    def _options(self, source, options):
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if options.pop('generate', False):
+            return super().get_thumbnail(file_, geometry_string, **options)
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self._options(source, options))
+        cached = default.kvstore.get(ImageFile(name, default.storage))
+        return cached or source
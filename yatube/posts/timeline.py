@@ -0,0 +1,131 @@
+"""Материализованная лента подписок.
+
+Посты авторов с небольшим числом подписчиков при публикации
+раскладываются по лентам читателей (push) и помечаются `fanned_out`.
+Посты популярных авторов остаются неразложенными и подмешиваются
+при чтении (pull), так что каждый пост попадает в ленту ровно одним путём.
+"""
+from django.db import transaction
+
+from . import graph
+from .models import Follow, Post, TimelineEntry
+from .utils import MergedSource, QuerySetSource
+
+FANOUT_LIMIT = 1000
+BACKFILL_LIMIT = 1000
+BATCH_SIZE = 500
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Найденные подписчики остаются в post.follower_ids для сброса кэша.
+    """
+    post.follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)[:FANOUT_LIMIT + 1]
+    )
+    if len(post.follower_ids) > FANOUT_LIMIT:
+        return False
+    with transaction.atomic():
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(user_id=user_id, post_id=post.pk,
+                              author_id=post.author_id,
+                              pub_date=post.pub_date)
+                for user_id in post.follower_ids
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        Post.objects.filter(pk=post.pk).update(fanned_out=True)
+    post.fanned_out = True
+    return True
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя уже разложенные посты автора."""
+    posts = (
+        Post.objects.filter(author_id=author_id, fanned_out=True)
+        .order_by('-pub_date', '-id')
+        .values_list('id', 'pub_date')[:BACKFILL_LIMIT]
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          author_id=author_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class TimelineSource(QuerySetSource):
+    """Лента читателя: один диапазон по индексу (user, pub_date, post)."""
+
+    def __init__(self, user):
+        super().__init__(
+            TimelineEntry.objects.filter(user=user)
+            .select_related('post__author', 'post__group'),
+            fields=('pub_date', 'post_id'),
+        )
+
+    def key(self, post):
+        return post.pub_date, post.pk
+
+    def rows(self, after, limit):
+        return [entry.post for entry in super().rows(after, limit)]
+
+    def rows_at(self, offset, limit):
+        return [entry.post for entry in super().rows_at(offset, limit)]
+
+
+def follow_namespaces(user):
+    """Пространства ленты подписок: своя версия и авторы из pull.
+
+    Авторы берутся по неразложенным постам, а не по числу подписчиков:
+    правку и удаление таких постов видно только по author:<id>, даже если
+    автор давно не популярен или пост остался от миграции 0005.
+    """
+    pulled = graph.followed(
+        Post.objects.filter(fanned_out=False), user.pk,
+    ).order_by().values_list('author_id', flat=True).distinct()
+    return (f'follow:{user.pk}',
+            *(f'author:{author_id}' for author_id in pulled))
+
+
+def follow_feed(user):
+    """Лента подписок: разложенные посты и посты популярных авторов."""
+    pulled = graph.followed(
+        Post.objects.filter(fanned_out=False), user.pk,
+    ).select_related('author', 'group')
+    return MergedSource(TimelineSource(user), QuerySetSource(pulled))
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты с нуля; возвращает число записей."""
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+    with transaction.atomic():
+        entries.delete()
+        if user_ids is None:
+            Post.objects.update(fanned_out=False)
+            for author_id in follows.values_list(
+                    'author_id', flat=True).distinct().iterator():
+                if Follow.objects.filter(
+                        author_id=author_id).count() <= FANOUT_LIMIT:
+                    Post.objects.filter(author_id=author_id).update(
+                        fanned_out=True)
+        for user_id, author_id in follows.values_list(
+                'user_id', 'author_id').iterator():
+            backfill(user_id, author_id)
+        return entries.count()
@@ -0,0 +1,355 @@
+"""Выгрузка и загрузка групп, постов, комментариев и подписок.
+
+Выгрузка читает таблицы через iterator(chunk_size) и отдаёт строки по
+одной, поэтому память не зависит от размера базы. JSONL содержит все
+модели в порядке зависимостей, по одному объекту в строке с ключом
+`model`; CSV — одна модель на файл. Пользователи не выгружаются,
+ссылки на них — имена.
+
+Загрузка пишет пачками через bulk_create, а старые id групп и постов
+заменяет новыми по ходу чтения; соответствие общее для всех файлов одной
+загрузки. Строки со ссылками, которые не удалось разрешить, не пишутся
+и попадают в ошибки. Сигналы при этом не срабатывают: подписки проходят
+через follows.import_follows, счётчики пересчитываются в конце, версии
+затронутых лент сдвигаются после каждой пачки. Как и seeding,
+рассчитана на базу без параллельной записи: новые id определяются по
+строкам с id больше прежнего максимума.
+"""
+import csv
+import json
+import os
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Case, Max, Value, When
+from django.utils.dateparse import parse_datetime
+
+from . import caching, counters, follows, thumbnails
+from .models import Comment, Follow, Group, Post, User
+
+CHUNK_SIZE = 1000
+# Строк в одном UPDATE с датами: по три параметра на строку и поле.
+DATES_BATCH = 100
+MAX_ERRORS = 100
+FORMATS = ('jsonl', 'csv')
+# Модель: (класс, столбцы (имя, поле)). Порядок — порядок зависимостей.
+MODELS = {
+    'group': (Group, (('id', 'id'), ('title', 'title'), ('slug', 'slug'),
+                      ('description', 'description'))),
+    'post': (Post, (('id', 'id'), ('text', 'text'),
+                    ('pub_date', 'pub_date'), ('updated', 'updated'),
+                    ('author', 'author__username'), ('group', 'group_id'),
+                    ('image', 'image'))),
+    'comment': (Comment, (('id', 'id'), ('post', 'post_id'),
+                          ('author', 'author__username'), ('text', 'text'),
+                          ('created', 'created'))),
+    'follow': (Follow, (('user', 'user__username'),
+                        ('author', 'author__username'))),
+}
+
+
+def _check(names, fmt):
+    unknown = set(names) - set(MODELS)
+    if unknown:
+        raise ValueError(f'Неизвестные модели: {", ".join(sorted(unknown))}.')
+    if fmt not in FORMATS:
+        raise ValueError(f'Формат должен быть одним из: {", ".join(FORMATS)}.')
+    if fmt == 'csv' and len(names) != 1:
+        raise ValueError('CSV содержит ровно одну модель.')
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def rows(name, chunk_size=CHUNK_SIZE):
+    """Строки модели словарями в порядке id."""
+    model, columns = MODELS[name]
+    names = [column for column, _ in columns]
+    queryset = model.objects.order_by('pk').values_list(
+        *(field for _, field in columns))
+    for values in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(names, map(_value, values)))
+
+
+class _Line:
+    """Файл для csv.writer, который возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(name, chunk_size):
+    writer = csv.writer(_Line())
+    _, columns = MODELS[name]
+    yield writer.writerow([column for column, _ in columns])
+    for row in rows(name, chunk_size):
+        yield writer.writerow(
+            ['' if value is None else value for value in row.values()])
+
+
+def _jsonl_lines(names, chunk_size):
+    for name in names:
+        for row in rows(name, chunk_size):
+            yield json.dumps({'model': name, **row},
+                             ensure_ascii=False) + '\n'
+
+
+def export_lines(names=tuple(MODELS), fmt='jsonl', chunk_size=CHUNK_SIZE):
+    """Строки выгрузки с переводом строки на конце.
+
+    Параметры проверяются сразу (ValueError), строки читаются лениво.
+    """
+    _check(list(names), fmt)
+    names = [name for name in MODELS if name in names]
+    if fmt == 'csv':
+        return _csv_lines(names[0], chunk_size)
+    return _jsonl_lines(names, chunk_size)
+
+
+def read_records(lines, fmt='jsonl', model=None):
+    """Пары (модель, строка) из строк файла выгрузки."""
+    if fmt == 'csv':
+        if model is None:
+            raise ValueError('Для CSV нужно указать модель.')
+        _check([model], fmt)
+        for row in csv.DictReader(lines):
+            yield model, {key: value or None for key, value in row.items()}
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            name = row.pop('model')
+        except (ValueError, KeyError, AttributeError):
+            raise ValueError(f'Строка {number}: ожидается объект с model.')
+        _check([name], fmt)
+        yield name, row
+
+
+def _max_pk(model):
+    return model.objects.aggregate(top=Max('pk'))['top'] or 0
+
+
+def _restore_dates(model, rows):
+    """Возвращает даты из выгрузки, которые bulk_create заменил на now.
+
+    rows — пары (новый id, {поле: дата}). auto_now и auto_now_add
+    срабатывают только при вставке, поэтому даты ставятся следующим
+    UPDATE, не трогая определения полей.
+    """
+    for start in range(0, len(rows), DATES_BATCH):
+        batch = rows[start:start + DATES_BATCH]
+        fields = {name: model._meta.get_field(name) for name in batch[0][1]}
+        model.objects.filter(pk__in=[pk for pk, _ in batch]).update(**{
+            name: Case(*(When(pk=pk, then=Value(dates[name],
+                                                output_field=field))
+                         for pk, dates in batch), output_field=field)
+            for name, field in fields.items()
+        })
+
+
+def _chunks(records, chunk_size):
+    """Подряд идущие строки одной модели пачками до chunk_size."""
+    name, chunk = None, []
+    for record_name, row in records:
+        if chunk and (record_name != name or len(chunk) == chunk_size):
+            yield name, chunk
+            chunk = []
+        name = record_name
+        chunk.append(row)
+    if chunk:
+        yield name, chunk
+
+
+class Importer:
+    """Загрузка выгрузки; progress(name, stats) вызывается после пачки.
+
+    images_from — каталог MEDIA_ROOT источника: картинки постов
+    копируются из него в хранилище, иначе имена файлов сохраняются как
+    есть. create_users — создавать неизвестных авторов без пароля,
+    иначе их строки становятся ошибками. Первые MAX_ERRORS сообщений об
+    ошибках остаются в errors, их число по моделям — в stats.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, images_from=None,
+                 create_users=False, progress=None):
+        self.chunk_size = chunk_size
+        self.images_from = images_from
+        self.create_users = create_users
+        self.progress = progress or (lambda name, stats: None)
+        self.ids = {'group': {}, 'post': {}}
+        self.stats = {}
+        self.errors = []
+
+    def load(self, *sources):
+        """Загружает источники пар (модель, строка) по очереди.
+
+        Источники делят соответствие id, поэтому комментарии из
+        отдельного файла находят посты, загруженные перед ними.
+        Возвращает статистику.
+        """
+        for records in sources:
+            for name, chunk in _chunks(records, self.chunk_size):
+                stats = self.stats.setdefault(
+                    name, {'read': 0, 'created': 0, 'errors': 0})
+                stats['read'] += len(chunk)
+                stats['created'] += getattr(self, f'_{name}s')(chunk)
+                self.progress(name, stats)
+        counters.recount(chunk_size=self.chunk_size)
+        return self.stats
+
+    def _error(self, name, row, message):
+        self.stats[name]['errors'] += 1
+        if len(self.errors) < MAX_ERRORS:
+            ident = row.get('id') or f'{row.get("user")}→{row.get("author")}'
+            self.errors.append(f'{name} {ident}: {message}')
+
+    def _users(self, usernames):
+        """id пользователей по именам одним запросом."""
+        usernames = set(filter(None, usernames))
+        found = dict(User.objects.filter(username__in=usernames)
+                     .values_list('username', 'pk'))
+        missing = usernames - set(found)
+        if missing and self.create_users:
+            password = make_password(None)
+            User.objects.bulk_create(
+                (User(username=username, password=password)
+                 for username in missing),
+                ignore_conflicts=True,
+            )
+            found.update(User.objects.filter(username__in=missing)
+                         .values_list('username', 'pk'))
+        return found
+
+    def _user(self, name, row, users, column='author'):
+        """id пользователя строки или None с ошибкой."""
+        user_id = users.get(row[column])
+        if user_id is None:
+            self._error(name, row, f'нет пользователя {row[column]}')
+        return user_id
+
+    def _insert(self, model, objects, dates=None):
+        """Пишет объекты и возвращает их новые id по порядку.
+
+        dates — даты из выгрузки для каждого объекта (см. _restore_dates).
+        """
+        if not objects:
+            return []
+        with transaction.atomic():
+            before = _max_pk(model)
+            model.objects.bulk_create(objects)
+            new_ids = list(model.objects.filter(pk__gt=before)
+                           .order_by('pk').values_list('pk', flat=True))
+            if dates:
+                _restore_dates(model, list(zip(new_ids, dates)))
+        return new_ids
+
+    def _remember(self, name, old_ids, new_ids):
+        self.ids[name].update(zip(old_ids, new_ids))
+        return len(new_ids)
+
+    def _groups(self, chunk):
+        existing = dict(Group.objects.filter(
+            slug__in=[row['slug'] for row in chunk]).values_list('slug', 'pk'))
+        old_ids, groups = [], []
+        for row in chunk:
+            if row['slug'] in existing:
+                self.ids['group'][int(row['id'])] = existing[row['slug']]
+            else:
+                existing[row['slug']] = None
+                old_ids.append(int(row['id']))
+                groups.append(Group(
+                    title=row['title'], slug=row['slug'],
+                    description=row['description'] or ''))
+        return self._remember('group', old_ids,
+                              self._insert(Group, groups))
+
+    def _image(self, name):
+        """Имя картинки в хранилище, скопированной из images_from.
+
+        Путь за пределы каталога картинок — SuspiciousFileOperation,
+        ошибка чтения или записи — OSError.
+        """
+        if not name:
+            return ''
+        if os.path.isabs(name) or os.path.normpath(name).startswith('..'):
+            raise SuspiciousFileOperation(f'путь {name} вне каталога')
+        if self.images_from is None:
+            return name
+        path = os.path.join(self.images_from, name)
+        if not os.path.isfile(path):
+            return ''
+        with open(path, 'rb') as file:
+            name = default_storage.save(name, File(file))
+        thumbnails.generate(name)
+        return name
+
+    def _posts(self, chunk):
+        users = self._users(row['author'] for row in chunk)
+        old_ids, posts, dates = [], [], []
+        for row in chunk:
+            author_id = self._user('post', row, users)
+            group_id = None
+            if row['group']:
+                group_id = self.ids['group'].get(int(row['group']))
+                if group_id is None:
+                    self._error('post', row, f'нет группы {row["group"]}')
+                    continue
+            if author_id is None:
+                continue
+            try:
+                image = self._image(row['image'])
+            except (SuspiciousFileOperation, OSError) as error:
+                self._error('post', row, f'картинка {row["image"]}: {error}')
+                continue
+            pub_date = parse_datetime(row['pub_date'])
+            old_ids.append(int(row['id']))
+            posts.append(Post(
+                text=row['text'] or '', author_id=author_id,
+                group_id=group_id, image=image))
+            dates.append({'pub_date': pub_date, 'updated': parse_datetime(
+                row['updated'] or row['pub_date'])})
+        created = self._remember('post', old_ids,
+                                 self._insert(Post, posts, dates))
+        if created:
+            caching.bump('index', *{
+                f'author:{post.author_id}' for post in posts}, *{
+                f'group:{post.group_id}' for post in posts
+                if post.group_id})
+        return created
+
+    def _comments(self, chunk):
+        users = self._users(row['author'] for row in chunk)
+        comments, dates = [], []
+        for row in chunk:
+            author_id = self._user('comment', row, users)
+            post_id = self.ids['post'].get(int(row['post']))
+            if post_id is None:
+                self._error('comment', row, f'нет поста {row["post"]}')
+            if author_id is None or post_id is None:
+                continue
+            comments.append(Comment(post_id=post_id, author_id=author_id,
+                                    text=row['text'] or ''))
+            dates.append({'created': parse_datetime(row['created'])})
+        self._insert(Comment, comments, dates)
+        if comments:
+            caching.bump(*{f'comments:{comment.post_id}'
+                           for comment in comments})
+        return len(comments)
+
+    def _follows(self, chunk):
+        users = self._users(
+            username for row in chunk
+            for username in (row['user'], row['author']))
+        pairs = []
+        for row in chunk:
+            user_id = self._user('follow', row, users, 'user')
+            author_id = self._user('follow', row, users)
+            if user_id is not None and author_id is not None:
+                pairs.append((user_id, author_id))
+        return follows.import_follows(pairs, self.chunk_size)['created']
@@ -0,0 +1,114 @@
+"""Популярное: посты с живым обсуждением.
+
+Каждый комментарий прибавляет единицу к корзине активности поста за
+свой час (PostActivity). Команда trending периодически складывает
+корзины за последние WINDOW_BUCKETS часов, делит сумму на
+(возраст поста в часах + 2) ** GRAVITY и записывает TOP_K лучших постов
+сайта и каждой группы в TrendingPost. Страница читает готовый список по
+индексу (group, rank) и кэшируется до следующего пересчёта.
+"""
+import heapq
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import caching
+from .models import PostActivity, TrendingPost
+from .utils import QuerySetSource
+
+BUCKET_SECONDS = 60 * 60
+WINDOW_BUCKETS = 48
+TOP_K = 100
+GRAVITY = 1.5
+NAMESPACE = 'trending'
+
+
+def bucket(moment=None):
+    moment = moment or timezone.now()
+    return int(moment.timestamp()) // BUCKET_SECONDS
+
+
+def comment_added(comment):
+    """Учитывает комментарий; вызывается в транзакции его записи."""
+    number = bucket(comment.created)
+    PostActivity.objects.bulk_create(
+        [PostActivity(post_id=comment.post_id, bucket=number)],
+        ignore_conflicts=True,
+    )
+    PostActivity.objects.filter(
+        post_id=comment.post_id, bucket=number,
+    ).update(comments=F('comments') + 1)
+
+
+def scores(now=None):
+    """Оценки постов с комментариями в окне: (оценка, id, id группы)."""
+    now = now or timezone.now()
+    active = (
+        PostActivity.objects
+        .filter(bucket__gt=bucket(now) - WINDOW_BUCKETS)
+        .values('post_id').annotate(total=Sum('comments')).order_by()
+        .values_list('post_id', 'post__pub_date', 'post__group_id', 'total')
+    )
+    result = []
+    for post_id, pub_date, group_id, total in active.iterator():
+        age = max((now - pub_date).total_seconds(), 0) / 3600
+        result.append((total / (age + 2) ** GRAVITY, post_id, group_id))
+    return result
+
+
+def rollup(now=None, top_k=TOP_K):
+    """Пересобирает TrendingPost; возвращает число постов в окне.
+
+    Корзины старше окна удаляются.
+    """
+    now = now or timezone.now()
+    PostActivity.objects.filter(
+        bucket__lte=bucket(now) - WINDOW_BUCKETS).delete()
+    scored = scores(now)
+    scopes = defaultdict(list)
+    for value, post_id, group_id in scored:
+        scopes[None].append((value, post_id))
+        if group_id:
+            scopes[group_id].append((value, post_id))
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(
+            (
+                TrendingPost(group_id=group_id, post_id=post_id,
+                             rank=rank, score=value)
+                for group_id, items in scopes.items()
+                for rank, (value, post_id) in enumerate(
+                    heapq.nlargest(top_k, items), 1)
+            ),
+            batch_size=500,
+        )
+    caching.bump(NAMESPACE)
+    return len(scored)
+
+
+class TrendingSource(QuerySetSource):
+    """Популярное сайта или группы в порядке мест."""
+
+    def __init__(self, group=None):
+        super().__init__(
+            TrendingPost.objects.filter(group=group)
+            .select_related('post__author', 'post__group'),
+            fields=('rank', 'post_id'),
+            descending=False,
+        )
+
+    def key(self, post):
+        return post.trending_rank, post.pk
+
+    def _posts(self, entries):
+        for entry in entries:
+            entry.post.trending_rank = entry.rank
+        return [entry.post for entry in entries]
+
+    def rows(self, after, limit):
+        return self._posts(super().rows(after, limit))
+
+    def rows_at(self, offset, limit):
+        return self._posts(super().rows_at(offset, limit))
@@ -5,10 +5,25 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='main_page'),
+    path('rss/', views.site_rss, name='site_rss'),
+    path('atom/', views.site_atom, name='site_atom'),
+    path('popular/', views.trending_posts, name='trending'),
     path('group/<slug:slug>/', views.group_posts, name="group_list"),
+    path('group/<slug:slug>/rss/', views.group_rss, name='group_rss'),
+    path('group/<slug:slug>/atom/', views.group_atom, name='group_atom'),
+    path('group/<slug:slug>/popular/', views.group_trending,
+         name='group_trending'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/rss/', views.author_rss,
+         name='author_rss'),
+    path('profile/<str:username>/atom/', views.author_atom,
+         name='author_atom'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path('search/', views.search, name='search'),
+    path('export/', views.export_data, name='export'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
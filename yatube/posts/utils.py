@@ -1,8 +1,324 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import datetime
+import heapq
+import json
 
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.db.models.query import QuerySet
 
-def paginator(request, post, quantity):
-    paginator_var = Paginator(post, quantity)
-    page_number = request.GET.get('page')
-    page_obj = paginator_var.get_page(page_number)
-    return page_obj
+PAGE_WINDOW = 2
+
+
+class QuerySetSource:
+    """Строки queryset, упорядоченные по паре ключевых полей.
+
+    Страницы выбираются поиском по ключу (seek) вместо OFFSET, поэтому
+    стоимость страницы не зависит от её номера.
+    """
+
+    def __init__(self, queryset, fields=('pub_date', 'id'), descending=True):
+        self.queryset = queryset
+        self.fields = fields
+        self.descending = descending
+
+    def key(self, obj):
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def parse_key(self, values):
+        opts = self.queryset.model._meta
+        return tuple(
+            opts.get_field(field).to_python(value)
+            for field, value in zip(self.fields, values)
+        )
+
+    def _ordered(self, queryset, reverse=False):
+        sign = '-' if self.descending != reverse else ''
+        return queryset.order_by(*(sign + field for field in self.fields))
+
+    def _seek(self, key, forward=True):
+        """Условие на строки после key (или до него) в порядке вывода."""
+        (first, second), (first_value, second_value) = self.fields, key
+        lookup = 'lt' if forward == self.descending else 'gt'
+        return Q(**{f'{first}__{lookup}e': first_value}) & (
+            Q(**{f'{first}__{lookup}': first_value})
+            | Q(**{f'{second}__{lookup}': second_value})
+        )
+
+    def rows(self, after, limit):
+        queryset = self.queryset
+        if after is not None:
+            queryset = queryset.filter(self._seek(after))
+        return list(self._ordered(queryset)[:limit])
+
+    def rows_at(self, offset, limit):
+        return list(self._ordered(self.queryset)[offset:offset + limit])
+
+    def keys_after(self, key, limit):
+        queryset = self.queryset.filter(self._seek(key))
+        return list(
+            self._ordered(queryset).values_list(*self.fields)[:limit]
+        )
+
+    def keys_before(self, key, limit):
+        """Ключи предыдущих строк, ближайшие к key — первыми."""
+        queryset = self.queryset.filter(self._seek(key, forward=False))
+        return list(
+            self._ordered(queryset, reverse=True)
+            .values_list(*self.fields)[:limit]
+        )
+
+
+class ValuesSource(QuerySetSource):
+    """Строки queryset словарями из values_list, без создания моделей.
+
+    columns — пары (имя в словаре, путь поля); связанные поля
+    подтягиваются соединением в том же запросе. key_names — имена
+    столбцов, из которых собирается ключ строки.
+    """
+
+    def __init__(self, queryset, columns, fields=('pub_date', 'id'),
+                 key_names=('pub_date', 'id'), descending=True):
+        super().__init__(queryset, fields, descending)
+        self.names = tuple(name for name, _ in columns)
+        self.lookups = tuple(lookup for _, lookup in columns)
+        self.key_names = key_names
+
+    def key(self, row):
+        return tuple(row[name] for name in self.key_names)
+
+    def _dicts(self, queryset):
+        return [dict(zip(self.names, values))
+                for values in queryset.values_list(*self.lookups)]
+
+    def rows(self, after, limit):
+        queryset = self.queryset
+        if after is not None:
+            queryset = queryset.filter(self._seek(after))
+        return self._dicts(self._ordered(queryset)[:limit])
+
+    def rows_at(self, offset, limit):
+        return self._dicts(
+            self._ordered(self.queryset)[offset:offset + limit])
+
+    def iterate(self, after, limit, chunk_size=500):
+        """Как rows, но строки читаются из курсора порциями."""
+        queryset = self.queryset
+        if after is not None:
+            queryset = queryset.filter(self._seek(after))
+        rows = self._ordered(queryset)[:limit].values_list(*self.lookups)
+        for values in rows.iterator(chunk_size=chunk_size):
+            yield dict(zip(self.names, values))
+
+
+class MergedSource:
+    """Слияние нескольких источников с одинаковыми ключами."""
+
+    def __init__(self, *sources):
+        self.sources = sources
+        self.fields = sources[0].fields
+        self.descending = sources[0].descending
+
+    def key(self, obj):
+        return self.sources[0].key(obj)
+
+    def parse_key(self, values):
+        return self.sources[0].parse_key(values)
+
+    @staticmethod
+    def _unique(items, limit, key=None):
+        result, seen = [], set()
+        for item in items:
+            item_key = item if key is None else key(item)
+            if item_key not in seen:
+                seen.add(item_key)
+                result.append(item)
+            if len(result) == limit:
+                break
+        return result
+
+    def _merge_rows(self, parts, limit):
+        merged = heapq.merge(
+            *(
+                ((source.key(row), row) for row in rows)
+                for source, rows in zip(self.sources, parts)
+            ),
+            key=lambda pair: pair[0],
+            reverse=self.descending,
+        )
+        return [row for _, row in self._unique(
+            merged, limit, key=lambda pair: pair[0])]
+
+    def rows(self, after, limit):
+        return self._merge_rows(
+            [source.rows(after, limit) for source in self.sources], limit)
+
+    def rows_at(self, offset, limit):
+        return self._merge_rows(
+            [source.rows_at(0, offset + limit) for source in self.sources],
+            offset + limit,
+        )[offset:]
+
+    def keys_after(self, key, limit):
+        return self._unique(heapq.merge(
+            *(source.keys_after(key, limit) for source in self.sources),
+            reverse=self.descending,
+        ), limit)
+
+    def keys_before(self, key, limit):
+        return self._unique(heapq.merge(
+            *(source.keys_before(key, limit) for source in self.sources),
+            reverse=not self.descending,
+        ), limit)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(number, key):
+    raw = json.dumps([number, *map(_encode_value, key)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(source, token):
+    """Возвращает (номер страницы, ключ) или None для битого курсора."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        number, *values = json.loads(raw.decode())
+        if len(values) != len(source.fields):
+            return None
+        return int(number), source.parse_key(values)
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по курсору без COUNT(*) и OFFSET.
+
+    Соседние страницы в окне PAGE_WINDOW получают готовые курсоры,
+    поэтому переход на любую из них стоит одного поиска по индексу.
+    Параметр `page` поддерживается для старых ссылок.
+    """
+
+    def __init__(self, source, per_page, query, window=PAGE_WINDOW):
+        if isinstance(source, QuerySet):
+            source = QuerySetSource(source)
+        self.source = source
+        self.query = query
+        self.window = window
+        per_page = int(per_page)
+        number, rows = self._fetch(per_page)
+        self.number = number
+        self.has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        super().__init__(rows, per_page)
+        self.links = self._previous_links(rows) + self._next_links(rows)
+
+    def _fetch(self, per_page):
+        cursor = self.query.get('cursor')
+        if cursor:
+            decoded = decode_cursor(self.source, cursor)
+            if decoded is not None and decoded[0] > 1:
+                number, key = decoded
+                rows = self.source.rows(key, per_page + 1)
+                if rows:
+                    return number, rows
+        number = self.query.get('page')
+        if number and str(number).isdigit() and int(number) > 1:
+            number = int(number)
+            rows = self.source.rows_at((number - 1) * per_page, per_page + 1)
+            if rows:
+                return number, rows
+        return 1, self.source.rows(None, per_page + 1)
+
+    def _query(self, token):
+        query = self.query.copy()
+        query.pop('page', None)
+        query.pop('cursor', None)
+        if token is not None:
+            query['cursor'] = token
+        return query.urlencode()
+
+    def _next_links(self, rows):
+        if not self.has_next:
+            return []
+        last = self.source.key(rows[-1])
+        links = [(self.number + 1, self._query(
+            encode_cursor(self.number + 1, last)))]
+        if self.window < 2:
+            return links
+        keys = self.source.keys_after(
+            last, (self.window - 1) * self.per_page + 1)
+        for step in range(2, self.window + 1):
+            boundary = (step - 1) * self.per_page
+            if len(keys) <= boundary:
+                break
+            number = self.number + step
+            links.append((number, self._query(
+                encode_cursor(number, keys[boundary - 1]))))
+        return links
+
+    def _previous_links(self, rows):
+        """Ссылки на предыдущие страницы окна и на текущую."""
+        if self.number == 1 or not rows:
+            return [(self.number, self._query(None))]
+        keys = self.source.keys_before(
+            self.source.key(rows[0]), self.window * self.per_page + 1)
+        links = [(self.number, self._query(
+            encode_cursor(self.number, keys[0]) if keys else None))]
+        for step in range(1, self.window + 1):
+            number = self.number - step
+            boundary = step * self.per_page
+            if number == 1 or len(keys) <= boundary:
+                links.append((number, self._query(None)))
+                break
+            links.append((number, self._query(
+                encode_cursor(number, keys[boundary]))))
+        return links[::-1]
+
+    @property
+    def count(self):
+        return len(self.object_list)
+
+    @property
+    def num_pages(self):
+        return self.links[-1][0]
+
+    @property
+    def page_range(self):
+        return [number for number, _ in self.links]
+
+    def _link(self, number):
+        for link_number, query in self.links:
+            if link_number == number:
+                return query
+        return self._query(None)
+
+    @property
+    def first_query(self):
+        return self._query(None)
+
+    @property
+    def previous_query(self):
+        return self._link(self.number - 1)
+
+    @property
+    def next_query(self):
+        return self._link(self.number + 1)
+
+    def get_page(self, number=None):
+        return Page(self.object_list, self.number, self)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['source'] = None
+        return state
+
+
+def paginator(request, post, quantity, window=PAGE_WINDOW):
+    return CursorPaginator(post, quantity, request.GET, window).get_page()
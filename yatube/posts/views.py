@@ -1,61 +1,227 @@
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import (Http404, HttpResponseBadRequest,
+                         HttpResponseForbidden, StreamingHttpResponse)
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import require_safe
 
-from .forms import CommentForm, PostForm
-from .models import User, Group, Follow, Post
-from .utils import paginator
+from core.sqlite import retry_on_lock
+
+from . import (counters, follows, graph, recommendations, thumbnails,
+               transfer, trending)
+from .caching import (cache_anonymous_page, cache_public_response,
+                      cached_page)
+from .feeds import AuthorFeed, GroupFeed, SiteFeed
+from .forms import CommentForm, PostForm, SearchForm
+from .models import User, Group, Post
+from .search import search as search_posts
+from .timeline import follow_feed, follow_namespaces
+from .utils import QuerySetSource, paginator
 
 QUANTITY = 10
+COMMENTS_QUANTITY = 20
+
+
+def pk_or_404(queryset, field='pk'):
+    value = queryset.values_list(field, flat=True).first()
+    if value is None:
+        raise Http404
+    return value
+
+
+def group_namespaces(request, slug):
+    return (f'group:{pk_or_404(Group.objects.filter(slug=slug))}',)
+
+
+def profile_namespaces(request, username):
+    author_id = pk_or_404(User.objects.filter(username=username))
+    return f'author:{author_id}', f'followers:{author_id}'
+
 
+def author_namespaces(request, username):
+    return (f'author:{pk_or_404(User.objects.filter(username=username))}',)
 
+
+def trending_namespaces(request):
+    return trending.NAMESPACE, 'index'
+
+
+def group_trending_namespaces(request, slug):
+    return (trending.NAMESPACE, *group_namespaces(request, slug))
+
+
+def post_namespaces(request, post_id):
+    author_id = pk_or_404(Post.objects.filter(pk=post_id), 'author_id')
+    return f'author:{author_id}', f'comments:{post_id}'
+
+
+@cache_anonymous_page(lambda request: ('index',))
 def index(request):
-    post_1 = Post.objects.select_related('author')
+    post_1 = Post.objects.select_related('author', 'group')
     post = Post.objects.all()
-    page_obj = paginator(request, post_1, QUANTITY)
+    page_obj, feed_key = cached_page(request, 'index', ('index',),
+                                     post_1, QUANTITY)
     context = {
         'page_obj': page_obj,
         'post': post,
+        'feed_key': feed_key,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_anonymous_page(group_namespaces)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    page_obj = paginator(request, group.posts.all(), QUANTITY)
+    page_obj, feed_key = cached_page(request, 'group', (f'group:{group.pk}',),
+                                     group.posts.select_related('author'),
+                                     QUANTITY)
     post = Post.objects.all()
     context = {
         'group': group,
         'page_obj': page_obj,
         'post': post,
+        'feed_key': feed_key,
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_anonymous_page(trending_namespaces)
+def trending_posts(request):
+    page_obj, feed_key = cached_page(request, 'trending',
+                                     trending_namespaces(request),
+                                     trending.TrendingSource(), QUANTITY)
+    context = {
+        'page_obj': page_obj,
+        'feed_key': feed_key,
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@cache_anonymous_page(group_trending_namespaces)
+def group_trending(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    page_obj, feed_key = cached_page(
+        request, 'trending', (trending.NAMESPACE, f'group:{group.pk}'),
+        trending.TrendingSource(group), QUANTITY)
+    context = {
+        'group': group,
+        'page_obj': page_obj,
+        'feed_key': feed_key,
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+@cache_anonymous_page(profile_namespaces)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    page_obj = paginator(request, author.posts.all(), QUANTITY)
-    if request.user.is_authenticated and Follow.objects.filter(
-            user=request.user, author=author).exists():
-        following = True
-    else:
-        following = False
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    page_obj, feed_key = cached_page(request, 'author',
+                                     (f'author:{author.pk}',),
+                                     author.posts.select_related('group'),
+                                     QUANTITY)
+    following = (request.user.is_authenticated
+                 and graph.is_following(request.user.pk, author.pk))
+    recommended = (recommendations.for_user(request.user.pk)
+                   if request.user.is_authenticated else [])
     context = {
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'recommended': recommended,
+        'feed_key': feed_key,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def comment_page(request, post):
+    """Страница комментариев поста в порядке написания."""
+    comments = QuerySetSource(
+        post.comments.select_related('author'),
+        fields=('created', 'id'),
+        descending=False,
+    )
+    page, _ = cached_page(request, 'comments', (f'comments:{post.pk}',),
+                          comments, COMMENTS_QUANTITY, window=1)
+    return page
+
+
+@cache_anonymous_page(post_namespaces)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
     author = post.author
     form = CommentForm()
-    return render(request, 'posts/post_detail.html', {'author': author,
-                                                      'post': post,
-                                                      'form': form,
-                                                      })
+    return render(request, 'posts/post_detail.html', {
+        'author': author,
+        'post': post,
+        'form': form,
+        'comments': comment_page(request, post),
+    })
+
+
+def post_comments(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    return render(request, 'includes/comment_list.html', {
+        'post': post,
+        'comments': comment_page(request, post),
+    })
+
+
+def search(request):
+    form = SearchForm(request.GET)
+    page_obj = None
+    if form.is_valid() and form.cleaned_data['q']:
+        data = form.cleaned_data
+        author = None
+        if data['author']:
+            author = User.objects.filter(username=data['author']).first()
+            if author is None:
+                form.add_error('author', 'Автор не найден.')
+        if form.is_valid():
+            page_obj = paginator(request, search_posts(
+                data['q'], group=data['group'], author=author), QUANTITY)
+    return render(request, 'posts/search.html', {
+        'form': form,
+        'page_obj': page_obj,
+    })
+
+
+def _store_image(post):
+    """Пишет загруженную картинку в хранилище до транзакции.
+
+    Повторяется только транзакция: иначе после «database is locked»
+    файл сохранился бы второй раз, а первый остался бы без поста.
+    """
+    if post.image and not post.image._committed:
+        post.image.save(post.image.name, post.image.file, save=False)
+
+
+@retry_on_lock
+@transaction.atomic
+def _create_post(post):
+    # id из откатившейся попытки недействителен: повтор вставляет заново.
+    post.pk = None
+    post._state.adding = True
+    post.save()
+    counters.post_created(post)
+
+
+@retry_on_lock
+@transaction.atomic
+def _update_post(post, old_group_id):
+    post.save()
+    counters.post_moved(old_group_id, post)
+
+
+@retry_on_lock
+@transaction.atomic
+def _save_comment(comment):
+    comment.save()
+    counters.comment_created(comment)
+    trending.comment_added(comment)
 
 
 @login_required
@@ -68,17 +234,21 @@ def post_create(request):
         return render(request, 'posts/create_post.html', {'form': form})
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    _store_image(post)
+    _create_post(post)
+    if post.image:
+        thumbnails.generate(post.image)
     return redirect('posts:profile', username=post.author.username)
 
 
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
+    old_group_id = post.group_id
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
                     instance=post)
-    if not post.author == request.user:
+    if not post.author_id == request.user.pk:
         return redirect('posts:post_detail', post_id=post_id)
     if not form.is_valid():
         return render(request, 'posts/create_post.html', {
@@ -87,7 +257,11 @@ def post_edit(request, post_id):
             'post_id': post_id,
             'is_edit': True
         })
-    form.save()
+    post = form.save(commit=False)
+    _store_image(post)
+    _update_post(post, old_group_id)
+    if post.image and 'image' in form.changed_data:
+        thumbnails.generate(post.image)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -99,32 +273,75 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        _save_comment(comment)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    list_of_posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(request, list_of_posts, QUANTITY)
-    context = {'page_obj': page_obj}
+    page_obj, feed_key = cached_page(request, 'follow',
+                                     follow_namespaces(request.user),
+                                     follow_feed(request.user), QUANTITY)
+    context = {
+        'page_obj': page_obj,
+        'feed_key': feed_key,
+        'recommended': recommendations.for_user(request.user.pk),
+    }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@retry_on_lock
 def profile_follow(request, username):
-    user = request.user
-    author = User.objects.get(username=username)
-    is_follower = Follow.objects.filter(user=user, author=author)
-    if not user == author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+    author_id = pk_or_404(User.objects.filter(username=username))
+    follows.follow(request.user.pk, author_id)
     return redirect(reverse('posts:profile', args=[username]))
 
 
 @login_required
+@retry_on_lock
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=request.user, author=author)
-    if is_follower.exists():
-        is_follower.delete()
-    return redirect('posts:profile', username=author)
+    author_id = pk_or_404(User.objects.filter(username=username))
+    follows.unfollow(request.user.pk, author_id)
+    return redirect('posts:profile', username=username)
+
+
+site_rss = cache_public_response(
+    lambda request: ('index',), 'site_rss')(SiteFeed())
+site_atom = cache_public_response(
+    lambda request: ('index',), 'site_atom')(SiteFeed(Atom1Feed))
+group_rss = cache_public_response(
+    group_namespaces, 'group_rss')(GroupFeed())
+group_atom = cache_public_response(
+    group_namespaces, 'group_atom')(GroupFeed(Atom1Feed))
+author_rss = cache_public_response(
+    author_namespaces, 'author_rss')(AuthorFeed())
+author_atom = cache_public_response(
+    author_namespaces, 'author_atom')(AuthorFeed(Atom1Feed))
+
+
+EXPORT_CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+@require_safe
+def export_data(request):
+    """Потоковая выгрузка данных для сотрудников, см. posts.transfer."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    fmt = request.GET.get('format', 'jsonl')
+    names = request.GET.getlist('model') or tuple(transfer.MODELS)
+    try:
+        lines = transfer.export_lines(names, fmt)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        (line.encode() for line in lines),
+        content_type=EXPORT_CONTENT_TYPES[fmt])
+    name = f'yatube-{names[0]}' if fmt == 'csv' else 'yatube'
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}-{stamp}.{fmt}"')
+    return response
@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -16,6 +20,7 @@ ALLOWED_HOSTS = [
 INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'users.apps.UsersConfig',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -27,13 +32,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.replicas.ReplicaMiddleware',
+    'core.middleware.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.query_budget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -41,7 +50,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -66,6 +75,51 @@ DATABASES = {
     }
 }
 
+# Боевой режим SQLite (см. core.sqlite) включается переменной окружения
+# YATUBE_SQLITE_PRODUCTION=1.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+SQLITE_WRITE_RETRIES = 3
+SQLITE_WRITE_BACKOFF = 0.05
+if os.environ.get('YATUBE_SQLITE_PRODUCTION') == '1':
+    DATABASES['default'].update(ENGINE='core.sqlite', CONN_MAX_AGE=600)
+
+# Реплики для чтения лент (см. core.replicas): YATUBE_REPLICAS=2 заводит
+# файлы db.replica1.sqlite3, db.replica2.sqlite3; их наполняет
+# manage.py replicate --interval.
+DATABASE_REPLICAS = []
+for number in range(1, int(os.environ.get('YATUBE_REPLICAS', 0)) + 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, f'db.replica{number}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_VIEWS = [
+    'posts:main_page',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:follow_index',
+]
+# Реплики копируются каждые REPLICA_SYNC_INTERVAL секунд и годятся, пока
+# отстают не больше чем на REPLICA_MAX_LAG (см. core.replicas). После
+# записи пользователь читает из основной базы дольше худшего принятого
+# отставания и ещё одного цикла копирования — иначе он мог бы не увидеть
+# свой пост.
+REPLICA_SYNC_INTERVAL = 5
+REPLICA_MAX_LAG = 10
+REPLICA_PIN_SECONDS = REPLICA_MAX_LAG + REPLICA_SYNC_INTERVAL
+REPLICA_RETRY_SECONDS = 30
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -107,10 +161,84 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки крупнее 256 КБ пишутся во временный файл по частям.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# Бюджеты SQL-запросов на представление с холодным кэшем
+# (см. core.middleware.query_budget), без BEGIN/SAVEPOINT/COMMIT. Сняты
+# на базе seed_bench: запросы самой страницы плюс до одного запроса к
+# хранилищу sorl на пост ленты из десяти (все размеры миниатюры — одним,
+# см. thumbnails.lookup_all). Создание поста с картинкой включает три
+# запроса к хранилищу при генерации миниатюр. Тесты на QueryBudgetTestCase
+# падают при превышении.
+QUERY_BUDGETS = {
+    'posts:main_page': 13,
+    'posts:group_list': 14,
+    'posts:trending': 11,
+    'posts:group_trending': 13,
+    'posts:profile': 17,
+    'posts:post_detail': 5,
+    'posts:post_comments': 3,
+    'posts:search': 5,
+    'posts:follow_index': 19,
+    'posts:post_create': 13,
+    'posts:post_edit': 8,
+    'posts:add_comment': 7,
+    'posts:profile_follow': 8,
+    'posts:profile_unfollow': 7,
+}
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_DUPLICATES = 0
+QUERY_BUDGET_RAISE = False
+
+# JSON API (см. api.views): размер страницы по умолчанию и наибольший.
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 500
+
+# Профили запросов (см. core.middleware.profiling).
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_SAMPLE_RATE = 0
+PROFILING_KEEP = 200
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+
+# Тестовая база создаётся заново, общие файлы кэша и метрик её бы пережили:
+# под тестами они лежат в своём временном каталоге, который удаляется при
+# выходе из процесса.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    TESTING_DIR = tempfile.mkdtemp(prefix='yatube-test-')
+    atexit.register(shutil.rmtree, TESTING_DIR, ignore_errors=True)
+
+# Метрики Prometheus (см. core.metrics): файлы процессов и доступ.
+# Прямые запросы из внутренних сетей пускаются без токена, запросы через
+# прокси — только с заголовком Authorization: Bearer <METRICS_TOKEN>.
+METRICS_DIR = os.path.join(BASE_DIR, 'metrics')
+if TESTING:
+    METRICS_DIR = os.path.join(TESTING_DIR, 'metrics')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+METRICS_ALLOWED_NETWORKS = [
+    '127.0.0.0/8', '10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16',
+    '::1/128',
+]
+
+# Двухуровневый кэш (см. core.cache): LRU процесса поверх общего файла.
+CACHE_LOCATION = os.path.join(BASE_DIR, 'cache.sqlite3')
+if TESTING:
+    CACHE_LOCATION = os.path.join(TESTING_DIR, 'cache.sqlite3')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'LOCAL_MAX_ENTRIES': 1000,
+            'COMPRESS_MIN_BYTES': 1024,
+            'INVALIDATION_INTERVAL': 0.1,
+        },
     }
 }
 
+THUMBNAIL_BACKEND = 'posts.thumbnails.PregeneratedThumbnailBackend'
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'